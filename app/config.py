@@ -1,5 +1,8 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
@@ -21,6 +24,58 @@ class Settings(BaseSettings):
     port: int = 8000
     debug: bool = False
     
+    # Observability
+    profiling_enabled: bool = False       # perfila todos los requests de /api/excel
+    profiling_token: str = ""             # o solo los que envían X-Profile-Token con este valor
+    profiling_dir: str = "profiles"
+    profiling_interval_ms: float = 5.0
+    tracing_exporter: str = ""            # "", "memory" o "file"
+    tracing_file: str = "traces/spans.jsonl"
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 100.0
+    loop_block_threshold_ms: float = 250.0
+    memory_tracking_enabled: bool = True  # delta de RSS por etapa (validate, parse, store)
+    memory_tracemalloc: bool = False      # además el pico de tracemalloc (más preciso, pero lento)
+    
+    # Cold start
+    warmup_enabled: bool = True           # procesar un workbook mínimo al arrancar (ver /ready)
+    
+    # Admission control (/process, /upload, /validate, /preview)
+    admission_enabled: bool = True
+    admission_max_concurrent: int = 4     # workbooks procesándose a la vez
+    admission_memory_budget_mb: int = 384  # memoria estimada sumada de los workbooks en curso
+    admission_max_queue: int = 32         # requests en espera; el resto recibe 429
+    admission_queue_timeout_s: float = 20.0  # espera máxima en la cola antes del 503
+    admission_bytes_per_cell: int = 200   # memoria estimada por celda al parsear
+    admission_fast_lane_max_cells: int = 20000  # hasta acá un workbook va al carril rápido
+    admission_fast_lane_slots: int = 1    # slots que los workbooks grandes no pueden ocupar
+    admission_aging_s: float = 10.0       # espera tras la cual un workbook grande pasa primero
+    admission_workspace_max_concurrent: int = 0  # workbooks a la vez por workspace (0 = sin límite)
+    admission_workspace_weights: str = ""  # "workspace_id=peso,..." para repartir la cola (default 1)
+    admission_workspace_metrics: str = ""  # workspaces con series propias en las métricas; el resto va a "other"
+
+    # Parse workers
+    parse_workers: int = 0                # procesos que parsean las hojas (0 = en el threadpool)
+    parse_handoff: str = "arrow"          # "arrow" (archivo IPC mapeado en memoria) o "pickle"
+    parse_handoff_dir: str = ""           # dónde se escriben los archivos IPC (default /dev/shm)
+
+    # Duplicate uploads
+    upload_reservation_ttl_s: float = 900.0   # reserva de un ingest que se considera abandonada
+    upload_reservation_wait_s: float = 60.0   # espera de un upload idéntico antes del 409
+    upload_reservation_poll_ms: float = 250.0
+
+    # Batch uploads (/process-batch)
+    batch_max_files: int = 200            # archivos por request
+    batch_max_concurrent: int = 2         # archivos de un mismo batch procesados a la vez
+
+    # Storage
+    storage_batch_retries: int = 2        # reintentos por lote antes de marcar la tabla como fallida
+    storage_retry_backoff_ms: float = 200.0
+    ingest_spool_dir: str = "ingest_spool"  # filas pendientes de tablas fallidas, para /resume
+    storage_ingest_rpc: bool = False      # una llamada a ingest_table_chunk por lote (migración 005)
+    storage_row_format: str = "jsonb"     # "jsonb" (una fila por registro) o "zstd_blocks" (migración 007)
+    storage_block_rows: int = 1000        # filas por bloque comprimido con zstd_blocks
+    
     # JWT (opcional)
     jwt_secret_key: str = "your-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
@@ -38,6 +93,28 @@ class Settings(BaseSettings):
     def allowed_extensions_list(self) -> List[str]:
         """Convierte la cadena de extensiones permitidas en lista"""
         return [ext.strip() for ext in self.allowed_extensions.split(",")]
-
+    
+    @property
+    def admission_workspace_weights_map(self) -> Dict[str, float]:
+        """Convierte "ws-a=2,ws-b=0.5" en {"ws-a": 2.0, "ws-b": 0.5}, ignorando pesos inválidos o no positivos"""
+        weights = {}
+        for entry in self.admission_workspace_weights.split(","):
+            workspace_id, _, weight = entry.partition("=")
+            if not workspace_id.strip() or not weight.strip():
+                continue
+            try:
+                value = float(weight)
+            except ValueError:
+                logger.warning(f"ADMISSION_WORKSPACE_WEIGHTS: peso inválido ignorado: {entry.strip()!r}")
+                continue
+            if value > 0:
+                weights[workspace_id.strip()] = value
+        return weights
+    
+    @property
+    def admission_workspace_metrics_list(self) -> List[str]:
+        """Workspaces reportados por separado en las métricas: los listados más los que tienen peso"""
+        listed = [ws.strip() for ws in self.admission_workspace_metrics.split(",") if ws.strip()]
+        return list(dict.fromkeys(listed + list(self.admission_workspace_weights_map)))
 
 settings = Settings()
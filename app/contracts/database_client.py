@@ -11,9 +11,10 @@ class IDatabaseClient(Protocol):
         name: str,
         description: str,
         icon: str = "table",
-        color: str = "#228BE6"
+        color: str = "#228BE6",
+        dashboard_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Creates a new dashboard"""
+        """Creates a new dashboard (with a client-generated id if given)"""
         ...
     
     async def create_widget(
@@ -25,6 +26,14 @@ class IDatabaseClient(Protocol):
         """Creates a widget in a dashboard"""
         ...
     
+    async def create_widgets(
+        self,
+        dashboard_id: str,
+        widgets: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Creates several widgets ({widget_type, config}) in one request"""
+        ...
+    
     async def get_workspace(self, workspace_id: str) -> Optional[Dict[str, Any]]:
         """Gets workspace information"""
         ...
@@ -34,7 +43,67 @@ class IDatabaseClient(Protocol):
         workspace_id: str,
         table_name: str,
         data: List[Dict[str, Any]],
-        column_types: Dict[str, str]
+        column_types: Dict[str, str],
+        fingerprint: Optional[str] = None,
+        source: Optional[Dict[str, Any]] = None,
+        row_hashes: Optional[List[int]] = None,
     ) -> int:
-        """Stores Excel data in database"""
+        """Stores Excel data in database, tagging it with the upload fingerprint"""
+        ...
+    
+    async def resume_excel_data(self, workspace_id: str, table_id: str) -> Dict[str, int]:
+        """Finishes a partially stored table from its first missing batch"""
+        ...
+    
+    async def get_table_metadata(self, workspace_id: str, table_id: str) -> Optional[Dict[str, Any]]:
+        """Gets a stored table's metadata if it belongs to the workspace"""
+        ...
+    
+    async def get_table_data(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reads a page of a stored table's rows, in row order (``row_format`` from its metadata)"""
+        ...
+    
+    async def get_table_columns(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> Dict[str, List[Any]]:
+        """Same page as ``get_table_data``, as ``{column: values}`` with ``names`` first"""
+        ...
+    
+    async def update_excel_data(
+        self,
+        workspace_id: str,
+        table_id: str,
+        data: List[Dict[str, Any]],
+        column_types: Dict[str, str],
+        row_hashes: List[int],
+        row_format: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """Diffs a new version of a table's rows and writes only the changes"""
+        ...
+    
+    async def find_tables_by_fingerprint(
+        self,
+        workspace_id: str,
+        fingerprint: str
+    ) -> List[Dict[str, Any]]:
+        """Fully stored tables from an identical upload, newest first"""
+        ...
+    
+    async def reserve_upload(self, workspace_id: str, fingerprint: str) -> Optional[str]:
+        """Reserves a fingerprint for one ingest; a token, or None while another upload holds it"""
+        ...
+    
+    async def release_upload(self, workspace_id: str, fingerprint: str, token: str) -> None:
+        """Releases the reservation taken with ``token``"""
         ...
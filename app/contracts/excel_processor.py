@@ -1,10 +1,14 @@
 """Interface for Excel processing"""
-from typing import Protocol, Dict, Any, List, Tuple
+from typing import Protocol, Dict, Any, Iterator, List, Optional, Tuple
 
 
 class IExcelProcessor(Protocol):
     """Protocol for Excel processing operations"""
     
+    def check_upload(self, file_content: bytes, filename: str) -> Tuple[bool, List[str]]:
+        """Validates extension and emptiness without opening the workbook"""
+        ...
+    
     def validate_file(self, file_content: bytes, filename: str) -> Tuple[bool, List[str]]:
         """Validates an Excel file"""
         ...
@@ -26,10 +30,46 @@ class IExcelProcessor(Protocol):
         self,
         file_content: bytes,
         workspace_id: str,
+        sheets: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Processes all sheets (or only ``sheets``, keeping ``columns``) into a widget-ready payload"""
+        ...
+    
+    def iter_sheets(
+        self,
+        file_content: bytes,
+        workspace_id: str,
+        sheets: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields one widget-ready sheet result at a time (streaming)"""
+        ...
+    
+    def process_sheet(
+        self,
+        file_content: bytes,
+        workspace_id: str,
+        sheet_name: Optional[str] = None,
+        table_name: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Processes a single sheet (first by default), optionally into a given table name"""
+        ...
+    
+    def summarize_sheets(
+        self,
+        sheets_results: List[Dict[str, Any]],
+        processing_time: float,
     ) -> Dict[str, Any]:
-        """Processes all sheets and returns widget-ready multi-sheet payload"""
+        """Builds the multi-sheet envelope from already processed sheets"""
         ...
     
-    def get_data_preview(self, file_content: bytes, rows: int = 10) -> Dict[str, Any]:
-        """Gets a preview of Excel data"""
+    def get_data_preview(
+        self,
+        file_content: bytes,
+        rows: int = 10,
+        sheet: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Gets the header and first rows of one sheet, reading only those rows"""
         ...
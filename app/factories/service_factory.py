@@ -1,13 +1,19 @@
-"""Factory functions for creating service instances with DI"""
-from app.services import ExcelProcessor, SupabaseClient
+"""
+Factory functions for creating service instances with DI
+
+The services are imported on first call: pandas/openpyxl and supabase are
+the bulk of the app's import time and ``/health`` needs neither.
+"""
 from app.contracts import IExcelProcessor, IDatabaseClient
 
 
 def get_excel_processor() -> IExcelProcessor:
     """Factory function for ExcelProcessor (Dependency Injection)"""
+    from app.services.excel_processor import ExcelProcessor
     return ExcelProcessor()
 
 
 def get_database_client() -> IDatabaseClient:
     """Factory function for SupabaseClient (Dependency Injection)"""
+    from app.services.supabase_client import SupabaseClient
     return SupabaseClient()
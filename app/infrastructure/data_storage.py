@@ -1,23 +1,157 @@
 """Service for storing Excel data in Supabase"""
-from typing import Dict, Any, List
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+import asyncio
 import logging
-from supabase import Client
+import uuid
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.infrastructure.ingest_spool import IngestSpool
+from app.infrastructure.row_blocks import (
+    BLOCKS_TABLE,
+    block_from_row_payloads,
+    block_record,
+    decode_block_columns,
+    decode_block_records,
+    plan_block_writes,
+)
+from app.models.response import ProcessingStatusEnum
+from app.observability import observe_stage, tracer
+from app.observability.metrics import STORAGE_BATCHES_PENDING
+from app.utils.arrow import records_to_columns
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# Rows per insert/upsert request, to stay under PostgREST payload limits
+BATCH_SIZE = 100
+# PostgREST caps a select at 1000 rows by default
+SELECT_PAGE_SIZE = 1000
+# data_tables_metadata.row_format: where a table's rows live (migration 007)
+ROW_FORMAT_JSONB = "jsonb"
+ROW_FORMAT_BLOCKS = "zstd_blocks"
+ROW_FORMATS = (ROW_FORMAT_JSONB, ROW_FORMAT_BLOCKS)
+# One row per upload being ingested (migration 008)
+RESERVATIONS_TABLE = "upload_reservations"
+
+
+class PartialIngestError(Exception):
+    """Storage failed after some row batches of the table were committed"""
+    def __init__(self, table_id: str, committed_rows: int, total_rows: int, cause: Exception):
+        self.table_id = table_id
+        self.committed_rows = committed_rows
+        self.total_rows = total_rows
+        super().__init__(
+            f"Table {table_id}: {committed_rows}/{total_rows} rows stored before failure: {cause}"
+        )
+
+
+class ResumeUnavailableError(Exception):
+    """No spooled rows to resume the table from (e.g. the instance was restarted)"""
+
+
+def diff_row_hashes(stored: Dict[int, Optional[int]], new_hashes: List[int]) -> Dict[str, Any]:
+    """
+    Positional diff of a table against a new version of its rows.
+
+    ``stored`` maps row_number -> row_hash (None for rows stored before
+    hashing existed); ``new_hashes[i]`` belongs to row_number ``i + 1``.
+    Rows are matched by position, so edits and appended/removed trailing rows
+    cost writes proportional to the change; inserting a row in the middle
+    shifts (and rewrites) everything after it.
+    """
+    inserts: List[int] = []
+    updates: List[int] = []
+    for row_number, row_hash in enumerate(new_hashes, start=1):
+        if row_number not in stored:
+            inserts.append(row_number)
+        elif stored[row_number] != row_hash:
+            updates.append(row_number)
+    deleted = sum(1 for row_number in stored if row_number > len(new_hashes))
+    return {
+        "inserts": inserts,
+        "updates": updates,
+        "deleted": deleted,
+        "unchanged": len(new_hashes) - len(inserts) - len(updates),
+    }
+
+
+def _column_schema(column_types: Dict[str, str]) -> List[Dict[str, Any]]:
+    """``data_tables_metadata.columns`` for the inferred column types"""
+    return [
+        {"name": col_name, "type": col_type, "nullable": True}
+        for col_name, col_type in column_types.items()
+    ]
+
+
+def _block_row_hashes(blocks: List[Dict[str, Any]]) -> Dict[int, Optional[int]]:
+    """row_number -> row_hash of the rows held by ``data_table_blocks`` records"""
+    stored: Dict[int, Optional[int]] = {}
+    for block in blocks:
+        hashes = block["row_hashes"] or []
+        for offset, row_number in enumerate(range(block["first_row"], block["last_row"] + 1)):
+            stored[row_number] = hashes[offset] if offset < len(hashes) else None
+    return stored
+
+
+def _row_payloads(
+    workspace_id: str,
+    table_id: str,
+    data: List[Dict[str, Any]],
+    row_hashes: Optional[List[int]] = None,
+) -> List[Dict[str, Any]]:
+    """``data_table_rows`` records for ``data``, numbered from 1"""
+    rows = [
+        {
+            "table_id": table_id,
+            "workspace_id": workspace_id,
+            "row_data": row,
+            "row_number": idx
+        }
+        for idx, row in enumerate(data, start=1)
+    ]
+    if row_hashes is not None:
+        for row, row_hash in zip(rows, row_hashes):
+            row["row_hash"] = row_hash
+    return rows
+
 
 class DataStorageService:
     """Handles storage of Excel data in Supabase"""
     
-    def __init__(self, supabase_client: Client):
+    def __init__(
+        self,
+        supabase_client: "Client",
+        spool: Optional[IngestSpool] = None,
+        ingest_rpc: Optional[bool] = None,
+        row_format: Optional[str] = None,
+        block_rows: Optional[int] = None,
+    ):
         self.client = supabase_client
+        self.spool = spool or IngestSpool(settings.ingest_spool_dir)
+        self.ingest_rpc = settings.storage_ingest_rpc if ingest_rpc is None else ingest_rpc
+        self.row_format = settings.storage_row_format if row_format is None else row_format
+        if self.row_format not in ROW_FORMATS:
+            raise ValueError(f"STORAGE_ROW_FORMAT must be one of {ROW_FORMATS}, not {self.row_format!r}")
+        self.block_rows = max(1, settings.storage_block_rows if block_rows is None else block_rows)
+        if self.ingest_rpc and self.row_format == ROW_FORMAT_BLOCKS:
+            logger.warning("STORAGE_INGEST_RPC is ignored with STORAGE_ROW_FORMAT=zstd_blocks")
+    
+    async def _execute(self, query) -> Any:
+        """Run a (blocking) supabase-py request in the threadpool, off the event loop"""
+        return await run_in_threadpool(query.execute)
     
     async def store_excel_data(
         self,
         workspace_id: str,
         table_name: str,
         data: List[Dict[str, Any]],
-        column_types: Dict[str, str]
+        column_types: Dict[str, str],
+        fingerprint: Optional[str] = None,
+        source: Optional[Dict[str, Any]] = None,
+        row_hashes: Optional[List[int]] = None,
     ) -> int:
         """
         Stores Excel data in Supabase using data_tables_metadata approach
@@ -31,25 +165,44 @@ class DataStorageService:
         - Works with RLS
         - Allows flexible schema
         - Easier to query and manage
+        
+        ``fingerprint``/``source`` are written together with the final
+        row_count, so a table only becomes findable by fingerprint once all
+        of its rows are stored. ``row_hashes`` are kept per row so a later
+        version of the sheet can be diffed (see ``update_excel_data``).
+        
+        The table stays ``processing`` until its last batch commits. If a
+        batch still fails after retries, the uncommitted rows are spooled,
+        the table is marked ``failed`` with the committed row_count and
+        ``PartialIngestError`` is raised; ``resume_excel_data`` finishes it.
+        
+        With ``ingest_rpc`` the same happens through the
+        ``ingest_table_chunk`` function, one request per chunk of rows.
+        With ``row_format="zstd_blocks"`` each batch of ``block_rows`` rows is
+        stored as one compressed ``data_table_blocks`` record instead.
         """
+        if self.ingest_rpc and self.row_format == ROW_FORMAT_JSONB:
+            return await self._store_via_rpc(
+                workspace_id, table_name, data, column_types, fingerprint, source, row_hashes
+            )
         try:
             # 1. Create metadata entry for this table
             metadata = {
                 "workspace_id": workspace_id,
                 "table_name": table_name,
-                "columns": [
-                    {
-                        "name": col_name,
-                        "type": col_type,
-                        "nullable": True
-                    }
-                    for col_name, col_type in column_types.items()
-                ],
-                "row_count": len(data),
+                "columns": _column_schema(column_types),
+                "row_count": 0,
+                "status": ProcessingStatusEnum.PROCESSING.value,
                 "created_at": "now()",
             }
+            # Only sent for blocks: without migration 007 the column does not exist and jsonb is implied
+            if self.row_format != ROW_FORMAT_JSONB:
+                metadata["row_format"] = self.row_format
             
-            metadata_result = self.client.table("data_tables_metadata").insert(metadata).execute()
+            with observe_stage("storage_metadata", table_name, table_name=table_name, rows=len(data)):
+                metadata_result = await self._execute(
+                    self.client.table("data_tables_metadata").insert(metadata)
+                )
             
             if not metadata_result.data or len(metadata_result.data) == 0:
                 raise Exception("Failed to create table metadata")
@@ -59,51 +212,575 @@ class DataStorageService:
             
             # 2. Insert data rows
             # We store each row as JSONB in data_table_rows
-            rows_to_insert = [
-                {
-                    "table_id": table_id,
-                    "workspace_id": workspace_id,
-                    "row_data": row,
-                    "row_number": idx
-                }
-                for idx, row in enumerate(data, start=1)
-            ]
+            rows_to_insert = _row_payloads(workspace_id, table_id, data, row_hashes)
             
-            # Insert in batches of 100 to avoid payload limits
-            batch_size = 100
-            total_inserted = 0
-            
-            for i in range(0, len(rows_to_insert), batch_size):
-                batch = rows_to_insert[i:i + batch_size]
-                result = self.client.table("data_table_rows").insert(batch).execute()
-                
-                if result.data:
-                    total_inserted += len(result.data)
+            # Insert in batches of 100 (or blocks of block_rows) to avoid payload limits
+            _, total_inserted = await self._write_rows(
+                workspace_id, table_id, table_name, rows_to_insert,
+                spool_extra={"fingerprint": fingerprint, "source": source, "total_rows": len(data)},
+                row_format=self.row_format,
+            )
             
             logger.info(f"Inserted {total_inserted} rows for table {table_name}")
             
-            # 3. Update row count in metadata
-            self.client.table("data_tables_metadata").update({
-                "row_count": total_inserted
-            }).eq("id", table_id).execute()
-            
+            # 3. Update row count (and upload fingerprint) in metadata
+            await self._complete_table(table_id, total_inserted, fingerprint, source)
             return total_inserted
             
         except Exception as e:
             logger.error(f"Error storing Excel data: {str(e)}")
             raise
     
+    async def _store_via_rpc(
+        self,
+        workspace_id: str,
+        table_name: str,
+        data: List[Dict[str, Any]],
+        column_types: Dict[str, str],
+        fingerprint: Optional[str],
+        source: Optional[Dict[str, Any]],
+        row_hashes: Optional[List[int]],
+    ) -> int:
+        """
+        ``store_excel_data`` in one ``ingest_table_chunk`` call per chunk.
+
+        The table id is generated here so every call, including a retried
+        first chunk, is idempotent. Each call is one transaction: if the
+        first chunk fails nothing was stored; a later failure is
+        checkpointed like a failed batch and can be resumed.
+        """
+        table_id = str(uuid.uuid4())
+        metadata = {
+            "workspace_id": workspace_id,
+            "table_name": table_name,
+            "columns": _column_schema(column_types),
+        }
+        rows = _row_payloads(workspace_id, table_id, data, row_hashes)
+        spool_extra = {"fingerprint": fingerprint, "source": source, "total_rows": len(data)}
+        starts = list(range(0, len(rows), BATCH_SIZE)) or [0]
+        
+        STORAGE_BATCHES_PENDING.inc(len(starts))
+        pending = len(starts)
+        try:
+            for chunk_index, start in enumerate(starts):
+                is_last = chunk_index == len(starts) - 1
+                params = {
+                    "p_table_id": table_id,
+                    "p_rows": rows[start:start + BATCH_SIZE],
+                    "p_metadata": metadata if chunk_index == 0 else None,
+                    "p_is_last": is_last,
+                    "p_fingerprint": fingerprint if is_last else None,
+                    "p_source": source if is_last else None,
+                }
+                try:
+                    result = await self._execute_with_retries(
+                        lambda attempt: self.client.rpc("ingest_table_chunk", params),
+                        table_name,
+                        batch_index=chunk_index,
+                        rows=len(params["p_rows"]),
+                    )
+                except Exception as chunk_err:
+                    if chunk_index == 0:
+                        raise
+                    await self._checkpoint_failure(
+                        workspace_id, table_id, table_name, rows[start:], spool_extra
+                    )
+                    raise PartialIngestError(table_id, start, len(data), chunk_err) from chunk_err
+                pending -= 1
+                STORAGE_BATCHES_PENDING.dec()
+        except Exception as e:
+            logger.error(f"Error storing Excel data: {str(e)}")
+            raise
+        finally:
+            STORAGE_BATCHES_PENDING.dec(pending)
+        
+        row_count = result.data["row_count"]
+        logger.info(f"Stored {row_count} rows for table {table_name} in {len(starts)} ingest_table_chunk calls")
+        return row_count
+    
+    async def _execute_with_retries(self, make_query, table_name: str, **attributes: Any) -> Any:
+        """
+        Execute ``make_query(attempt)`` as a ``storage_batch`` stage, retrying
+        with backoff (``settings.storage_batch_retries``)
+        """
+        attempts = settings.storage_batch_retries + 1
+        for attempt in range(attempts):
+            try:
+                with observe_stage(
+                    "storage_batch",
+                    table_name,
+                    table_name=table_name,
+                    attempt=attempt,
+                    **attributes,
+                ):
+                    return await self._execute(make_query(attempt))
+            except Exception as batch_err:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning(
+                    f"Batch {attributes.get('batch_index')} of {table_name} failed "
+                    f"(attempt {attempt + 1}/{attempts}): {batch_err}"
+                )
+                await asyncio.sleep(settings.storage_retry_backoff_ms / 1000 * 2 ** attempt)
+    
+    async def _write_batch(
+        self,
+        table_name: str,
+        batch: List[Dict[str, Any]],
+        batch_index: int,
+        upsert: bool = False,
+        row_format: str = ROW_FORMAT_JSONB,
+    ) -> Any:
+        """
+        Write one batch, retrying with backoff (``settings.storage_batch_retries``).
+        A ``zstd_blocks`` batch is written as one block, without returning it.
+        """
+        rows = len(batch)
+        table, on_conflict, returning = "data_table_rows", "table_id,row_number", "representation"
+        if row_format == ROW_FORMAT_BLOCKS:
+            batch = [await run_in_threadpool(block_from_row_payloads, batch)]
+            table, on_conflict, returning = BLOCKS_TABLE, "table_id,first_row", "minimal"
+        
+        def make_query(attempt: int):
+            query = self.client.table(table)
+            if upsert or attempt > 0:
+                # A failed insert may still have committed (e.g. a timeout after the
+                # write): retries and resumes are idempotent on the table's key
+                return query.upsert(
+                    batch, on_conflict=on_conflict, ignore_duplicates=True, returning=returning
+                )
+            return query.insert(batch, returning=returning)
+        
+        return await self._execute_with_retries(
+            make_query, table_name, batch_index=batch_index, rows=rows
+        )
+    
+    async def _write_rows(
+        self,
+        workspace_id: str,
+        table_id: str,
+        table_name: str,
+        rows: List[Dict[str, Any]],
+        spool_extra: Dict[str, Any],
+        upsert: bool = False,
+        row_format: str = ROW_FORMAT_JSONB,
+    ) -> Tuple[int, int]:
+        """
+        Write ``rows`` batch by batch (block by block for ``zstd_blocks``).
+        Returns (rows committed, rows reported inserted). On a batch that
+        keeps failing, checkpoints the table and raises ``PartialIngestError``.
+        """
+        blocks = row_format == ROW_FORMAT_BLOCKS
+        batch_size = self.block_rows if blocks else BATCH_SIZE
+        committed = 0
+        total_inserted = 0
+        pending = -(-len(rows) // batch_size)
+        STORAGE_BATCHES_PENDING.inc(pending)
+        try:
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                batch_index = (batch[0]["row_number"] - 1) // batch_size
+                try:
+                    result = await self._write_batch(table_name, batch, batch_index, upsert, row_format)
+                except Exception as batch_err:
+                    await self._checkpoint_failure(
+                        workspace_id, table_id, table_name, rows[i:], spool_extra
+                    )
+                    raise PartialIngestError(
+                        table_id, batch[0]["row_number"] - 1, spool_extra["total_rows"], batch_err
+                    ) from batch_err
+                pending -= 1
+                STORAGE_BATCHES_PENDING.dec()
+                
+                committed += len(batch)
+                if upsert or blocks:
+                    total_inserted += len(batch)
+                elif result.data:
+                    total_inserted += len(result.data)
+        finally:
+            STORAGE_BATCHES_PENDING.dec(pending)
+        return committed, total_inserted
+    
+    async def _checkpoint_failure(
+        self,
+        workspace_id: str,
+        table_id: str,
+        table_name: str,
+        remaining: List[Dict[str, Any]],
+        spool_extra: Dict[str, Any],
+    ) -> None:
+        """Spool the uncommitted rows and mark the table failed (best effort)"""
+        committed_rows = remaining[0]["row_number"] - 1
+        # Serializing and writing the rows takes long for a big table: keep it off the event loop
+        await run_in_threadpool(self.spool.save, table_id, {
+            "workspace_id": workspace_id,
+            "table_name": table_name,
+            "rows": remaining,
+            **spool_extra,
+        })
+        try:
+            await self._execute(self.client.table("data_tables_metadata").update({
+                "row_count": committed_rows,
+                "status": ProcessingStatusEnum.FAILED.value,
+            }).eq("id", table_id))
+        except Exception as update_err:
+            logger.warning(f"Could not checkpoint table {table_id}: {update_err}")
+    
+    async def _complete_table(
+        self,
+        table_id: str,
+        row_count: int,
+        fingerprint: Optional[str] = None,
+        source: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        update: Dict[str, Any] = {"row_count": row_count, "status": ProcessingStatusEnum.COMPLETED.value}
+        if fingerprint is not None:
+            update["file_fingerprint"] = fingerprint
+            update["source"] = source
+        with tracer.start_as_current_span(
+            "supabase.update data_tables_metadata", {"table_id": table_id, "row_count": row_count}
+        ):
+            await self._execute(
+                self.client.table("data_tables_metadata").update(update).eq("id", table_id)
+            )
+    
+    async def _committed_rows(self, table_id: str, row_format: str = ROW_FORMAT_JSONB) -> int:
+        """Highest stored row_number; batches commit in order, so rows 1..n are stored"""
+        if row_format == ROW_FORMAT_BLOCKS:
+            result = await self._execute(
+                self.client.table(BLOCKS_TABLE).select("last_row").eq(
+                    "table_id", table_id
+                ).order("last_row", desc=True).limit(1)
+            )
+            return result.data[0]["last_row"] if result.data else 0
+        result = await self._execute(
+            self.client.table("data_table_rows").select("row_number").eq(
+                "table_id", table_id
+            ).order("row_number", desc=True).limit(1)
+        )
+        return result.data[0]["row_number"] if result.data else 0
+    
+    async def resume_excel_data(self, workspace_id: str, table_id: str) -> Dict[str, int]:
+        """
+        Finish a table whose storage failed part-way, from the first batch
+        that is not in ``data_table_rows``, using the spooled rows.
+        
+        Raises ``ResumeUnavailableError`` when nothing was spooled for the
+        table in this instance, and ``PartialIngestError`` if it fails again.
+        """
+        table = await self.get_table_metadata(workspace_id, table_id)
+        if table is not None and table.get("status") == ProcessingStatusEnum.COMPLETED.value:
+            await run_in_threadpool(self.spool.discard, table_id)
+            return {"resumed_from_row": table["row_count"] + 1, "rows_written": 0, "row_count": table["row_count"]}
+        spooled = await run_in_threadpool(self.spool.load, table_id)
+        if table is None or spooled is None or spooled["workspace_id"] != workspace_id:
+            raise ResumeUnavailableError(table_id)
+        
+        row_format = table.get("row_format") or ROW_FORMAT_JSONB
+        committed = await self._committed_rows(table_id, row_format)
+        remaining = [row for row in spooled["rows"] if row["row_number"] > committed]
+        spool_extra = {key: spooled[key] for key in ("fingerprint", "source", "total_rows")}
+        written, _ = await self._write_rows(
+            workspace_id, table_id, spooled["table_name"], remaining, spool_extra,
+            upsert=True, row_format=row_format,
+        )
+        row_count = committed + written
+        await self._complete_table(table_id, row_count, spooled["fingerprint"], spooled["source"])
+        await run_in_threadpool(self.spool.discard, table_id)
+        logger.info(f"Resumed table {table_id} from row {committed + 1}: {written} rows written")
+        return {"resumed_from_row": committed + 1, "rows_written": written, "row_count": row_count}
+    
+    async def get_table_metadata(self, workspace_id: str, table_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Metadata of a table in the workspace, or None. ``row_format`` is only
+        present once migration 007 ran; readers treat a missing one as jsonb.
+        """
+        result = await self._execute(
+            self.client.table("data_tables_metadata").select("*").eq(
+                "id", table_id
+            ).eq("workspace_id", workspace_id).limit(1)
+        )
+        return result.data[0] if result.data else None
+    
+    async def _stored_row_hashes(self, table_id: str) -> Dict[int, Optional[int]]:
+        """row_number -> row_hash for every stored row, read page by page"""
+        stored: Dict[int, Optional[int]] = {}
+        offset = 0
+        while True:
+            result = await self._execute(
+                self.client.table("data_table_rows").select("row_number, row_hash").eq(
+                    "table_id", table_id
+                ).order("row_number").range(offset, offset + SELECT_PAGE_SIZE - 1)
+            )
+            page = result.data or []
+            stored.update((row["row_number"], row["row_hash"]) for row in page)
+            if len(page) < SELECT_PAGE_SIZE:
+                return stored
+            offset += SELECT_PAGE_SIZE
+    
+    async def _stored_blocks(self, table_id: str) -> List[Dict[str, Any]]:
+        """Row range and hashes of every block of a table (no payloads), page by page"""
+        blocks: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            result = await self._execute(
+                self.client.table(BLOCKS_TABLE).select("first_row, last_row, row_hashes").eq(
+                    "table_id", table_id
+                ).order("first_row").range(offset, offset + SELECT_PAGE_SIZE - 1)
+            )
+            page = result.data or []
+            blocks.extend(page)
+            if len(page) < SELECT_PAGE_SIZE:
+                return blocks
+            offset += SELECT_PAGE_SIZE
+    
+    async def update_excel_data(
+        self,
+        workspace_id: str,
+        table_id: str,
+        data: List[Dict[str, Any]],
+        column_types: Dict[str, str],
+        row_hashes: List[int],
+        row_format: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Bring a stored table up to date with a new version of its rows.
+
+        Only the stored hashes are read; rows whose hash changed or that are
+        new are upserted on ``(table_id, row_number)`` and trailing rows that
+        no longer exist are deleted, so writes scale with the change rather
+        than the table. The upload fingerprint is cleared because the table
+        no longer matches the file it was first ingested from.
+
+        ``row_format`` is the table's (from its metadata). For
+        ``zstd_blocks`` the hashes come from the blocks and only the blocks
+        holding a changed row are re-encoded and upserted.
+        """
+        blocks: List[Dict[str, Any]] = []
+        with observe_stage("storage_diff", table_id, table_id=table_id, rows=len(data)):
+            if row_format == ROW_FORMAT_BLOCKS:
+                blocks = await self._stored_blocks(table_id)
+                stored = _block_row_hashes(blocks)
+            else:
+                stored = await self._stored_row_hashes(table_id)
+            diff = diff_row_hashes(stored, row_hashes)
+        
+        changed = diff["inserts"] + diff["updates"]
+        if row_format == ROW_FORMAT_BLOCKS:
+            await self._rewrite_blocks(workspace_id, table_id, data, row_hashes, blocks, changed)
+        else:
+            await self._upsert_rows(workspace_id, table_id, data, row_hashes, changed, diff["deleted"])
+        
+        with tracer.start_as_current_span(
+            "supabase.update data_tables_metadata", {"table_id": table_id, "row_count": len(data)}
+        ):
+            await self._execute(self.client.table("data_tables_metadata").update({
+                "row_count": len(data),
+                "columns": _column_schema(column_types),
+                "file_fingerprint": None,
+                "source": None,
+                "status": ProcessingStatusEnum.COMPLETED.value,
+            }).eq("id", table_id))
+        
+        logger.info(
+            f"Updated table {table_id}: {len(diff['inserts'])} inserted, "
+            f"{len(diff['updates'])} updated, {diff['deleted']} deleted, {diff['unchanged']} unchanged"
+        )
+        return {
+            "inserted": len(diff["inserts"]),
+            "updated": len(diff["updates"]),
+            "deleted": diff["deleted"],
+            "unchanged": diff["unchanged"],
+        }
+    
+    async def _upsert_rows(
+        self,
+        workspace_id: str,
+        table_id: str,
+        data: List[Dict[str, Any]],
+        row_hashes: List[int],
+        changed: List[int],
+        deleted: int,
+    ) -> None:
+        """``update_excel_data`` writes for a ``jsonb`` table"""
+        rows_to_upsert = [
+            {
+                "table_id": table_id,
+                "workspace_id": workspace_id,
+                "row_number": row_number,
+                "row_data": data[row_number - 1],
+                "row_hash": row_hashes[row_number - 1],
+            }
+            for row_number in changed
+        ]
+        
+        pending = -(-len(rows_to_upsert) // BATCH_SIZE)
+        STORAGE_BATCHES_PENDING.inc(pending)
+        try:
+            for i in range(0, len(rows_to_upsert), BATCH_SIZE):
+                batch = rows_to_upsert[i:i + BATCH_SIZE]
+                with observe_stage(
+                    "storage_batch",
+                    table_id,
+                    table_id=table_id,
+                    batch_index=i // BATCH_SIZE,
+                    rows=len(batch),
+                ):
+                    await self._execute(
+                        self.client.table("data_table_rows").upsert(batch, on_conflict="table_id,row_number")
+                    )
+                pending -= 1
+                STORAGE_BATCHES_PENDING.dec()
+        finally:
+            STORAGE_BATCHES_PENDING.dec(pending)
+        
+        if deleted:
+            with tracer.start_as_current_span(
+                "supabase.delete data_table_rows", {"table_id": table_id, "rows": deleted}
+            ):
+                await self._execute(
+                    self.client.table("data_table_rows").delete().eq(
+                        "table_id", table_id
+                    ).gt("row_number", len(data))
+                )
+    
+    async def _rewrite_blocks(
+        self,
+        workspace_id: str,
+        table_id: str,
+        data: List[Dict[str, Any]],
+        row_hashes: List[int],
+        blocks: List[Dict[str, Any]],
+        changed: List[int],
+    ) -> None:
+        """``update_excel_data`` writes for a ``zstd_blocks`` table"""
+        writes = plan_block_writes(
+            [(block["first_row"], block["last_row"]) for block in blocks], changed, len(data), self.block_rows
+        )
+        STORAGE_BATCHES_PENDING.inc(len(writes))
+        pending = len(writes)
+        try:
+            for batch_index, (first, last) in enumerate(writes):
+                with observe_stage(
+                    "storage_batch",
+                    table_id,
+                    table_id=table_id,
+                    batch_index=batch_index,
+                    rows=last - first + 1,
+                ):
+                    record = await run_in_threadpool(
+                        block_record, workspace_id, table_id, first, data[first - 1:last], row_hashes[first - 1:last]
+                    )
+                    await self._execute(
+                        self.client.table(BLOCKS_TABLE).upsert(
+                            [record], on_conflict="table_id,first_row", returning="minimal"
+                        )
+                    )
+                pending -= 1
+                STORAGE_BATCHES_PENDING.dec()
+        finally:
+            STORAGE_BATCHES_PENDING.dec(pending)
+        
+        if blocks and blocks[-1]["first_row"] > len(data):
+            with tracer.start_as_current_span(
+                "supabase.delete data_table_blocks", {"table_id": table_id}
+            ):
+                await self._execute(
+                    self.client.table(BLOCKS_TABLE).delete().eq(
+                        "table_id", table_id
+                    ).gt("first_row", len(data))
+                )
+    
+    async def find_tables_by_fingerprint(
+        self,
+        workspace_id: str,
+        fingerprint: str
+    ) -> List[Dict[str, Any]]:
+        """Fully stored tables of the workspace tagged with ``fingerprint``, newest first"""
+        with tracer.start_as_current_span(
+            "supabase.select data_tables_metadata", {"workspace_id": workspace_id}
+        ):
+            result = await self._execute(
+                self.client.table("data_tables_metadata").select(
+                    "id, table_name, row_count, source, created_at"
+                ).eq("workspace_id", workspace_id).eq(
+                    "file_fingerprint", fingerprint
+                ).order("created_at", desc=True)
+            )
+        return result.data or []
+    
+    async def reserve_upload(self, workspace_id: str, fingerprint: str) -> Optional[str]:
+        """
+        Reserve ``fingerprint`` in the workspace for one ingest.
+
+        Inserts a ``processing`` row keyed on ``(workspace_id,
+        file_fingerprint)``; the conflict is ignored, so the row comes back
+        only if this call created it. A reservation older than
+        ``settings.upload_reservation_ttl_s`` (its instance died mid-ingest)
+        is taken over. Returns the token to release it with, or None while
+        another upload holds it.
+        """
+        token = str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+        reservation = {
+            "workspace_id": workspace_id,
+            "file_fingerprint": fingerprint,
+            "token": token,
+            "status": ProcessingStatusEnum.PROCESSING.value,
+            "reserved_at": now.isoformat(),
+        }
+        with tracer.start_as_current_span("supabase.upsert upload_reservations", {"workspace_id": workspace_id}):
+            result = await self._execute(
+                self.client.table(RESERVATIONS_TABLE).upsert(
+                    reservation, on_conflict="workspace_id,file_fingerprint", ignore_duplicates=True
+                )
+            )
+            if result.data:
+                return token
+            stale = now - timedelta(seconds=settings.upload_reservation_ttl_s)
+            result = await self._execute(
+                self.client.table(RESERVATIONS_TABLE).update(
+                    {"token": token, "reserved_at": now.isoformat()}
+                ).eq("workspace_id", workspace_id).eq("file_fingerprint", fingerprint).lt(
+                    "reserved_at", stale.isoformat()
+                )
+            )
+        if result.data:
+            logger.warning(f"Took over a stale upload reservation in workspace {workspace_id}")
+            return token
+        return None
+    
+    async def release_upload(self, workspace_id: str, fingerprint: str, token: str) -> None:
+        """Delete the reservation taken with ``token`` (a no-op if it was taken over)"""
+        with tracer.start_as_current_span("supabase.delete upload_reservations", {"workspace_id": workspace_id}):
+            await self._execute(
+                self.client.table(RESERVATIONS_TABLE).delete().eq(
+                    "workspace_id", workspace_id
+                ).eq("file_fingerprint", fingerprint).eq("token", token)
+            )
+    
     async def get_table_data(
         self,
         table_id: str,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        row_format: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        """Retrieves data from a stored table"""
+        """
+        Retrieves data from a stored table
+
+        ``row_format`` is the table's (from its metadata). For ``zstd_blocks``
+        the blocks overlapping the page are read and decompressed (in the
+        threadpool) and the page is cut out of their rows.
+        """
         try:
-            result = self.client.table("data_table_rows").select("row_data, row_number").eq(
-                "table_id", table_id
-            ).order("row_number").range(offset, offset + limit - 1).execute()
+            if row_format == ROW_FORMAT_BLOCKS:
+                return await self._read_blocks(table_id, limit, offset)
+            result = await self._execute(
+                self.client.table("data_table_rows").select("row_data, row_number").eq(
+                    "table_id", table_id
+                ).order("row_number").range(offset, offset + limit - 1)
+            )
             
             if result.data:
                 return [row["row_data"] for row in result.data]
@@ -112,3 +789,41 @@ class DataStorageService:
         except Exception as e:
             logger.error(f"Error retrieving table data: {str(e)}")
             raise
+    
+    async def get_table_columns(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> Dict[str, List[Any]]:
+        """
+        A page of a stored table as ``{column: values}`` (``names`` first), for
+        the Arrow responses. ``zstd_blocks`` pages are cut out of the blocks'
+        columns as decoded; jsonb rows are transposed.
+        """
+        if row_format == ROW_FORMAT_BLOCKS:
+            blocks = await self._blocks_for_page(table_id, limit, offset)
+            skip = offset + 1 - blocks[0]["first_row"] if blocks else 0
+            return await run_in_threadpool(decode_block_columns, blocks, skip, limit, names or [])
+        rows = await self.get_table_data(table_id, limit=limit, offset=offset, row_format=row_format)
+        return records_to_columns(rows, names or [])
+    
+    async def _blocks_for_page(self, table_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """The blocks holding rows ``offset + 1 .. offset + limit``, in order"""
+        result = await self._execute(
+            self.client.table(BLOCKS_TABLE).select("first_row, last_row, raw_bytes, payload").eq(
+                "table_id", table_id
+            ).gte("last_row", offset + 1).lte("first_row", offset + limit).order("first_row")
+        )
+        return result.data or []
+    
+    async def _read_blocks(self, table_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Rows ``offset + 1 .. offset + limit`` of a ``zstd_blocks`` table"""
+        blocks = await self._blocks_for_page(table_id, limit, offset)
+        if not blocks:
+            return []
+        rows = await run_in_threadpool(decode_block_records, blocks)
+        start = offset + 1 - blocks[0]["first_row"]
+        return rows[start:start + limit]
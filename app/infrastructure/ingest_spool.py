@@ -0,0 +1,50 @@
+"""
+Local spool for rows that could not be stored.
+
+When a sheet fails part-way through storage, the rows that were not
+committed are written here (one file per table) so a resume call can finish
+the table without the client re-uploading and the service re-parsing the
+workbook. The spool lives on local disk: it survives retries within the same
+instance but not a redeploy, in which case the client re-uploads (see the
+update mode of /process, which then only writes the missing rows).
+"""
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+from app.utils.serialization import dumps
+
+_TABLE_ID_RE = re.compile(r"[A-Za-z0-9-]+")
+
+
+class IngestSpool:
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, table_id: str) -> Optional[Path]:
+        # table_id comes from the URL on resume: never let it escape the directory
+        if not _TABLE_ID_RE.fullmatch(table_id):
+            return None
+        return self.directory / f"{table_id}.json"
+
+    def save(self, table_id: str, payload: Dict[str, Any]) -> None:
+        path = self._path(table_id)
+        if path is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(dumps(payload))
+        tmp.replace(path)
+
+    def load(self, table_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(table_id)
+        if path is None or not path.exists():
+            return None
+        return orjson.loads(path.read_bytes())
+
+    def discard(self, table_id: str) -> None:
+        path = self._path(table_id)
+        if path is not None:
+            path.unlink(missing_ok=True)
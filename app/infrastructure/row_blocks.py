@@ -0,0 +1,181 @@
+"""
+Compressed row blocks (``STORAGE_ROW_FORMAT=zstd_blocks``, migration 007).
+
+Instead of one ``data_table_rows`` record per row, a run of consecutive rows
+is stored as one ``data_table_blocks`` record: the column names once and the
+values column by column, encoded with the same JSON encoder as ``row_data``
+(a row decodes to exactly what its JSONB row would hold) and
+zstd-compressed. The compressed payload travels through PostgREST as a
+``\\x`` hex string into a ``bytea`` column. The codec is pyarrow's, imported
+on first use.
+"""
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+from app.utils.arrow import records_to_columns
+from app.utils.serialization import dumps
+
+BLOCKS_TABLE = "data_table_blocks"
+BLOCK_CODEC = "zstd"
+# Level 1 compressed the benchmark tables as well as 3-9 at a fraction of the time
+BLOCK_COMPRESSION_LEVEL = 1
+
+
+def _codec() -> Any:
+    import pyarrow as pa
+
+    return pa.Codec(BLOCK_CODEC, compression_level=BLOCK_COMPRESSION_LEVEL)
+
+
+def encode_block(rows: Sequence[Dict[str, Any]]) -> Tuple[bytes, int]:
+    """Compressed payload for ``rows`` and its uncompressed size"""
+    columns = records_to_columns(list(rows))
+    block: Dict[str, Any] = {"rows": len(rows), "columns": list(columns), "values": list(columns.values())}
+    if any(len(row) != len(columns) for row in rows):
+        # Keys absent from some rows are recorded so they do not come back as nulls
+        block["missing"] = {
+            position: [index for index, row in enumerate(rows) if name not in row]
+            for position, name in enumerate(columns)
+            if any(name not in row for row in rows)
+        }
+    raw = dumps(block)
+    return _codec().compress(raw, asbytes=True), len(raw)
+
+
+def _load_block(payload: bytes, raw_bytes: int) -> Dict[str, Any]:
+    return orjson.loads(_codec().decompress(payload, decompressed_size=raw_bytes, asbytes=True))
+
+
+def decode_block(payload: bytes, raw_bytes: int) -> List[Dict[str, Any]]:
+    """Rows of a payload written by ``encode_block``"""
+    block = _load_block(payload, raw_bytes)
+    names = block["columns"]
+    if not names:
+        return [{} for _ in range(block["rows"])]
+    rows = [dict(zip(names, values)) for values in zip(*block["values"])]
+    for position, indexes in block.get("missing", {}).items():
+        for index in indexes:
+            del rows[index][names[int(position)]]
+    return rows
+
+
+def to_bytea(payload: bytes) -> str:
+    """PostgREST input for a ``bytea`` column"""
+    return "\\x" + payload.hex()
+
+
+def from_bytea(value: str) -> bytes:
+    """``bytea`` as returned by PostgREST (hex output format)"""
+    return bytes.fromhex(value[2:])
+
+
+def block_record(
+    workspace_id: str,
+    table_id: str,
+    first_row: int,
+    rows: Sequence[Dict[str, Any]],
+    row_hashes: Optional[Sequence[Optional[int]]] = None,
+) -> Dict[str, Any]:
+    """``data_table_blocks`` record for ``rows``, numbered from ``first_row``"""
+    payload, raw_bytes = encode_block(rows)
+    hashes = list(row_hashes) if row_hashes is not None else []
+    return {
+        "table_id": table_id,
+        "workspace_id": workspace_id,
+        "first_row": first_row,
+        "last_row": first_row + len(rows) - 1,
+        "row_hashes": hashes if any(h is not None for h in hashes) else None,
+        "raw_bytes": raw_bytes,
+        "payload": to_bytea(payload),
+    }
+
+
+def block_from_row_payloads(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One block from consecutive ``data_table_rows`` records (as built for a batch)"""
+    return block_record(
+        rows[0]["workspace_id"],
+        rows[0]["table_id"],
+        rows[0]["row_number"],
+        [row["row_data"] for row in rows],
+        [row.get("row_hash") for row in rows],
+    )
+
+
+def decode_block_records(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows of consecutive ``data_table_blocks`` records, in order"""
+    rows: List[Dict[str, Any]] = []
+    for block in blocks:
+        rows.extend(decode_block(from_bytea(block["payload"]), block["raw_bytes"]))
+    return rows
+
+
+def decode_block_columns(
+    blocks: List[Dict[str, Any]],
+    skip: int,
+    limit: int,
+    names: Sequence[str] = (),
+) -> Dict[str, List[Any]]:
+    """
+    Columns of ``limit`` rows of consecutive ``data_table_blocks`` records,
+    starting ``skip`` rows into the first one. The blocks are already stored
+    column by column, so each column's slice is appended as decoded, without
+    building row dicts. Same columns as ``records_to_columns(rows, names)`` over
+    those rows: ``names`` first, a key absent from a row is null, and a key
+    absent from every row of the page is left out.
+    """
+    columns: Dict[str, List[Any]] = {name: [] for name in names}
+    position = taken = 0
+    for record in blocks:
+        block = _load_block(from_bytea(record["payload"]), record["raw_bytes"])
+        start = max(skip - position, 0)
+        stop = min(block["rows"], skip + limit - position)
+        position += block["rows"]
+        if stop <= start:
+            continue
+        missing = block.get("missing", {})
+        for index, (name, values) in enumerate(zip(block["columns"], block["values"])):
+            absent = sum(start <= row < stop for row in missing.get(str(index), ()))
+            if absent == stop - start and name not in columns:
+                continue
+            columns.setdefault(name, [None] * taken).extend(values[start:stop])
+        taken += stop - start
+        for values in columns.values():
+            values.extend([None] * (taken - len(values)))
+    return columns
+
+
+def plan_block_writes(
+    stored: Iterable[Tuple[int, int]],
+    changed_rows: Iterable[int],
+    total_rows: int,
+    block_rows: int,
+) -> List[Tuple[int, int]]:
+    """
+    ``(first_row, last_row)`` of the blocks to (re)write so that the stored
+    blocks ``stored`` hold a table of ``total_rows`` rows whose
+    ``changed_rows`` are new or modified.
+
+    Existing blocks keep their boundaries and are rewritten only if one of
+    their rows changed or the table now ends inside them; a short last block
+    is filled up to ``block_rows`` before new blocks are appended. Blocks
+    starting after ``total_rows`` are not returned: the caller deletes them.
+    """
+    stored = sorted(stored)
+    changed = sorted(set(changed_rows))
+    writes: List[Tuple[int, int]] = []
+    covered = 0
+    for index, (first, last) in enumerate(stored):
+        if first > total_rows:
+            break
+        new_last = min(last, total_rows)
+        if index == len(stored) - 1 and total_rows > last:
+            new_last = min(max(last, first + block_rows - 1), total_rows)
+        position = bisect_left(changed, first)
+        if new_last != last or (position < len(changed) and changed[position] <= new_last):
+            writes.append((first, new_last))
+        covered = new_last
+    for first in range(covered + 1, total_rows + 1, block_rows):
+        writes.append((first, min(first + block_rows - 1, total_rows)))
+    return writes
@@ -1,16 +1,54 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from app.config import settings
+from app.observability import (
+    loop_monitor,
+    RequestMetricsMiddleware,
+    RequestTimingMiddleware,
+    TracingMiddleware,
+    configure_tracing,
+    render_metrics,
+    tracer,
+)
+from app.observability.metrics import CONTENT_TYPE_LATEST, ERRORS, THREADPOOL_BUSY
 from app.routes import excel
+from app.services.parse_pool import parse_pool
+from app.services.warmup import warmup
+from contextlib import asynccontextmanager
 from datetime import datetime
+import anyio
 import time
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranca el monitor de event loop y el warm-up mientras el servidor está vivo"""
+    if settings.loop_monitor_enabled:
+        loop_monitor.configure(
+            interval=settings.loop_monitor_interval_ms / 1000,
+            block_threshold=settings.loop_block_threshold_ms / 1000,
+        )
+        loop_monitor.start()
+    if settings.warmup_enabled:
+        # Corre en segundo plano: /health responde mientras pandas y openpyxl se cargan
+        warmup.start()
+    yield
+    await warmup.stop()
+    await loop_monitor.stop()
+    await anyio.to_thread.run_sync(parse_pool.shutdown)
+    await anyio.to_thread.run_sync(tracer.shutdown)
+
+
 app = FastAPI(
     title="Bento Excel Service",
     description="Microservicio para procesamiento de archivos Excel",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 startup_time = time.time()
@@ -24,10 +62,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+configure_tracing(settings.tracing_exporter, settings.tracing_file)
+
+app.add_middleware(RequestTimingMiddleware, prefix="/api/excel")
+app.add_middleware(RequestMetricsMiddleware, prefix="/api/excel")
+app.add_middleware(TracingMiddleware, prefix="/api/excel")
+
 # Incluir rutas
 app.include_router(excel.router, prefix="/api/excel", tags=["excel"])
 
 
+def _count_error(request: Request, error_code: str) -> None:
+    if request.url.path.startswith("/api/excel"):
+        route = request.scope.get("route")
+        ERRORS.labels(
+            route=route.path if route is not None else request.url.path,
+            error_code=error_code,
+        ).inc()
+
+
+@app.exception_handler(HTTPException)
+async def count_http_exception(request: Request, exc: HTTPException):
+    """Count error responses by error_code before delegating to FastAPI"""
+    error_code = exc.detail.get("error_code") if isinstance(exc.detail, dict) else None
+    _count_error(request, error_code or f"HTTP_{exc.status_code}")
+    return await http_exception_handler(request, exc)
+
+
+@app.exception_handler(RequestValidationError)
+async def count_validation_exception(request: Request, exc: RequestValidationError):
+    _count_error(request, "REQUEST_VALIDATION_ERROR")
+    return await request_validation_exception_handler(request, exc)
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -52,3 +119,23 @@ async def health_check():
         "supabase_configured": bool(settings.supabase_url),
         "environment": settings.app_env if hasattr(settings, 'app_env') else "unknown",
     }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 503 hasta que el warm-up del pipeline terminó"""
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content={
+            "status": "ready" if warmup.ready else "warming_up",
+            "uptime_seconds": round(time.time() - startup_time, 2),
+            "warmup": warmup.status(),
+        },
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas en formato Prometheus"""
+    THREADPOOL_BUSY.set(anyio.to_thread.current_default_thread_limiter().borrowed_tokens)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -2,6 +2,8 @@ from app.models.excel import (
     ExcelUploadRequest,
     ExcelValidationResponse,
     ExcelProcessResponse,
+    ExcelBatchResponse,
+    BatchFileResult,
     SheetProcessingResult,
 )
 from app.models.response import SuccessResponse, ErrorResponse, ProcessingStatus
@@ -10,6 +12,8 @@ __all__ = [
     "ExcelUploadRequest",
     "ExcelValidationResponse",
     "ExcelProcessResponse",
+    "ExcelBatchResponse",
+    "BatchFileResult",
     "SheetProcessingResult",
     "SuccessResponse",
     "ErrorResponse",
@@ -89,12 +89,23 @@ class SheetProcessingResult(BaseModel):
     widget_suggestions: List[Dict[str, Any]]  # auto-generated widget configs
     suggests_user_import: bool = False
     user_columns: Optional[Dict[str, str]] = None  # {"email": "Correo", ...}
+    storage_status: Optional[str] = None  # "completed" | "partial" (resumable) | "failed"
+    table_id: Optional[str] = None        # set when storage_status == "partial"
 
 
 # ---------------------------------------------------------------------------
 # Top-level /process response — replaces flat ExcelProcessingResult
 # ---------------------------------------------------------------------------
 
+class TableDiff(BaseModel):
+    """Rows written when /process updates an existing table (table_id)"""
+    table_id: str
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
 class ExcelProcessResponse(BaseModel):
     """Multi-sheet response for POST /api/excel/process"""
     success: bool
@@ -104,6 +115,32 @@ class ExcelProcessResponse(BaseModel):
     tables: List[str]                     # all table_names created
     processing_time: float
     widgets_created: int
+    duplicate: bool = False               # same file already ingested: existing tables returned
+    diff: Optional[TableDiff] = None      # update mode only
+    dashboard_id: Optional[str] = None    # create_dashboard only
+
+
+class BatchFileResult(BaseModel):
+    """Outcome of one file of POST /api/excel/process-batch"""
+    index: int                            # position of the file in the request
+    filename: str
+    success: bool
+    status_code: int                      # what /process would have answered for this file
+    processing_time: float
+    result: Optional[ExcelProcessResponse] = None  # success only
+    error: Optional[str] = None
+    error_code: Optional[str] = None
+
+
+class ExcelBatchResponse(BaseModel):
+    """Response for POST /api/excel/process-batch"""
+    success: bool                         # every file succeeded
+    message: str
+    files_total: int
+    files_succeeded: int
+    files_failed: int
+    files: List[BatchFileResult]          # in upload order
+    processing_time: float
 
 
 # ---------------------------------------------------------------------------
@@ -120,6 +157,7 @@ class ExcelProcessingResult(BaseModel):
     widgets_created: int
     processing_time: float
     message: str
+    duplicate: bool = False
 
 
 class DataPreview(BaseModel):
@@ -0,0 +1,21 @@
+"""Observability: metrics, per-request timings, tracing, profiling and memory"""
+from .loop_monitor import loop_monitor
+from .memory import annotate_workbook, track_memory
+from .metrics import observe_stage, render_metrics
+from .middleware import RequestMetricsMiddleware
+from .timing import RequestTimingMiddleware
+from .tracing import TracingMiddleware, configure_tracing, current_span, tracer
+
+__all__ = [
+    'annotate_workbook',
+    'loop_monitor',
+    'observe_stage',
+    'render_metrics',
+    'RequestMetricsMiddleware',
+    'RequestTimingMiddleware',
+    'TracingMiddleware',
+    'configure_tracing',
+    'current_span',
+    'tracer',
+    'track_memory',
+]
@@ -0,0 +1,120 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+A coroutine wakes up every ``interval`` seconds and records how late it
+was (the loop lag) into a Prometheus histogram. A watchdog thread watches
+that heartbeat: when the loop has not ticked for longer than
+``block_threshold`` it grabs the loop thread's current Python stack and logs
+it together with the route of the task that is hogging the loop.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = Histogram(
+    "excel_event_loop_lag_seconds",
+    "Delay between when the loop monitor should have woken up and when it did",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_LAG_LAST = Gauge("excel_event_loop_lag_last_seconds", "Most recent event-loop lag sample")
+LOOP_BLOCKED = Counter(
+    "excel_event_loop_blocked", "Times the event loop was blocked past the threshold", ["route"]
+)
+
+_STACK_LIMIT = 25
+
+
+class EventLoopMonitor:
+    def __init__(self, interval: float = 0.1, block_threshold: float = 0.25):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._routes: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+        self.blocked_events = 0
+
+    def configure(self, interval: float, block_threshold: float) -> None:
+        self.interval = interval
+        self.block_threshold = block_threshold
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def tag_current_task(self, route: str) -> None:
+        """Remember which route the current task serves (for block reports)."""
+        task = asyncio.current_task()
+        if task is not None:
+            self._routes[task] = route
+
+    def start(self) -> None:
+        """Start monitoring the running loop. Must be called from inside it."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _tick(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        while not self._stop.wait(self.block_threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.block_threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            self._report_block(stalled)
+
+    def _report_block(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        route = self._routes.get(task, "unknown") if task is not None else "unknown"
+        stack = "".join(traceback.format_stack(frame, limit=_STACK_LIMIT)) if frame else "<no frame>"
+
+        self.blocked_events += 1
+        LOOP_BLOCKED.labels(route=route).inc()
+        logger.warning(
+            f"[loop] Event loop blocked for {stalled * 1000:.0f} ms+ on route '{route}'\n{stack}"
+        )
+
+
+loop_monitor = EventLoopMonitor()
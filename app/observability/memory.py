@@ -0,0 +1,151 @@
+"""
+Per-request memory accounting.
+
+``track_memory(stage)`` wraps the heavy route stages (validate, parse,
+store) and records:
+
+- the RSS delta of the process (cheap, always on unless disabled), and
+- the tracemalloc peak above the stage's starting point, when
+  ``settings.memory_tracemalloc`` is set (costly: tracemalloc slows every
+  allocation down, so keep it for staging or short investigations).
+
+Both numbers are process-wide. The tracemalloc peak is only kept for a
+stage that ran alone — no other tracked stage was running when it started or
+started before it ended — since ``reset_peak`` and the peak itself are shared
+by every request; an overlapped stage reports ``overlapped: 1`` instead. The
+RSS delta is always recorded as a process-level sample: with concurrent
+requests it includes their growth too, and is still the best signal for which
+workbook shapes push an instance towards its memory limit.
+"""
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import Histogram
+
+from app.config import settings
+from app.observability.timing import current_timings
+
+_MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (1, 5, 10, 25, 50, 100, 200, 300, 400, 512, 1024))
+
+STAGE_PEAK_MEMORY = Histogram(
+    "excel_stage_peak_memory_bytes",
+    "tracemalloc peak allocated during a pipeline stage that ran alone (above its starting point)",
+    ["stage"],
+    buckets=_MEMORY_BUCKETS,
+)
+STAGE_RSS_DELTA = Histogram(
+    "excel_stage_rss_delta_bytes",
+    "Growth of the process RSS across a pipeline stage (process-level, includes concurrent requests)",
+    ["stage", "size_class"],
+    buckets=_MEMORY_BUCKETS,
+)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_tracemalloc_lock = threading.Lock()
+
+
+class _StageOverlap:
+    """Counts running tracked stages to tell which ones ran alone"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.running = 0
+        self.started = 0
+
+    def enter(self) -> Optional[int]:
+        """Token for a stage starting with nothing else running, else None"""
+        with self._lock:
+            self.running += 1
+            self.started += 1
+            return self.started if self.running == 1 else None
+
+    def exit(self, token: Optional[int]) -> bool:
+        """True when the stage that got ``token`` ran alone until now"""
+        with self._lock:
+            self.running -= 1
+            return token is not None and self.started == token
+
+
+_overlap = _StageOverlap()
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # No procfs (macOS/Windows dev machines): fall back to the peak RSS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def size_class(file_size: Optional[int]) -> str:
+    """Coarse upload-size bucket used as a metric label."""
+    if file_size is None:
+        return "unknown"
+    for limit, label in ((100 * 1024, "lt_100kb"), (1024 * 1024, "lt_1mb"), (5 * 1024 * 1024, "lt_5mb")):
+        if file_size < limit:
+            return label
+    return "gte_5mb"
+
+
+def _ensure_tracemalloc() -> bool:
+    if not settings.memory_tracemalloc:
+        return False
+    with _tracemalloc_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    return True
+
+
+@contextmanager
+def track_memory(stage: str, file_size: Optional[int] = None) -> Iterator[None]:
+    """Measure RSS growth (and tracemalloc peak if enabled) across the block."""
+    if not settings.memory_tracking_enabled:
+        yield
+        return
+
+    use_tracemalloc = _ensure_tracemalloc()
+    token = _overlap.enter()
+    if use_tracemalloc and token is not None:
+        # Resetting the peak while another stage runs would clobber its figure
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    rss_before = rss_bytes()
+    try:
+        yield
+    finally:
+        ran_alone = _overlap.exit(token)
+        rss_delta = max(0, rss_bytes() - rss_before)
+        entry: Dict[str, int] = {"rss_delta": rss_delta, "rss": rss_before + rss_delta}
+        STAGE_RSS_DELTA.labels(stage=stage, size_class=size_class(file_size)).observe(rss_delta)
+        if not ran_alone:
+            entry["overlapped"] = 1
+        elif use_tracemalloc:
+            _, peak = tracemalloc.get_traced_memory()
+            entry["peak"] = max(0, peak - baseline)
+            STAGE_PEAK_MEMORY.labels(stage=stage).observe(entry["peak"])
+
+        timings = current_timings()
+        if timings is not None:
+            timings.add_memory(stage, entry)
+
+
+def annotate_workbook(rows: int, columns: int, sheets: int, file_size: int) -> None:
+    """Attach the workbook shape to the current request's log line."""
+    timings = current_timings()
+    if timings is not None:
+        timings.annotate(workbook={
+            "rows": rows,
+            "columns": columns,
+            "sheets": sheets,
+            "bytes": file_size,
+            "size_class": size_class(file_size),
+        })
+
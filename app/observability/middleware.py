@@ -0,0 +1,63 @@
+"""ASGI middleware that measures Excel routes end to end"""
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.observability.loop_monitor import loop_monitor
+from app.observability.metrics import INFLIGHT_REQUESTS, REQUEST_DURATION
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that will serve ``scope`` (``/tables/{table_id}/data``),
+    matched the same way the router does, or ``"unmatched"``. Never the raw
+    path, whose ids would give metric labels unbounded cardinality.
+    """
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """
+    Observes total request time and in-flight count for paths under
+    ``prefix``. Implemented as plain ASGI (not BaseHTTPMiddleware) so
+    streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api/excel"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        INFLIGHT_REQUESTS.inc()
+        # Tagged before the route runs, so a block anywhere in it is attributed
+        loop_monitor.tag_current_task(f"{scope['method']} {route_template(scope)}")
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            INFLIGHT_REQUESTS.dec()
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                route=route.path if route is not None else scope["path"],
+                status=str(status),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,101 @@
+"""
+On-demand sampling profiler for single requests.
+
+A background thread samples the Python stacks of every other thread at a
+fixed interval and writes them in collapsed-stack format (one
+``frame;frame;frame count`` line per distinct stack), which speedscope,
+flamegraph.pl and py-spy's viewers all read.
+
+Enabled for a request when ``settings.profiling_enabled`` is set, or when
+the request carries ``X-Profile-Token`` equal to ``settings.profiling_token``.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from starlette.types import Scope
+
+from app.config import settings
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+class SamplingProfiler:
+    """Collects stack samples from all threads except its own"""
+
+    def __init__(self, interval: float = 0.005, max_duration: float = 120.0):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + self.max_duration
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            for stack, count in self.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    def __init__(self, filename: str):
+        self.filename = filename
+
+
+def _wants_profile(scope: Scope) -> bool:
+    if settings.profiling_enabled:
+        return True
+    if not settings.profiling_token:
+        return False
+    token = dict(scope.get("headers") or []).get(PROFILE_HEADER)
+    return token is not None and token.decode("latin-1") == settings.profiling_token
+
+
+@contextmanager
+def profile_request(scope: Scope) -> Iterator[Optional[ProfileSession]]:
+    """Profile the wrapped request if it opted in; yields None otherwise."""
+    if not _wants_profile(scope):
+        yield None
+        return
+
+    route = scope["path"].strip("/").replace("/", "_") or "root"
+    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{route}_{uuid.uuid4().hex[:8]}.folded"
+    profiler = SamplingProfiler(interval=settings.profiling_interval_ms / 1000)
+    profiler.start()
+    try:
+        yield ProfileSession(filename)
+    finally:
+        profiler.stop()
+        profiler.write(Path(settings.profiling_dir) / filename)
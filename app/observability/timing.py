@@ -0,0 +1,132 @@
+"""Per-request stage timings (Server-Timing header + structured log line)"""
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.observability.profiler import profile_request
+
+logger = logging.getLogger(__name__)
+
+_current_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class RequestTimings:
+    """
+    Stage durations for one request.
+
+    Repeated stages with the same detail are aggregated (e.g. every
+    ``storage_batch`` of a sheet becomes a single entry with a count), so
+    the header stays small for workbooks with hundreds of batches.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._stages: Dict[Tuple[str, Optional[str]], List[float]] = {}
+        self.memory: Dict[str, Dict[str, int]] = {}
+        self.annotations: Dict[str, Any] = {}
+
+    def add(self, stage: str, duration: float, detail: Optional[str] = None) -> None:
+        entry = self._stages.setdefault((stage, detail), [0.0, 0])
+        entry[0] += duration
+        entry[1] += 1
+
+    def add_memory(self, stage: str, entry: Dict[str, int]) -> None:
+        """Keep the largest figures seen for ``stage`` (e.g. one per sheet)."""
+        current = self.memory.setdefault(stage, {})
+        for key, value in entry.items():
+            current[key] = max(current.get(key, 0), value)
+
+    def annotate(self, **values: Any) -> None:
+        """Extra fields for the request's log line (e.g. the workbook shape)."""
+        self.annotations.update(values)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def entries(self) -> List[Dict[str, object]]:
+        return [
+            {"stage": stage, "detail": detail, "dur_ms": round(total * 1000, 3), "count": count}
+            for (stage, detail), (total, count) in self._stages.items()
+        ]
+
+    def server_timing(self) -> str:
+        """Render as a ``Server-Timing`` header value (durations in ms)."""
+        parts = []
+        for entry in self.entries():
+            desc = entry["detail"] or ""
+            if entry["count"] > 1:
+                desc = f"{desc} x{entry['count']}".strip()
+            item = _TOKEN_RE.sub("_", str(entry["stage"]))
+            if desc:
+                item += f';desc="{desc.replace(chr(34), "")}"'
+            parts.append(f"{item};dur={entry['dur_ms']}")
+        parts.append(f"total;dur={round(self.elapsed * 1000, 3)}")
+        return ", ".join(parts)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record_stage(stage: str, duration: float, detail: Optional[str] = None) -> None:
+    """Add a stage duration to the current request, if there is one."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, duration, detail)
+
+
+class RequestTimingMiddleware:
+    """
+    Collects stage timings for every request under ``prefix``, sends them in
+    a ``Server-Timing`` header and logs one ``[timing]`` JSON line per request.
+    Also starts the on-demand sampling profiler when the request opts in.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api/excel"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing())
+                if profile is not None:
+                    headers.append("X-Profile-File", profile.filename)
+            await send(message)
+
+        with profile_request(scope) as profile:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                _current_timings.reset(token)
+                record = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "total_ms": round(timings.elapsed * 1000, 3),
+                    "stages": timings.entries(),
+                    **timings.annotations,
+                }
+                if timings.memory:
+                    record["memory"] = timings.memory
+                logger.info("[timing] " + json.dumps(record))
@@ -0,0 +1,302 @@
+"""
+Lightweight OpenTelemetry-style tracing for the ingestion pipeline.
+
+Spans nest through a context variable (so they follow the request into the
+threadpool) and are handed to a pluggable exporter when they end:
+
+- ``InMemorySpanExporter`` — for tests
+- ``JsonlFileSpanExporter`` — one JSON object per line, for offline analysis
+  (``python -m app.observability.tracing traces/spans.jsonl``), written by a
+  background thread so ending a span never touches the disk on the event loop
+
+With no exporter configured spans are not recorded at all.
+"""
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A timed operation with attributes, linked to its parent by id"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = "OK"
+        self.events: List[Dict[str, Any]] = []
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.events.append({
+            "name": "exception",
+            "time": time.time_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        })
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time if self.end_time is not None else time.time_ns()
+        return (end - self.start_time) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; accepts and drops everything"""
+    trace_id = span_id = parent_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class InMemorySpanExporter:
+    def __init__(self) -> None:
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonlFileSpanExporter:
+    """
+    ``export`` only queues the span; a writer thread (started on the first
+    span) drains the queue and appends everything queued so far in one write.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="span-writer", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [span for span in batch if span is not None]
+            try:
+                if spans:
+                    lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+                    with open(self.path, "a", encoding="utf-8") as fh:
+                        fh.write(lines)
+            except OSError as e:
+                logger.warning(f"[tracing] Could not write {len(spans)} span(s) to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(spans) < len(batch):
+                return
+
+    def flush(self) -> None:
+        """Block until every span exported so far is on disk"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def shutdown(self) -> None:
+        """Write the pending spans and stop the writer thread"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def set_exporter(self, exporter) -> None:
+        self.exporter = exporter
+
+    def shutdown(self) -> None:
+        """Flush an exporter that writes in the background (called on app shutdown)"""
+        shutdown = getattr(self.exporter, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """Open a child of the current span (or a new trace) for the wrapped block."""
+        if self.exporter is None:
+            yield NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent is not None else os.urandom(16).hex(),
+            parent_id=parent.span_id if parent is not None else None,
+            attributes=attributes or {},
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            self.exporter.export(span)
+
+
+tracer = Tracer()
+
+
+def current_span() -> Any:
+    return _current_span.get() or NOOP_SPAN
+
+
+def configure_tracing(exporter_name: str, file_path: str) -> None:
+    """Select the exporter from settings: "", "memory" or "file"."""
+    if exporter_name == "memory":
+        tracer.set_exporter(InMemorySpanExporter())
+    elif exporter_name == "file":
+        tracer.set_exporter(JsonlFileSpanExporter(file_path))
+    else:
+        tracer.set_exporter(None)
+
+
+class TracingMiddleware:
+    """Opens the root span of every request under ``prefix``"""
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api/excel"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix) or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+                span.set_attribute("http.route", route.path)
+
+
+# ---------------------------------------------------------------------------
+# Offline analysis
+# ---------------------------------------------------------------------------
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Walk one trace from its root, always descending into the child that
+    finished last — the chain of spans that determined the total latency.
+    """
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+
+    path = []
+    level = children.get(None, [])
+    while level:
+        span = max(level, key=lambda s: s["end_time"])
+        path.append(span)
+        level = children.get(span["span_id"], [])
+    return path
+
+
+def _print_critical_paths(path: str) -> None:
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            span = json.loads(line)
+            traces.setdefault(span["trace_id"], []).append(span)
+
+    for trace_id, spans in traces.items():
+        chain = critical_path(spans)
+        if not chain:
+            continue
+        print(f"trace {trace_id}  {chain[0]['name']}  {chain[0]['duration_ms']:.1f} ms")
+        for depth, span in enumerate(chain[1:], start=1):
+            attrs = ", ".join(f"{k}={v}" for k, v in span["attributes"].items())
+            print(f"{'  ' * depth}{span['name']}  {span['duration_ms']:.1f} ms  {attrs}")
+
+
+if __name__ == "__main__":
+    _print_critical_paths(sys.argv[1] if len(sys.argv) > 1 else "traces/spans.jsonl")
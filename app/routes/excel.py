@@ -1,30 +1,569 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTasks
+from starlette.datastructures import FormData, UploadFile as SpooledUpload
+from starlette.formparsers import MultiPartException, MultiPartParser
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from app.models import ExcelValidationResponse, SuccessResponse
-from app.models.excel import ExcelProcessingResult, ExcelProcessResponse, SheetProcessingResult
+from app.models.excel import (
+    BatchFileResult,
+    ExcelBatchResponse,
+    ExcelProcessingResult,
+    ExcelProcessResponse,
+    SheetProcessingResult,
+    TableDiff,
+)
 from app.contracts import IExcelProcessor, IDatabaseClient
 from app.factories import get_excel_processor, get_database_client
 from app.config import settings
-from app.services.excel_processor import ExcelProcessingError
+from app.services.admission import AdmissionRejected, Ticket, admission, estimate_cost
+from app.services.exceptions import ExcelProcessingError
+from app.services.upload_registry import build_source, file_fingerprint, latest_complete_upload
+from app.infrastructure.data_storage import PartialIngestError, ResumeUnavailableError
+from app.observability import annotate_workbook, current_span, observe_stage, track_memory
+from app.observability.metrics import BYTES_INGESTED, DUPLICATE_UPLOADS, ROWS_INGESTED, SHEETS_INGESTED
+from app.utils.arrow import ARROW_STREAM_MEDIA_TYPE, columns_to_ipc, rows_to_columns
+from app.utils.serialization import FastJSONResponse, dumps
+import asyncio
+import json
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _wants_ndjson(request: Request) -> bool:
+    """True when the client negotiated a per-sheet NDJSON stream."""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _wants_arrow(request: Request) -> bool:
+    """True when the client negotiated an Arrow IPC stream for row data."""
+    return ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _projection(sheets: Optional[str], columns: Optional[str]) -> Dict[str, List[str]]:
+    """
+    ``sheets``/``columns`` form fields as processor keyword arguments. Each is a
+    comma-separated list or a JSON array (for names containing commas); empty
+    selectors are left out so the processor reads everything.
+    """
+    projection = {}
+    for key, value in (("sheets", sheets), ("columns", columns)):
+        if not value or not value.strip():
+            continue
+        if value.lstrip().startswith("["):
+            try:
+                names = json.loads(value)
+            except ValueError:
+                names = None
+            if not isinstance(names, list):
+                raise HTTPException(
+                    status_code=400,
+                    detail={"error": f"'{key}' no es una lista válida", "error_code": "INVALID_SELECTOR"},
+                )
+            names = [str(name).strip() for name in names]
+        else:
+            names = [name.strip() for name in value.split(",")]
+        names = [name for name in names if name]
+        if names:
+            projection[key] = names
+    return projection
+
+
+def _ndjson_line(payload: Dict[str, Any]) -> bytes:
+    return dumps(payload) + b"\n"
+
+
+def _rejection_detail(rejected: AdmissionRejected) -> Dict[str, Any]:
+    return {
+        "error": (
+            "Demasiados archivos en espera; reintentar más tarde"
+            if rejected.status_code == 429
+            else "El servicio está procesando otros archivos; reintentar más tarde"
+        ),
+        "error_code": "TOO_MANY_REQUESTS" if rejected.status_code == 429 else "SERVER_BUSY",
+        "retry_after": rejected.retry_after,
+    }
+
+
+def _admitted(route: str) -> Callable[..., AsyncIterator[Ticket]]:
+    """
+    Dependency that holds an admission ticket for the request's workbook
+    while the route runs. The cost is estimated from the spooled upload
+    before the route reads it and the ticket is queued under the form's
+    ``workspace_id``; a rejection becomes 429/503 with Retry-After.
+    Streaming routes ``detach()`` the ticket and release it themselves.
+    """
+    async def dependency(request: Request, file: UploadFile = File(...)) -> AsyncIterator[Ticket]:
+        file_size = file.size if file.size is not None else len(await file.read())
+        await file.seek(0)
+        cost = await run_in_threadpool(
+            estimate_cost, file.file, file_size, settings.admission_bytes_per_cell
+        )
+        # The form is already parsed (and cached) for the route's own parameters
+        workspace_id = (await request.form()).get("workspace_id")
+        try:
+            with observe_stage(
+                "admission", route=route, lane=admission.lane_for(cost), memory_bytes=cost.memory_bytes
+            ):
+                ticket = await admission.acquire(cost, route, workspace_id)
+        except AdmissionRejected as rejected:
+            raise HTTPException(
+                status_code=rejected.status_code,
+                detail=_rejection_detail(rejected),
+                headers={"Retry-After": str(rejected.retry_after)},
+            )
+        try:
+            yield ticket
+        finally:
+            if not ticket.detached:
+                ticket.release()
+
+    return dependency
+
+
+async def _release_after(stream: AsyncIterator[bytes], ticket: Ticket) -> AsyncIterator[bytes]:
+    """Hold ``ticket`` until ``stream`` is exhausted or the client disconnects."""
+    try:
+        async for line in stream:
+            yield line
+    finally:
+        ticket.release()
+
+
+def _invalid_file(errors: List[str]) -> HTTPException:
+    """400 for a file ``validate_file`` rejected, shared by /validate and /process."""
+    # Determinar código de error basado en el mensaje
+    error_code = "VALIDATION_ERROR"
+    if errors:
+        error_msg = errors[0].lower()
+        if "corrupto" in error_msg or "dañado" in error_msg:
+            error_code = "CORRUPTED_FILE"
+        elif "vacío" in error_msg:
+            error_code = "EMPTY_FILE"
+        elif "no es un excel válido" in error_msg:
+            error_code = "INVALID_EXCEL_FORMAT"
+        elif "no se pudo leer" in error_msg:
+            error_code = "UNREADABLE_CONTENT"
+        elif "extensión" in error_msg:
+            error_code = "INVALID_FILE_TYPE"
+
+    return HTTPException(
+        status_code=400,
+        detail={
+            "error": errors[0] if errors else "Archivo inválido",
+            "error_code": error_code,
+            "errors": errors
+        }
+    )
+
+
+async def _check_upload(file_content: bytes, filename: str, excel_processor: IExcelProcessor) -> None:
+    """413/400 for a /process upload that is too large or not a readable workbook."""
+    if len(file_content) > settings.max_file_size:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "error": f"Archivo demasiado grande. Máximo: {settings.max_file_size / 1024 / 1024:.0f}MB",
+                "error_code": "FILE_TOO_LARGE"
+            }
+        )
+
+    with observe_stage("validate"), track_memory("validate", len(file_content)):
+        is_valid, errors = await run_in_threadpool(
+            excel_processor.validate_file, file_content, filename
+        )
+    if not is_valid:
+        raise _invalid_file(errors)
+
+
+async def _find_duplicate(
+    db_client: IDatabaseClient,
+    workspace_id: str,
+    fingerprint: str,
+    mode: str,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Results of the newest complete upload of the same file to this workspace,
+    or None. A failed lookup never blocks an upload — it is ingested again.
+    """
+    try:
+        with observe_stage("dedup_lookup"):
+            tables = await db_client.find_tables_by_fingerprint(workspace_id, fingerprint)
+    except Exception as lookup_err:
+        logger.warning(f"[dedup] Fingerprint lookup failed, ingesting anyway: {lookup_err}")
+        return None
+    return latest_complete_upload(tables, mode)
+
+
+async def _reserve_upload(db_client: IDatabaseClient, workspace_id: str, fingerprint: str) -> Optional[str]:
+    """
+    Reserve ``fingerprint`` for this ingest, waiting (up to
+    ``UPLOAD_RESERVATION_WAIT_S``) while an identical upload holds it.
+    Returns the reservation token, or None if reservations are unavailable
+    (the file is ingested anyway, like after a failed lookup); 409
+    ``UPLOAD_IN_PROGRESS`` when the wait runs out.
+    """
+    deadline = time.monotonic() + settings.upload_reservation_wait_s
+    with observe_stage("dedup_reserve"):
+        while True:
+            try:
+                token = await db_client.reserve_upload(workspace_id, fingerprint)
+            except Exception as reserve_err:
+                logger.warning(f"[dedup] Could not reserve the upload, ingesting anyway: {reserve_err}")
+                return None
+            if token is not None:
+                return token
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail={
+                        "error": "El mismo archivo se está procesando en este workspace; reintentar más tarde",
+                        "error_code": "UPLOAD_IN_PROGRESS",
+                    },
+                    headers={"Retry-After": str(max(1, round(settings.upload_reservation_wait_s)))},
+                )
+            await asyncio.sleep(settings.upload_reservation_poll_ms / 1000)
+
+
+async def _release_upload(
+    db_client: IDatabaseClient,
+    workspace_id: str,
+    fingerprint: Optional[str],
+    token: Optional[str],
+) -> None:
+    """Release a reservation from ``_reserve_upload`` (best effort: it expires anyway)."""
+    if token is None or fingerprint is None:
+        return
+    try:
+        await db_client.release_upload(workspace_id, fingerprint, token)
+    except Exception as release_err:
+        logger.warning(f"[dedup] Could not release the upload reservation: {release_err}")
+
+
+async def _duplicate_or_reserve(
+    db_client: IDatabaseClient,
+    workspace_id: str,
+    fingerprint: str,
+    mode: str,
+    force: bool = False,
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    ``(existing, None)`` when the workspace already holds this upload, else
+    ``(None, token)`` with the upload reserved for the caller, who ingests it
+    and then calls ``_release_upload``. An identical upload in progress is
+    waited for, so a double click ingests the file once and the second
+    request gets the first one's tables. ``force`` skips both steps.
+    """
+    if force:
+        return None, None
+    existing = await _find_duplicate(db_client, workspace_id, fingerprint, mode)
+    if existing is not None:
+        return existing, None
+    token = await _reserve_upload(db_client, workspace_id, fingerprint)
+    if token is None:
+        return None, None
+    # The upload that held the reservation (or one that ended since the lookup) may have stored it
+    existing = await _find_duplicate(db_client, workspace_id, fingerprint, mode)
+    if existing is not None:
+        await _release_upload(db_client, workspace_id, fingerprint, token)
+        return existing, None
+    return None, token
+
+
+async def _store_sheet(
+    sheet: Dict[str, Any],
+    workspace_id: str,
+    db_client: IDatabaseClient,
+    file_size: Optional[int] = None,
+    fingerprint: Optional[str] = None,
+    upload_id: Optional[str] = None,
+) -> SheetProcessingResult:
+    """
+    Persist one processed sheet and strip the internal ``_*`` keys.
+
+    The sheet dict is built by ExcelProcessor itself, so the result model is
+    assembled with ``model_construct`` instead of being re-validated. With a
+    ``fingerprint`` the table is tagged so identical re-uploads can reuse it.
+    """
+    raw_data = sheet.pop("_data", [])
+    row_hashes = sheet.pop("_row_hashes", None)
+    sheet_index = sheet.pop("_sheet_index", 0)
+    sheet_count = sheet.pop("_sheet_count", 1)
+    source = (
+        build_source("process", upload_id, sheet_index, sheet_count, dict(sheet))
+        if fingerprint is not None else None
+    )
+    ROWS_INGESTED.inc(sheet["rows"])
+    SHEETS_INGESTED.inc()
+    try:
+        with observe_stage(
+            "storage",
+            sheet["sheet_name"],
+            sheet_name=sheet["sheet_name"],
+            table_name=sheet["table_name"],
+            rows=len(raw_data),
+        ), track_memory("store", file_size):
+            await db_client.store_excel_data(
+                workspace_id=workspace_id,
+                table_name=sheet["table_name"],
+                data=raw_data,
+                column_types=sheet["column_types"],
+                fingerprint=fingerprint,
+                source=source,
+                row_hashes=row_hashes,
+            )
+        sheet["storage_status"] = "completed"
+    except PartialIngestError as partial:
+        logger.warning(f"[process] Sheet '{sheet['sheet_name']}' partially stored: {partial}")
+        sheet["storage_status"] = "partial"
+        sheet["table_id"] = partial.table_id
+    except Exception as store_err:
+        logger.warning(
+            f"[process] Could not persist data for sheet '{sheet['sheet_name']}': {store_err}"
+        )
+        sheet["storage_status"] = "failed"
+    return SheetProcessingResult.model_construct(**sheet)
+
+
+async def _update_table(
+    file_content: bytes,
+    workspace_id: str,
+    table_id: str,
+    sheet_name: Optional[str],
+    excel_processor: IExcelProcessor,
+    db_client: IDatabaseClient,
+    start_time: float,
+    columns: Optional[List[str]] = None,
+    sheets: Optional[List[str]] = None,
+) -> FastJSONResponse:
+    """
+    Update mode of /process: diff one sheet of the new workbook against the
+    stored table ``table_id`` and write only the rows that changed.
+
+    The sheet can also be chosen with a one-name ``sheets`` selector; more
+    than one sheet, or one that contradicts ``sheet_name``, is a 400.
+    """
+    if sheets:
+        if len(sheets) > 1 or (sheet_name and sheet_name != sheets[0]):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": "El modo actualización procesa una sola hoja: 'sheets' debe nombrar solo esa hoja",
+                    "error_code": "INVALID_SELECTOR",
+                },
+            )
+        sheet_name = sheets[0]
+
+    table = await db_client.get_table_metadata(workspace_id, table_id)
+    if table is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "La tabla no existe en este workspace", "error_code": "TABLE_NOT_FOUND"},
+        )
+
+    try:
+        with track_memory("parse", len(file_content)):
+            sheet = await run_in_threadpool(
+                excel_processor.process_sheet, file_content, workspace_id, sheet_name, table["table_name"],
+                **({"columns": columns} if columns else {}),
+            )
+    except ExcelProcessingError as e:
+        raise HTTPException(status_code=400, detail={"error": e.message, "error_code": e.error_code})
+
+    raw_data = sheet.pop("_data")
+    row_hashes = sheet.pop("_row_hashes")
+    ROWS_INGESTED.inc(sheet["rows"])
+    SHEETS_INGESTED.inc()
+    with observe_stage(
+        "storage", sheet["sheet_name"], table_id=table_id, rows=len(raw_data)
+    ), track_memory("store", len(file_content)):
+        diff = await db_client.update_excel_data(
+            workspace_id=workspace_id,
+            table_id=table_id,
+            data=raw_data,
+            column_types=sheet["column_types"],
+            row_hashes=row_hashes,
+            row_format=table.get("row_format"),
+        )
+    sheet["storage_status"] = "completed"
+    _annotate_sheets([sheet], len(file_content))
+
+    summary = excel_processor.summarize_sheets([sheet], time.perf_counter() - start_time)
+    summary.pop("sheets")
+    summary["message"] = (
+        f"Tabla '{table['table_name']}' actualizada: {diff['inserted']} fila(s) nueva(s), "
+        f"{diff['updated']} modificada(s), {diff['deleted']} eliminada(s), "
+        f"{diff['unchanged']} sin cambios."
+    )
+    return FastJSONResponse(ExcelProcessResponse.model_construct(
+        sheets=[SheetProcessingResult.model_construct(**sheet)],
+        diff=TableDiff(table_id=table_id, **diff),
+        **summary,
+    ))
+
+
+def _annotate_sheets(sheets: List[Dict[str, Any]], file_size: int) -> None:
+    """Log the workbook shape next to the request's stage timings and memory."""
+    annotate_workbook(
+        rows=sum(sheet["rows"] for sheet in sheets),
+        columns=max((sheet["columns"] for sheet in sheets), default=0),
+        sheets=len(sheets),
+        file_size=file_size,
+    )
+
+
+def _suggested_widgets(sheets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Every widget suggestion of the stored sheets, as ``create_widgets`` input."""
+    return [
+        {
+            "widget_type": suggestion["widget_type"],
+            "config": {
+                "title": suggestion["title"],
+                "data_source": suggestion["table_name"],
+                **suggestion["config"],
+            },
+        }
+        for sheet in sheets
+        if sheet.get("storage_status") != "failed"
+        for suggestion in sheet["widget_suggestions"]
+    ]
+
+
+async def _create_dashboard(
+    db_client: IDatabaseClient,
+    workspace_id: str,
+    name: str,
+    filename: str,
+    dashboard_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    with observe_stage("dashboard_creation"):
+        return await db_client.create_dashboard(
+            workspace_id=workspace_id,
+            name=name,
+            description=f"Dashboard generado desde {filename}",
+            icon="table",
+            color="#228BE6",
+            dashboard_id=dashboard_id,
+        )
+
+
+async def _finish_auto_dashboard(
+    dashboard_task: "asyncio.Future[Dict[str, Any]]",
+    db_client: IDatabaseClient,
+    sheets: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Wait for the dashboard created alongside storage and insert the widgets
+    suggested for every stored sheet in one request. The sheets are already
+    stored, so a failure here is logged and reported without a dashboard.
+    """
+    try:
+        dashboard = await dashboard_task
+        with observe_stage("widget_creation"):
+            widgets = await db_client.create_widgets(dashboard["id"], _suggested_widgets(sheets))
+    except Exception as dashboard_err:
+        logger.warning(f"[process] Could not create the auto-dashboard: {dashboard_err}")
+        return {"dashboard_id": None, "widgets_created": 0}
+    return {"dashboard_id": dashboard["id"], "widgets_created": len(widgets)}
+
+
+async def _stream_sheets(
+    file_content: bytes,
+    workspace_id: str,
+    excel_processor: IExcelProcessor,
+    db_client: IDatabaseClient,
+    fingerprint: Optional[str] = None,
+    dashboard_name: Optional[str] = None,
+    filename: str = "",
+    projection: Optional[Dict[str, List[str]]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Emit one ``{"type": "sheet"}`` line per stored sheet, then a
+    ``{"type": "summary"}`` line. Parsing happens in the threadpool one sheet
+    at a time so the first line is flushed as soon as the first sheet is stored.
+    With ``dashboard_name`` the dashboard is created while the sheets are
+    stored and its id is reported in the summary. ``projection`` is passed
+    through to the processor (see ``_projection``).
+    """
+    upload_id = uuid.uuid4().hex
+    start_time = time.perf_counter()
+    sheets = excel_processor.iter_sheets(file_content, workspace_id, **(projection or {}))
+    stored: List[Dict[str, Any]] = []
+    dashboard_task: Optional[asyncio.Future] = None
+    try:
+        while True:
+            with track_memory("parse", len(file_content)):
+                sheet = await run_in_threadpool(next, sheets, None)
+            if sheet is None:
+                break
+            if dashboard_name is not None and dashboard_task is None:
+                dashboard_task = asyncio.ensure_future(
+                    _create_dashboard(db_client, workspace_id, dashboard_name, filename)
+                )
+            result = await _store_sheet(
+                sheet, workspace_id, db_client, len(file_content), fingerprint, upload_id
+            )
+            stored.append(sheet)
+            yield _ndjson_line({"type": "sheet", "sheet": result})
+    except Exception as e:
+        logger.error(f"[process] Streaming error after {len(stored)} sheet(s): {str(e)}")
+        if dashboard_task is not None:
+            dashboard_task.cancel()
+        if isinstance(e, ExcelProcessingError):
+            error, error_code = e.message, e.error_code
+        else:
+            error, error_code = "Error procesando el archivo", "PROCESSING_ERROR"
+        yield _ndjson_line({
+            "type": "error",
+            "error": error,
+            "error_code": error_code,
+            "sheets_processed": len(stored),
+        })
+        return
+
+    summary = excel_processor.summarize_sheets(stored, time.perf_counter() - start_time)
+    summary.pop("sheets")
+    if dashboard_task is not None:
+        summary.update(await _finish_auto_dashboard(dashboard_task, db_client, stored))
+    _annotate_sheets(stored, len(file_content))
+    yield _ndjson_line({"type": "summary", **summary})
+
+
+async def _stream_existing(
+    sheets: List[SheetProcessingResult],
+    summary: Dict[str, Any],
+) -> AsyncIterator[bytes]:
+    """NDJSON rendering of a duplicate upload: the same lines, nothing ingested."""
+    for sheet in sheets:
+        yield _ndjson_line({"type": "sheet", "sheet": sheet})
+    yield _ndjson_line({"type": "summary", **summary})
+
 
 async def _process_excel_upload(
     file: UploadFile = File(...),
     workspace_id: str = Form(...),
     user_id: str = Form(...),
     dashboard_name: str = Form(None),
+    force: bool = Form(False),
     excel_processor: IExcelProcessor = Depends(get_excel_processor),
     db_client: IDatabaseClient = Depends(get_database_client),
 ):
     """Shared Excel processing logic for upload/process endpoints."""
+    fingerprint = reservation = None
     try:
+        start_time = time.perf_counter()
         # Validar tamaño del archivo
-        file_content = await file.read()
+        with observe_stage("read_upload", filename=file.filename) as span:
+            file_content = await file.read()
+            span.set_attribute("bytes", len(file_content))
         if len(file_content) > settings.max_file_size:
             raise HTTPException(
                 status_code=413,
@@ -32,51 +571,119 @@ async def _process_excel_upload(
             )
         
         # Validar archivo
-        is_valid, errors = excel_processor.validate_file(file_content, file.filename)
+        with observe_stage("validate"), track_memory("validate", len(file_content)):
+            is_valid, errors = await run_in_threadpool(
+                excel_processor.validate_file, file_content, file.filename
+            )
         if not is_valid:
             raise HTTPException(status_code=400, detail={"errors": errors})
         
+        # Mismo archivo ya ingestado en este workspace: devolver lo existente
+        fingerprint = await run_in_threadpool(file_fingerprint, file_content)
+        existing, reservation = await _duplicate_or_reserve(db_client, workspace_id, fingerprint, "upload", force)
+        if existing is not None:
+            DUPLICATE_UPLOADS.labels(route="upload").inc()
+            previous = existing[0]
+            return ExcelProcessingResult(
+                **previous,
+                success=True,
+                processing_time=time.perf_counter() - start_time,
+                message=(
+                    f"Archivo ya procesado en este workspace. Se devuelve el dashboard "
+                    f"existente con {previous['rows_processed']} filas (force=true para reprocesar)."
+                ),
+                duplicate=True,
+            )
+        
         # Procesar Excel
         logger.info(f"Processing Excel file: {file.filename} for workspace: {workspace_id}")
-        processing_result = excel_processor.process_excel(
-            file_content,
-            workspace_id,
-            dashboard_name or file.filename.rsplit('.', 1)[0]
-        )
+        BYTES_INGESTED.inc(len(file_content))
+        current_span().set_attributes({"workspace_id": workspace_id, "bytes": len(file_content)})
+        with track_memory("parse", len(file_content)):
+            processing_result = await run_in_threadpool(
+                excel_processor.process_excel,
+                file_content,
+                workspace_id,
+                dashboard_name or file.filename.rsplit('.', 1)[0]
+            )
         
         if not processing_result["success"]:
             raise HTTPException(status_code=500, detail=processing_result.get("error"))
-        
-        # Crear dashboard en Supabase
-        dashboard = await db_client.create_dashboard(
-            workspace_id=workspace_id,
-            name=dashboard_name or file.filename.rsplit('.', 1)[0],
-            description=f"Dashboard generado desde {file.filename}",
-            icon="table",
-            color="#228BE6"
+        annotate_workbook(
+            rows=processing_result["rows_processed"],
+            columns=processing_result["columns"],
+            sheets=1,
+            file_size=len(file_content),
         )
+        ROWS_INGESTED.inc(processing_result["rows_processed"])
+        SHEETS_INGESTED.inc()
         
-        # ✅ IMPLEMENTADO: Persistir datos en Supabase
-        rows_stored = await db_client.store_excel_data(
-            workspace_id=workspace_id,
-            table_name=processing_result["table_name"],
-            data=processing_result["data"],
-            column_types=processing_result["column_types"]
-        )
+        # El id del dashboard se genera acá para que el source de la tabla lo referencie
+        # mientras dashboard + widget y los datos se guardan en paralelo
+        dashboard_id = str(uuid.uuid4())
         
-        logger.info(f"Stored {rows_stored} rows in Supabase for table {processing_result['table_name']}")
+        async def create_dashboard_and_widget() -> Dict[str, Any]:
+            dashboard = await _create_dashboard(
+                db_client,
+                workspace_id,
+                dashboard_name or file.filename.rsplit('.', 1)[0],
+                file.filename,
+                dashboard_id=dashboard_id,
+            )
+            with observe_stage("widget_creation"):
+                await db_client.create_widgets(dashboard["id"], [{
+                    "widget_type": "table",
+                    "config": {
+                        "title": "Datos de Excel",
+                        "columns": processing_result["column_names"],
+                        "data_source": processing_result["table_name"],
+                        "column_types": processing_result["column_types"],
+                    },
+                }])
+            return dashboard
         
-        # Crear widget de tabla
-        await db_client.create_widget(
-            dashboard_id=dashboard["id"],
-            widget_type="table",
-            config={
-                "title": "Datos de Excel",
-                "columns": processing_result["column_names"],
-                "data_source": processing_result["table_name"],
-                "column_types": processing_result["column_types"],
-            }
+        async def store_data() -> int:
+            source = build_source("upload", uuid.uuid4().hex, 0, 1, {
+                "dashboard_id": dashboard_id,
+                "rows_processed": processing_result["rows_processed"],
+                "columns": processing_result["columns"],
+                "table_name": processing_result["table_name"],
+                "widgets_created": 1,
+            })
+            with track_memory("store", len(file_content)):
+                return await db_client.store_excel_data(
+                    workspace_id=workspace_id,
+                    table_name=processing_result["table_name"],
+                    data=processing_result["data"],
+                    column_types=processing_result["column_types"],
+                    fingerprint=fingerprint,
+                    source=source,
+                )
+        
+        # Ambas ramas terminan antes de responder: una carga parcial reanudada queda completa
+        dashboard, rows_stored = await asyncio.gather(
+            create_dashboard_and_widget(), store_data(), return_exceptions=True
         )
+        if isinstance(dashboard, BaseException):
+            raise dashboard
+        if isinstance(rows_stored, PartialIngestError):
+            partial = rows_stored
+            # El dashboard y su widget ya existen: /tables/{table_id}/resume completa los datos
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "error": "El almacenamiento se interrumpió; reanudar con /tables/{table_id}/resume",
+                    "error_code": "PARTIAL_INGEST",
+                    "table_id": partial.table_id,
+                    "dashboard_id": dashboard["id"],
+                    "committed_rows": partial.committed_rows,
+                    "total_rows": partial.total_rows,
+                },
+            )
+        if isinstance(rows_stored, BaseException):
+            raise rows_stored
+        
+        logger.info(f"Stored {rows_stored} rows in Supabase for table {processing_result['table_name']}")
         
         return ExcelProcessingResult(
             success=True,
@@ -94,6 +701,128 @@ async def _process_excel_upload(
     except Exception as e:
         logger.error(f"Error processing Excel: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await _release_upload(db_client, workspace_id, fingerprint, reservation)
+
+
+async def _ingest_sheets(
+    file_content: bytes,
+    workspace_id: str,
+    excel_processor: IExcelProcessor,
+    db_client: IDatabaseClient,
+    fingerprint: Optional[str] = None,
+    dashboard_name: Optional[str] = None,
+    filename: str = "",
+    projection: Optional[Dict[str, List[str]]] = None,
+) -> ExcelProcessResponse:
+    """
+    Parse every (selected) sheet, store them and build the /process response.
+    With ``dashboard_name`` the dashboard is created while the sheets are stored.
+    """
+    try:
+        with track_memory("parse", len(file_content)):
+            result = await run_in_threadpool(
+                excel_processor.process_all_sheets, file_content, workspace_id, **(projection or {})
+            )
+    except ExcelProcessingError as e:
+        raise HTTPException(status_code=400, detail={"error": e.message, "error_code": e.error_code})
+
+    if not result.get("success"):
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": result.get("error", "Error desconocido"),
+                "error_code": "PROCESSING_ERROR"
+            }
+        )
+
+    _annotate_sheets(result["sheets"], len(file_content))
+
+    # The dashboard does not depend on the data: insert it while the sheets are stored
+    dashboard_task = None
+    if dashboard_name is not None:
+        dashboard_task = asyncio.ensure_future(
+            _create_dashboard(db_client, workspace_id, dashboard_name, filename)
+        )
+
+    # Persist data for each sheet and strip internal _data key from response
+    upload_id = uuid.uuid4().hex
+    clean_sheets: List[SheetProcessingResult] = []
+    for sheet in result["sheets"]:
+        clean_sheets.append(await _store_sheet(
+            sheet, workspace_id, db_client, len(file_content), fingerprint, upload_id
+        ))
+
+    dashboard: Dict[str, Any] = {"widgets_created": result["widgets_created"]}
+    if dashboard_task is not None:
+        dashboard = await _finish_auto_dashboard(dashboard_task, db_client, result["sheets"])
+
+    return ExcelProcessResponse.model_construct(
+        success=True,
+        message=result["message"],
+        sheets_processed=result["sheets_processed"],
+        sheets=clean_sheets,
+        tables=result["tables"],
+        processing_time=result["processing_time"],
+        **dashboard,
+    )
+
+
+async def _duplicate_summary(
+    sheets: List[Dict[str, Any]],
+    excel_processor: IExcelProcessor,
+    start_time: float,
+    db_client: IDatabaseClient,
+    workspace_id: str,
+    dashboard_name: Optional[str] = None,
+    filename: str = "",
+) -> Tuple[List[SheetProcessingResult], Dict[str, Any]]:
+    """
+    Sheet results and summary fields of a duplicate /process upload. Only
+    parsing and storage are skipped: with ``dashboard_name`` a dashboard is
+    still created, with the widgets suggested for the stored tables.
+    """
+    DUPLICATE_UPLOADS.labels(route="process").inc()
+    dashboard: Dict[str, Any] = {}
+    if dashboard_name is not None:
+        dashboard = await _finish_auto_dashboard(
+            asyncio.ensure_future(_create_dashboard(db_client, workspace_id, dashboard_name, filename)),
+            db_client,
+            sheets,
+        )
+    summary = excel_processor.summarize_sheets(sheets, time.perf_counter() - start_time)
+    summary.pop("sheets")
+    summary["message"] = (
+        f"Archivo ya procesado en este workspace. Se devuelven {len(sheets)} "
+        f"tabla(s) existente(s) (force=true para reprocesar)."
+    )
+    summary["duplicate"] = True
+    summary.update(dashboard)
+    # Only fully stored uploads are matched, so every table is complete
+    results = [
+        SheetProcessingResult.model_construct(**{**sheet, "storage_status": "completed"})
+        for sheet in sheets
+    ]
+    return results, summary
+
+
+async def _duplicate_process_response(
+    request: Request,
+    sheets: List[Dict[str, Any]],
+    excel_processor: IExcelProcessor,
+    start_time: float,
+    db_client: IDatabaseClient,
+    workspace_id: str,
+    dashboard_name: Optional[str] = None,
+    filename: str = "",
+):
+    """/process answer for a file this workspace already ingested."""
+    results, summary = await _duplicate_summary(
+        sheets, excel_processor, start_time, db_client, workspace_id, dashboard_name, filename
+    )
+    if _wants_ndjson(request):
+        return StreamingResponse(_stream_existing(results, summary), media_type=NDJSON_MEDIA_TYPE)
+    return FastJSONResponse(ExcelProcessResponse.model_construct(sheets=results, **summary))
 
 
 @router.post("/upload", response_model=ExcelProcessingResult)
@@ -102,8 +831,10 @@ async def upload_excel(
     workspace_id: str = Form(...),
     user_id: str = Form(...),
     dashboard_name: str = Form(None),
+    force: bool = Form(False),
     excel_processor: IExcelProcessor = Depends(get_excel_processor),
     db_client: IDatabaseClient = Depends(get_database_client),
+    ticket: Ticket = Depends(_admitted("upload")),
 ):
     """
     Sube y procesa un archivo Excel
@@ -112,24 +843,35 @@ async def upload_excel(
     - **workspace_id**: ID del workspace
     - **user_id**: ID del usuario
     - **dashboard_name**: Nombre opcional del dashboard
+    - **force**: Reprocesar aunque el mismo archivo ya se haya subido al workspace
     """
     return await _process_excel_upload(
         file=file,
         workspace_id=workspace_id,
         user_id=user_id,
         dashboard_name=dashboard_name,
+        force=force,
         excel_processor=excel_processor,
         db_client=db_client,
     )
 
 
-@router.post("/process", response_model=ExcelProcessResponse)
+@router.post("/process", response_model=ExcelProcessResponse, response_class=FastJSONResponse)
 async def process_excel(
+    request: Request,
     file: UploadFile = File(...),
     workspace_id: str = Form(...),
     user_id: str = Form(...),
+    force: bool = Form(False),
+    table_id: str = Form(None),
+    sheet_name: str = Form(None),
+    create_dashboard: bool = Form(False),
+    dashboard_name: str = Form(None),
+    sheets: str = Form(None),
+    columns: str = Form(None),
     excel_processor: IExcelProcessor = Depends(get_excel_processor),
     db_client: IDatabaseClient = Depends(get_database_client),
+    ticket: Ticket = Depends(_admitted("process")),
 ):
     """
     Endpoint canónico para procesar un archivo Excel — multi-sheet, widget-ready (B5).
@@ -137,89 +879,97 @@ async def process_excel(
     - **file**: Archivo Excel (.xlsx, .xls)
     - **workspace_id**: ID del workspace
     - **user_id**: ID del usuario
+    - **force**: Reprocesar aunque el mismo archivo ya se haya subido al workspace
+    - **table_id**: Modo actualización — diffea la hoja contra esta tabla y escribe solo los cambios
+    - **sheet_name**: Hoja a usar en modo actualización (default: la primera, o la única de ``sheets``)
+    - **create_dashboard**: Crear un dashboard con todos los widgets sugeridos
+    - **dashboard_name**: Nombre del dashboard (default: nombre del archivo)
+    - **sheets**: Hojas a procesar, separadas por coma o como array JSON (default: todas)
+    - **columns**: Columnas a conservar en cada hoja, por nombre original o saneado (default: todas)
 
     Returns a payload compatible with the frontend widget types (table, kpi,
     bar_chart, line_chart, pie_chart) and the Next.js auto-dashboard builder.
+
+    With ``Accept: application/x-ndjson`` the response is streamed instead:
+    one ``{"type": "sheet", "sheet": SheetProcessingResult}`` line per sheet as
+    soon as it is stored, followed by a ``{"type": "summary", ...}`` line.
+
+    If the same file was already fully ingested into the workspace, its
+    existing tables are returned with ``duplicate: true`` and nothing is
+    parsed or stored, unless ``force`` is set; ``create_dashboard`` still
+    creates a dashboard with the widgets suggested for those tables.
+
+    With ``table_id`` one sheet is diffed row by row (by hash) against the
+    stored table; the response carries the counts in ``diff``.
+
+    With ``sheets``/``columns`` only the selected sheets are parsed and only
+    the selected columns are read into the DataFrame, profiled and stored;
+    an unknown sheet is a 400 ``SHEET_NOT_FOUND`` and a sheet without any of
+    the columns a 400 ``COLUMN_NOT_FOUND``.
+
+    With ``create_dashboard`` the dashboard is inserted while the sheets are
+    stored and every suggested widget is created in a single request; the
+    response carries ``dashboard_id``.
+
+    The upload waits for an admission ticket before it is read (429/503 with
+    ``Retry-After`` when the instance is saturated).
     """
+    fingerprint = reservation = None
     try:
-        file_content = await file.read()
+        start_time = time.perf_counter()
+        with observe_stage("read_upload", filename=file.filename) as span:
+            file_content = await file.read()
+            span.set_attribute("bytes", len(file_content))
 
-        if len(file_content) > settings.max_file_size:
-            raise HTTPException(
-                status_code=413,
-                detail={
-                    "error": f"Archivo demasiado grande. Máximo: {settings.max_file_size / 1024 / 1024:.0f}MB",
-                    "error_code": "FILE_TOO_LARGE"
-                }
+        await _check_upload(file_content, file.filename or "", excel_processor)
+
+        current_span().set_attributes({"workspace_id": workspace_id, "bytes": len(file_content)})
+        projection = _projection(sheets, columns)
+        if table_id:
+            BYTES_INGESTED.inc(len(file_content))
+            return await _update_table(
+                file_content, workspace_id, table_id, sheet_name, excel_processor, db_client, start_time,
+                projection.get("columns"), projection.get("sheets"),
             )
 
-        is_valid, errors = excel_processor.validate_file(file_content, file.filename or "")
-        if not is_valid:
-            # Determinar código de error basado en el mensaje
-            error_code = "VALIDATION_ERROR"
-            if errors:
-                error_msg = errors[0].lower()
-                if "corrupto" in error_msg or "dañado" in error_msg:
-                    error_code = "CORRUPTED_FILE"
-                elif "vacío" in error_msg:
-                    error_code = "EMPTY_FILE"
-                elif "no es un excel válido" in error_msg:
-                    error_code = "INVALID_EXCEL_FORMAT"
-                elif "no se pudo leer" in error_msg:
-                    error_code = "UNREADABLE_CONTENT"
-                elif "extensión" in error_msg:
-                    error_code = "INVALID_FILE_TYPE"
-            
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": errors[0] if errors else "Archivo inválido",
-                    "error_code": error_code,
-                    "errors": errors
-                }
+        if create_dashboard:
+            dashboard_name = dashboard_name or (file.filename or "Excel").rsplit('.', 1)[0]
+        else:
+            dashboard_name = None
+
+        fingerprint = await run_in_threadpool(file_fingerprint, file_content, projection)
+        existing, reservation = await _duplicate_or_reserve(db_client, workspace_id, fingerprint, "process", force)
+        if existing is not None:
+            return await _duplicate_process_response(
+                request, existing, excel_processor, start_time, db_client, workspace_id,
+                dashboard_name, file.filename or "",
             )
 
         logger.info(
             f"[process] Processing '{file.filename}' for workspace '{workspace_id}'"
         )
+        BYTES_INGESTED.inc(len(file_content))
 
-        result = excel_processor.process_all_sheets(file_content, workspace_id)
-
-        if not result.get("success"):
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": result.get("error", "Error desconocido"),
-                    "error_code": "PROCESSING_ERROR"
-                }
+        if _wants_ndjson(request):
+            # The sheets are parsed while the body streams: keep the ticket and reservation until it ends
+            ticket.detach()
+            after_stream = BackgroundTasks()
+            after_stream.add_task(ticket.release)
+            after_stream.add_task(_release_upload, db_client, workspace_id, fingerprint, reservation)
+            reservation = None
+            return StreamingResponse(
+                _release_after(_stream_sheets(
+                    file_content, workspace_id, excel_processor, db_client, fingerprint,
+                    dashboard_name, file.filename or "", projection,
+                ), ticket),
+                media_type=NDJSON_MEDIA_TYPE,
+                background=after_stream,
             )
 
-        # Persist data for each sheet and strip internal _data key from response
-        clean_sheets: List[SheetProcessingResult] = []
-        for sheet in result["sheets"]:
-            raw_data = sheet.pop("_data", [])
-            try:
-                await db_client.store_excel_data(
-                    workspace_id=workspace_id,
-                    table_name=sheet["table_name"],
-                    data=raw_data,
-                    column_types=sheet["column_types"],
-                )
-            except Exception as store_err:
-                logger.warning(
-                    f"[process] Could not persist data for sheet '{sheet['sheet_name']}': {store_err}"
-                )
-            clean_sheets.append(SheetProcessingResult(**sheet))
-
-        return ExcelProcessResponse(
-            success=True,
-            message=result["message"],
-            sheets_processed=result["sheets_processed"],
-            sheets=clean_sheets,
-            tables=result["tables"],
-            processing_time=result["processing_time"],
-            widgets_created=result["widgets_created"],
-        )
+        return FastJSONResponse(await _ingest_sheets(
+            file_content, workspace_id, excel_processor, db_client, fingerprint,
+            dashboard_name, file.filename or "", projection,
+        ))
 
     except HTTPException:
         raise
@@ -232,12 +982,340 @@ async def process_excel(
                 "error_code": "INTERNAL_ERROR"
             }
         )
+    finally:
+        await _release_upload(db_client, workspace_id, fingerprint, reservation)
+
+
+class _DiskSpooledMultiPartParser(MultiPartParser):
+    """Form parser for /process-batch: each file streams to a temp file past 64 KiB"""
+    max_file_size = 64 * 1024
+
+
+async def _batch_form(request: Request) -> FormData:
+    """
+    The /process-batch form, parsed here rather than by FastAPI so the files
+    are spooled to disk while the body arrives instead of (up to 1 MB each)
+    in memory: a batch of 200 workbooks is held as temp files, not RAM.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Se esperaba un formulario multipart/form-data", "error_code": "VALIDATION_ERROR"},
+        )
+    parser = _DiskSpooledMultiPartParser(
+        request.headers, request.stream(), max_files=settings.batch_max_files, max_fields=100
+    )
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        too_many = "Too many files" in e.message
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": (
+                    f"Demasiados archivos: máximo {settings.batch_max_files} por request"
+                    if too_many else f"Formulario inválido: {e.message}"
+                ),
+                "error_code": "TOO_MANY_FILES" if too_many else "VALIDATION_ERROR",
+            },
+        )
+
+
+def _form_text(form: FormData, name: str, required: bool = False) -> Optional[str]:
+    value = form.get(name)
+    if isinstance(value, SpooledUpload):
+        value = None
+    if required and not value:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"Falta el campo '{name}'", "error_code": "VALIDATION_ERROR"},
+        )
+    return value or None
+
+
+def _form_flag(form: FormData, name: str) -> bool:
+    return (_form_text(form, name) or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+async def _process_batch_file(
+    index: int,
+    upload: SpooledUpload,
+    workspace_id: str,
+    force: bool,
+    create_dashboard: bool,
+    projection: Dict[str, List[str]],
+    excel_processor: IExcelProcessor,
+    db_client: IDatabaseClient,
+) -> BatchFileResult:
+    """
+    One file of a batch, as /process would handle it: its own admission
+    ticket, validation, duplicate check, parsing and storage. Any failure
+    becomes this file's result instead of failing the batch.
+    """
+    start_time = time.perf_counter()
+    filename = upload.filename or f"archivo_{index + 1}"
+    outcome: Dict[str, Any]
+    try:
+        await upload.seek(0)
+        cost = await run_in_threadpool(
+            estimate_cost, upload.file, upload.size or 0, settings.admission_bytes_per_cell
+        )
+        with observe_stage(
+            "admission", route="process_batch", lane=admission.lane_for(cost), memory_bytes=cost.memory_bytes
+        ):
+            ticket = await admission.acquire(cost, "process_batch", workspace_id)
+        try:
+            with observe_stage("read_upload", filename=filename) as span:
+                await upload.seek(0)
+                file_content = await upload.read()
+                span.set_attribute("bytes", len(file_content))
+            await _check_upload(file_content, filename, excel_processor)
+
+            fingerprint = await run_in_threadpool(file_fingerprint, file_content, projection)
+            existing, reservation = await _duplicate_or_reserve(
+                db_client, workspace_id, fingerprint, "process", force
+            )
+            dashboard_name = filename.rsplit('.', 1)[0] if create_dashboard else None
+            if existing is not None:
+                results, summary = await _duplicate_summary(
+                    existing, excel_processor, start_time, db_client, workspace_id, dashboard_name, filename
+                )
+                response = ExcelProcessResponse.model_construct(sheets=results, **summary)
+            else:
+                BYTES_INGESTED.inc(len(file_content))
+                try:
+                    response = await _ingest_sheets(
+                        file_content, workspace_id, excel_processor, db_client, fingerprint,
+                        dashboard_name, filename, projection,
+                    )
+                finally:
+                    await _release_upload(db_client, workspace_id, fingerprint, reservation)
+        finally:
+            ticket.release()
+        outcome = {"success": True, "status_code": 200, "result": response}
+    except AdmissionRejected as rejected:
+        outcome = {"success": False, "status_code": rejected.status_code, **_rejection_detail(rejected)}
+        outcome.pop("retry_after")
+    except HTTPException as e:
+        detail = e.detail if isinstance(e.detail, dict) else {"error": str(e.detail)}
+        outcome = {
+            "success": False,
+            "status_code": e.status_code,
+            "error": detail.get("error") or "; ".join(detail.get("errors") or []) or "Archivo inválido",
+            "error_code": detail.get("error_code", "PROCESSING_ERROR"),
+        }
+    except Exception as e:
+        logger.error(f"[process-batch] Unexpected error in '{filename}': {str(e)}")
+        outcome = {
+            "success": False,
+            "status_code": 500,
+            "error": "Error interno del servidor",
+            "error_code": "INTERNAL_ERROR",
+        }
+    return BatchFileResult.model_construct(
+        index=index,
+        filename=filename,
+        processing_time=time.perf_counter() - start_time,
+        **outcome,
+    )
+
+
+async def _run_batch(
+    uploads: List[SpooledUpload],
+    process: Callable[[int, SpooledUpload], Any],
+) -> AsyncIterator[BatchFileResult]:
+    """
+    Run ``process(index, upload)`` for every file, ``BATCH_MAX_CONCURRENT``
+    at a time, yielding results as they finish. Files not yet finished when
+    the consumer stops (client gone) are cancelled.
+    """
+    slots = asyncio.Semaphore(max(1, settings.batch_max_concurrent))
+
+    async def run(index: int, upload: SpooledUpload) -> BatchFileResult:
+        async with slots:
+            return await process(index, upload)
+
+    tasks = [asyncio.ensure_future(run(index, upload)) for index, upload in enumerate(uploads)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _batch_summary(results: List[BatchFileResult], elapsed: float) -> Dict[str, Any]:
+    succeeded = sum(1 for result in results if result.success)
+    return {
+        "success": succeeded == len(results),
+        "message": f"{succeeded} de {len(results)} archivo(s) procesado(s)",
+        "files_total": len(results),
+        "files_succeeded": succeeded,
+        "files_failed": len(results) - succeeded,
+        "processing_time": elapsed,
+    }
+
+
+async def _stream_batch(
+    results: AsyncIterator[BatchFileResult],
+    form: FormData,
+    start_time: float,
+) -> AsyncIterator[bytes]:
+    """One ``{"type": "file"}`` line per file as it finishes, then ``{"type": "summary"}``."""
+    finished: List[BatchFileResult] = []
+    try:
+        async for result in results:
+            finished.append(result)
+            yield _ndjson_line({"type": "file", "file": result})
+        yield _ndjson_line({"type": "summary", **_batch_summary(finished, time.perf_counter() - start_time)})
+    finally:
+        await results.aclose()
+        await form.close()
+
+
+_BATCH_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files", "workspace_id", "user_id"],
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                        "workspace_id": {"type": "string"},
+                        "user_id": {"type": "string"},
+                        "force": {"type": "boolean", "default": False},
+                        "create_dashboard": {"type": "boolean", "default": False},
+                        "sheets": {"type": "string"},
+                        "columns": {"type": "string"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+@router.post(
+    "/process-batch",
+    response_model=ExcelBatchResponse,
+    response_class=FastJSONResponse,
+    openapi_extra=_BATCH_FORM_SCHEMA,
+)
+async def process_batch(
+    request: Request,
+    excel_processor: IExcelProcessor = Depends(get_excel_processor),
+    db_client: IDatabaseClient = Depends(get_database_client),
+):
+    """
+    Procesa varios archivos Excel en un solo request
+
+    - **files**: Archivos Excel (.xlsx, .xls), hasta ``BATCH_MAX_FILES``
+    - **workspace_id**: ID del workspace
+    - **user_id**: ID del usuario
+    - **force**: Reprocesar los archivos que ya se subieron al workspace
+    - **create_dashboard**: Crear un dashboard por archivo con sus widgets sugeridos
+    - **sheets** / **columns**: Selección de hojas y columnas, aplicada a cada archivo
+
+    Each file is processed as by /process (validation, duplicate check,
+    every sheet stored), ``BATCH_MAX_CONCURRENT`` at a time; every file
+    waits for its own admission ticket, so a batch shares the instance with
+    other uploads like the same files sent one by one. The files are spooled
+    to disk while the request body arrives and read one at a time.
+
+    A file that fails (invalid, too large, a sheet that cannot be parsed or
+    stored, admission rejected) gets ``success: false`` with the
+    ``status_code``/``error_code`` /process would have answered; the other
+    files are not affected. The response lists the files in upload order.
+    With ``Accept: application/x-ndjson`` one ``{"type": "file"}`` line is
+    streamed per file as it finishes, followed by ``{"type": "summary"}``.
+    """
+    start_time = time.perf_counter()
+    form = await _batch_form(request)
+    try:
+        workspace_id = _form_text(form, "workspace_id", required=True)
+        _form_text(form, "user_id", required=True)
+        uploads = [value for value in form.getlist("files") if isinstance(value, SpooledUpload)]
+        if not uploads:
+            raise HTTPException(
+                status_code=400,
+                detail={"error": "No se recibió ningún archivo en 'files'", "error_code": "NO_FILES"},
+            )
+        projection = _projection(_form_text(form, "sheets"), _form_text(form, "columns"))
+        force, create_dashboard = _form_flag(form, "force"), _form_flag(form, "create_dashboard")
+    except BaseException:
+        await form.close()
+        raise
+
+    current_span().set_attributes({"workspace_id": workspace_id, "files": len(uploads)})
+    logger.info(f"[process-batch] Processing {len(uploads)} file(s) for workspace '{workspace_id}'")
+
+    async def process(index: int, upload: SpooledUpload) -> BatchFileResult:
+        return await _process_batch_file(
+            index, upload, workspace_id, force, create_dashboard, projection, excel_processor, db_client
+        )
+
+    results = _run_batch(uploads, process)
+    if _wants_ndjson(request):
+        return StreamingResponse(_stream_batch(results, form, start_time), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        files = sorted([result async for result in results], key=lambda result: result.index)
+    finally:
+        await form.close()
+    return FastJSONResponse(ExcelBatchResponse.model_construct(
+        files=files, **_batch_summary(files, time.perf_counter() - start_time)
+    ))
+
+
+@router.post("/tables/{table_id}/resume", response_model=SuccessResponse)
+async def resume_table(
+    table_id: str,
+    workspace_id: str = Form(...),
+    db_client: IDatabaseClient = Depends(get_database_client),
+):
+    """
+    Reanuda el almacenamiento de una tabla que quedó incompleta
+    (``storage_status: "partial"`` en /process, ``PARTIAL_INGEST`` en /upload).
+
+    Continúa desde el primer lote que no llegó a la base con las filas que el
+    servicio guardó al fallar, sin volver a subir ni parsear el archivo. Si la
+    instancia se reinició y ya no las tiene, responde 409: volver a subir el
+    archivo con ``table_id`` (modo actualización) escribe solo las filas faltantes.
+    """
+    try:
+        result = await db_client.resume_excel_data(workspace_id, table_id)
+    except ResumeUnavailableError:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": "No hay datos pendientes para reanudar esta tabla; volver a subir el archivo con table_id",
+                "error_code": "RESUME_UNAVAILABLE",
+            },
+        )
+    except PartialIngestError as partial:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "El almacenamiento volvió a interrumpirse; reintentar",
+                "error_code": "PARTIAL_INGEST",
+                "table_id": partial.table_id,
+                "committed_rows": partial.committed_rows,
+                "total_rows": partial.total_rows,
+            },
+        )
+    return SuccessResponse(
+        message=f"Tabla completada: {result['rows_written']} fila(s) escritas desde la fila {result['resumed_from_row']}",
+        data={"table_id": table_id, **result},
+    )
 
 
 @router.post("/validate", response_model=ExcelValidationResponse)
 async def validate_excel(
     file: UploadFile = File(...),
     excel_processor: IExcelProcessor = Depends(get_excel_processor),
+    ticket: Ticket = Depends(_admitted("validate")),
 ):
     """
     Valida un archivo Excel sin procesarlo
@@ -245,37 +1323,21 @@ async def validate_excel(
     - **file**: Archivo Excel a validar
     """
     try:
-        file_content = await file.read()
+        with observe_stage("read_upload", filename=file.filename) as span:
+            file_content = await file.read()
+            span.set_attribute("bytes", len(file_content))
         
         # Validar archivo
-        is_valid, errors = excel_processor.validate_file(file_content, file.filename or "")
-        if not is_valid:
-            # Determinar código de error basado en el mensaje
-            error_code = "VALIDATION_ERROR"
-            if errors:
-                error_msg = errors[0].lower()
-                if "corrupto" in error_msg or "dañado" in error_msg:
-                    error_code = "CORRUPTED_FILE"
-                elif "vacío" in error_msg:
-                    error_code = "EMPTY_FILE"
-                elif "no es un excel válido" in error_msg:
-                    error_code = "INVALID_EXCEL_FORMAT"
-                elif "no se pudo leer" in error_msg:
-                    error_code = "UNREADABLE_CONTENT"
-                elif "extensión" in error_msg:
-                    error_code = "INVALID_FILE_TYPE"
-            
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": errors[0] if errors else "Archivo inválido",
-                    "error_code": error_code,
-                    "errors": errors
-                }
+        with observe_stage("validate"), track_memory("validate", len(file_content)):
+            is_valid, errors = await run_in_threadpool(
+                excel_processor.validate_file, file_content, file.filename or ""
             )
+        if not is_valid:
+            raise _invalid_file(errors)
         
         # Analizar archivo
-        analysis = excel_processor.analyze_file(file_content)
+        with observe_stage("analyze"):
+            analysis = await run_in_threadpool(excel_processor.analyze_file, file_content)
         
         return ExcelValidationResponse(**analysis)
         
@@ -292,28 +1354,111 @@ async def validate_excel(
         )
 
 
+@router.get("/tables/{table_id}/data")
+async def get_table_data(
+    request: Request,
+    table_id: str,
+    workspace_id: str = Query(...),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db_client: IDatabaseClient = Depends(get_database_client),
+):
+    """
+    Lee una página de filas de una tabla almacenada
+
+    - **workspace_id**: Workspace dueño de la tabla
+    - **limit**: Filas a devolver (máximo 1000)
+    - **offset**: Primera fila (desde 0)
+
+    With ``Accept: application/vnd.apache.arrow.stream`` the page is returned
+    as an Arrow IPC stream typed from the table's column types, instead of one
+    JSON object per row; block-stored pages go from the decoded block columns
+    to Arrow without being rebuilt as row dicts.
+    """
+    table = await db_client.get_table_metadata(workspace_id, table_id)
+    if table is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "La tabla no existe en este workspace", "error_code": "TABLE_NOT_FOUND"},
+        )
+    column_types = {column["name"]: column["type"] for column in table.get("columns") or []}
+
+    if _wants_arrow(request):
+        with observe_stage("storage_read", table_id=table_id, limit=limit, offset=offset):
+            columns = await db_client.get_table_columns(
+                table_id, limit=limit, offset=offset, row_format=table.get("row_format"), names=list(column_types)
+            )
+        rows_read = len(next(iter(columns.values()), []))
+        with observe_stage("arrow_encode", rows=rows_read):
+            body = await run_in_threadpool(
+                columns_to_ipc,
+                columns,
+                column_types,
+                {"table_id": table_id, "offset": offset, "limit": limit},
+            )
+        return Response(body, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    with observe_stage("storage_read", table_id=table_id, limit=limit, offset=offset):
+        rows = await db_client.get_table_data(
+            table_id, limit=limit, offset=offset, row_format=table.get("row_format")
+        )
+
+    return FastJSONResponse(SuccessResponse.model_construct(
+        success=True,
+        message=f"{len(rows)} fila(s) de '{table['table_name']}'",
+        data={"table_id": table_id, "offset": offset, "limit": limit, "column_types": column_types, "rows": rows},
+    ))
+
+
+def _preview_to_ipc(preview: Dict[str, Any]) -> bytes:
+    """Arrow IPC stream of a preview: one column per header, its summary in the schema metadata"""
+    return columns_to_ipc(
+        rows_to_columns(preview["headers"], preview["rows"]),
+        metadata={key: preview[key] for key in ("sheet_name", "sheets", "total_rows")},
+    )
+
+
 @router.post("/preview")
 async def preview_excel(
+    request: Request,
     file: UploadFile = File(...),
-    rows: int = Form(10),
+    rows: int = Form(10, ge=1, le=1000),
+    sheet: str = Form(None),
     excel_processor: IExcelProcessor = Depends(get_excel_processor),
+    ticket: Ticket = Depends(_admitted("preview")),
 ):
     """
     Obtiene un preview de los datos del Excel
     
     - **file**: Archivo Excel
-    - **rows**: Número de filas a mostrar (default: 10)
+    - **rows**: Número de filas a mostrar (default: 10, entre 1 y 1000)
+    - **sheet**: Hoja a previsualizar (default: la primera)
+    
+    Solo se leen el encabezado y las primeras ``rows`` filas de la hoja: el
+    tiempo de respuesta no depende del tamaño del archivo. Un archivo
+    corrupto se detecta al abrirlo, sin la validación completa de /validate.
+
+    With ``Accept: application/vnd.apache.arrow.stream`` the rows are returned
+    as an Arrow IPC stream (one column per header); ``sheet_name``, ``sheets``
+    and ``total_rows`` travel in the schema metadata.
     """
     try:
-        file_content = await file.read()
+        with observe_stage("read_upload", filename=file.filename) as span:
+            file_content = await file.read()
+            span.set_attribute("bytes", len(file_content))
         
-        # Validar archivo
-        is_valid, errors = excel_processor.validate_file(file_content, file.filename)
+        is_valid, errors = excel_processor.check_upload(file_content, file.filename or "")
         if not is_valid:
             raise HTTPException(status_code=400, detail={"errors": errors})
         
         # Obtener preview
-        preview = excel_processor.get_data_preview(file_content, rows)
+        with observe_stage("preview"):
+            preview = await run_in_threadpool(excel_processor.get_data_preview, file_content, rows, sheet)
+
+        if _wants_arrow(request):
+            with observe_stage("arrow_encode", rows=len(preview["rows"])):
+                body = await run_in_threadpool(_preview_to_ipc, preview)
+            return Response(body, media_type=ARROW_STREAM_MEDIA_TYPE)
         
         return SuccessResponse(
             message="Preview generado exitosamente",
@@ -322,6 +1467,11 @@ async def preview_excel(
         
     except HTTPException:
         raise
+    except ExcelProcessingError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": e.message, "error_code": e.error_code, "errors": [e.message]},
+        )
     except Exception as e:
         logger.error(f"Error getting preview: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
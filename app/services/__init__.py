@@ -1,4 +1,27 @@
-from app.services.excel_processor import ExcelProcessor
-from app.services.supabase_client import SupabaseClient
+"""
+Service layer.
+
+``ExcelProcessor`` (pandas, openpyxl) and ``SupabaseClient`` (supabase) are
+resolved on first attribute access so that importing any ``app.services``
+module does not load them; see ``app.services.warmup``.
+"""
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from app.services.excel_processor import ExcelProcessor
+    from app.services.supabase_client import SupabaseClient
+
+_LAZY_EXPORTS = {
+    "ExcelProcessor": "app.services.excel_processor",
+    "SupabaseClient": "app.services.supabase_client",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["ExcelProcessor", "SupabaseClient"]
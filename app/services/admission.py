@@ -0,0 +1,502 @@
+"""
+Admission control for the heavy Excel routes.
+
+Every upload to ``/process``, ``/upload``, ``/validate`` and ``/preview``
+asks ``admission`` for a ticket before the workbook is opened. A ticket is
+granted while fewer than ``max_concurrent`` jobs run *and* the estimated
+memory of the running jobs plus the new one fits ``memory_budget``; a
+workbook bigger than the whole budget is only admitted when nothing else
+runs. Everything else waits, at most ``max_queue`` requests for up to
+``queue_timeout`` seconds, and is then rejected:
+
+- 429 when the queue is already full (the client sends too much at once)
+- 503 when the wait timed out (the instance is saturated)
+
+Both carry a ``Retry-After`` estimated from how long recent jobs held
+their ticket. The memory of a job is estimated from the ``<dimension>``
+element that Excel and openpyxl write at the top of every worksheet XML,
+so it costs a zip directory read and a few KB per sheet, not a parse.
+
+Waiters are split in two FIFO lanes by that estimate. Workbooks of at most
+``fast_lane_max_cells`` cells go to the fast lane, which is served first
+and has ``fast_lane_slots`` slots bulk jobs cannot take, so a two-row
+upload never waits behind a 100k-row import. A bulk job that has waited
+``aging`` seconds is served before anything else.
+
+Inside each lane workspaces are served fairly (``_FairQueue``), weighted by
+``workspace_weights``; with ``workspace_max_concurrent`` set (0, the
+default, is no cap) a workspace never holds more than that many tickets. A ticket covers parsing *and* storing
+the workbook, so the cap also bounds a workspace's share of Supabase writes.
+
+The per-workspace metrics only get a series of their own for the
+workspaces in ``metric_workspaces`` (configured, plus the weighted ones);
+every other workspace is summed into ``workspace_id="other"``, so the
+number of series does not grow with the number of tenants.
+"""
+import asyncio
+import math
+import re
+import time
+import zipfile
+from collections import deque
+from dataclasses import dataclass
+from typing import IO, Callable, Deque, Dict, Iterable, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import Settings, settings
+
+_DIMENSION = re.compile(rb'<dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+_DIMENSION_SCAN_BYTES = 4096
+# Compressed xlsx bytes per cell, used when a sheet has no <dimension> (.xls,
+# some third-party writers)
+_FALLBACK_FILE_BYTES_PER_CELL = 8
+
+FAST_LANE = "fast"
+BULK_LANE = "bulk"
+LANES = (FAST_LANE, BULK_LANE)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "excel_admission_queue_depth", "Requests waiting for an admission ticket", ["lane"]
+)
+ADMISSION_ACTIVE = Gauge("excel_admission_active_jobs", "Heavy Excel jobs currently admitted", ["lane"])
+ADMISSION_INFLIGHT_MEMORY = Gauge(
+    "excel_admission_inflight_memory_bytes", "Estimated memory of the admitted jobs"
+)
+ADMISSION_WAIT = Histogram(
+    "excel_admission_wait_seconds",
+    "Time spent waiting for an admission ticket",
+    ["route", "lane", "outcome"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+ADMISSION_REJECTED = Counter(
+    "excel_admission_rejected", "Requests rejected by admission control", ["route", "reason"]
+)
+OTHER_WORKSPACES = "other"  # metric label of the workspaces not in metric_workspaces
+WORKSPACE_QUEUE_DEPTH = Gauge(
+    "excel_workspace_queue_depth", "Requests of a workspace waiting for an admission ticket", ["workspace_id"]
+)
+WORKSPACE_ACTIVE = Gauge("excel_workspace_active_jobs", "Admitted jobs of a workspace", ["workspace_id"])
+WORKSPACE_ADMITTED = Counter("excel_workspace_admitted_jobs", "Jobs admitted per workspace", ["workspace_id"])
+WORKSPACE_ADMITTED_CELLS = Counter(
+    "excel_workspace_admitted_cells", "Estimated cells of the jobs admitted per workspace", ["workspace_id"]
+)
+
+
+@dataclass(frozen=True)
+class JobCost:
+    """Estimated size of the work an upload will cause"""
+
+    file_size: int
+    cells: int
+    memory_bytes: int
+    exact: bool  # cells come from the worksheets' <dimension>, not from the file size
+
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + letter - 64
+    return number
+
+
+def workbook_cells(fileobj: IO[bytes]) -> Optional[int]:
+    """
+    Sum of the ``<dimension>`` areas of every worksheet of an xlsx, or None
+    when the file is not a zip or a sheet does not declare its dimension.
+    The file position is left at the start.
+    """
+    try:
+        with zipfile.ZipFile(fileobj) as archive:
+            sheets = [
+                name for name in archive.namelist()
+                if name.startswith("xl/worksheets/") and name.endswith(".xml")
+            ]
+            if not sheets:
+                return None
+            cells = 0
+            for name in sheets:
+                with archive.open(name) as sheet:
+                    match = _DIMENSION.search(sheet.read(_DIMENSION_SCAN_BYTES))
+                if match is None:
+                    return None
+                first_col, first_row, last_col, last_row = match.groups()
+                if last_col is None:
+                    last_col, last_row = first_col, first_row
+                cells += (
+                    (_column_number(last_col) - _column_number(first_col) + 1)
+                    * (int(last_row) - int(first_row) + 1)
+                )
+            return cells
+    except (zipfile.BadZipFile, OSError, KeyError, ValueError):
+        return None
+    finally:
+        fileobj.seek(0)
+
+
+def estimate_cost(fileobj: IO[bytes], file_size: int, bytes_per_cell: int) -> JobCost:
+    """
+    Memory a workbook needs while it is parsed: ``bytes_per_cell`` per cell
+    plus two copies of the upload (the request body and the parser's buffer).
+    """
+    cells = workbook_cells(fileobj)
+    exact = cells is not None
+    if cells is None:
+        cells = file_size // _FALLBACK_FILE_BYTES_PER_CELL
+    return JobCost(
+        file_size=file_size,
+        cells=cells,
+        memory_bytes=cells * bytes_per_cell + 2 * file_size,
+        exact=exact,
+    )
+
+
+class AdmissionRejected(Exception):
+    """The request could not be admitted; answer ``status_code`` with ``Retry-After``"""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"admission rejected ({reason}), retry after {retry_after}s")
+
+
+class Ticket:
+    """Permission to run one heavy job; ``release()`` is idempotent"""
+
+    def __init__(
+        self,
+        controller: Optional["AdmissionController"],
+        cost: JobCost,
+        route: str,
+        lane: str = FAST_LANE,
+        workspace_id: Optional[str] = None,
+    ):
+        self.cost = cost
+        self.route = route
+        self.lane = lane
+        self.workspace_id = workspace_id
+        self.admitted_at = time.monotonic()
+        self.wait_seconds = 0.0
+        self.detached = False
+        self._controller = controller
+
+    def detach(self) -> None:
+        """The caller takes over releasing the ticket (e.g. after a streamed response)."""
+        self.detached = True
+
+    def release(self) -> None:
+        controller, self._controller = self._controller, None
+        if controller is not None:
+            controller._release(self)
+
+
+@dataclass
+class _Waiter:
+    cost: JobCost
+    route: str
+    lane: str
+    workspace_id: Optional[str]
+    future: "asyncio.Future[Ticket]"
+    enqueued_at: float
+    tag: float = 0.0  # virtual start time in the lane's fair queue
+
+
+class _FairQueue:
+    """
+    Waiters of one lane, one FIFO per workspace, served by start-time fair
+    queuing: a waiter is tagged with its workspace's virtual start time, which
+    advances by ``cells / weight`` per queued job, and the eligible head with
+    the lowest tag goes next. A workspace queuing a hundred workbooks gets the
+    same share of admissions (in cells) as one queuing a single workbook.
+    """
+
+    def __init__(self) -> None:
+        self._flows: Dict[Optional[str], Deque[_Waiter]] = {}
+        self._finish: Dict[Optional[str], float] = {}
+        self._vtime = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(flow) for flow in self._flows.values())
+
+    def depth(self, workspace_id: Optional[str]) -> int:
+        return len(self._flows.get(workspace_id, ()))
+
+    def depths(self) -> Dict[Optional[str], int]:
+        return {workspace_id: len(flow) for workspace_id, flow in self._flows.items()}
+
+    def push(self, waiter: _Waiter, weight: float) -> None:
+        workspace_id = waiter.workspace_id
+        waiter.tag = max(self._vtime, self._finish.get(workspace_id, 0.0))
+        self._finish[workspace_id] = waiter.tag + (waiter.cost.cells + 1) / weight
+        self._flows.setdefault(workspace_id, deque()).append(waiter)
+
+    def peek(self, eligible: Callable[[Optional[str]], bool]) -> Optional[_Waiter]:
+        heads = [flow[0] for workspace_id, flow in self._flows.items() if eligible(workspace_id)]
+        return min(heads, key=lambda waiter: (waiter.tag, waiter.enqueued_at), default=None)
+
+    def remove(self, waiter: _Waiter) -> bool:
+        flow = self._flows.get(waiter.workspace_id)
+        if flow is None or waiter not in flow:
+            return False
+        flow.remove(waiter)
+        if not flow:
+            del self._flows[waiter.workspace_id]
+        return True
+
+    def pop(self, waiter: _Waiter) -> None:
+        self.remove(waiter)
+        self._vtime = max(self._vtime, waiter.tag)
+        # Idle workspaces whose finish time has passed start again from _vtime
+        self._finish = {
+            workspace_id: finish for workspace_id, finish in self._finish.items()
+            if finish > self._vtime or workspace_id in self._flows
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        memory_budget: int = 384 * 1024 * 1024,
+        max_queue: int = 32,
+        queue_timeout: float = 20.0,
+        fast_lane_max_cells: int = 20_000,
+        fast_lane_slots: int = 1,
+        aging: float = 10.0,
+        workspace_max_concurrent: int = 0,
+        workspace_weights: Optional[Dict[str, float]] = None,
+        metric_workspaces: Optional[Iterable[str]] = None,
+    ):
+        self.configure(
+            max_concurrent, memory_budget, max_queue, queue_timeout,
+            fast_lane_max_cells=fast_lane_max_cells, fast_lane_slots=fast_lane_slots, aging=aging,
+            workspace_max_concurrent=workspace_max_concurrent, workspace_weights=workspace_weights,
+            metric_workspaces=metric_workspaces,
+        )
+        self.active = 0
+        self.inflight_memory = 0
+        self._active_by_lane: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._active_by_workspace: Dict[Optional[str], int] = {}
+        self._lanes: Dict[str, _FairQueue] = {lane: _FairQueue() for lane in LANES}
+        # EWMA of how long a ticket is held, for Retry-After
+        self._hold_seconds = 1.0
+
+    @classmethod
+    def from_settings(cls, config: Settings) -> "AdmissionController":
+        controller = cls()
+        controller.configure(
+            max_concurrent=config.admission_max_concurrent,
+            memory_budget=config.admission_memory_budget_mb * 1024 * 1024,
+            max_queue=config.admission_max_queue,
+            queue_timeout=config.admission_queue_timeout_s,
+            enabled=config.admission_enabled,
+            fast_lane_max_cells=config.admission_fast_lane_max_cells,
+            fast_lane_slots=config.admission_fast_lane_slots,
+            aging=config.admission_aging_s,
+            workspace_max_concurrent=config.admission_workspace_max_concurrent,
+            workspace_weights=config.admission_workspace_weights_map,
+            metric_workspaces=config.admission_workspace_metrics_list,
+        )
+        return controller
+
+    def configure(
+        self,
+        max_concurrent: int,
+        memory_budget: int,
+        max_queue: int,
+        queue_timeout: float,
+        enabled: bool = True,
+        fast_lane_max_cells: int = 20_000,
+        fast_lane_slots: int = 1,
+        aging: float = 10.0,
+        workspace_max_concurrent: int = 0,
+        workspace_weights: Optional[Dict[str, float]] = None,
+        metric_workspaces: Optional[Iterable[str]] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.max_concurrent = max(1, max_concurrent)
+        self.memory_budget = memory_budget
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.fast_lane_max_cells = fast_lane_max_cells
+        # At least one slot always stays open to bulk jobs
+        self.fast_lane_slots = min(max(0, fast_lane_slots), self.max_concurrent - 1)
+        self.aging = aging
+        self.workspace_max_concurrent = workspace_max_concurrent  # 0 = no per-workspace cap
+        self.workspace_weights = dict(workspace_weights or {})
+        self.metric_workspaces = frozenset(metric_workspaces or ())
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._lanes.values())
+
+    def lane_for(self, cost: JobCost) -> str:
+        return FAST_LANE if cost.cells <= self.fast_lane_max_cells else BULK_LANE
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        return max(1, math.ceil(self._hold_seconds * (self.queued + 1) / self.max_concurrent))
+
+    def _aged(self, waiter: _Waiter) -> bool:
+        return time.monotonic() - waiter.enqueued_at >= self.aging
+
+    def _below_cap(self, workspace_id: Optional[str]) -> bool:
+        """Requests without a workspace (/validate, /preview) are not capped."""
+        return (
+            workspace_id is None
+            or self.workspace_max_concurrent <= 0
+            or self._active_by_workspace.get(workspace_id, 0) < self.workspace_max_concurrent
+        )
+
+    def _fits(self, waiter: _Waiter) -> bool:
+        if self.active == 0:
+            return True
+        if self.active >= self.max_concurrent:
+            return False
+        if self.inflight_memory + waiter.cost.memory_bytes > self.memory_budget:
+            return False
+        # Bulk jobs leave the reserved slots to small ones until they have aged
+        return (
+            waiter.lane == FAST_LANE
+            or self._aged(waiter)
+            or self._active_by_lane[BULK_LANE] < self.max_concurrent - self.fast_lane_slots
+        )
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """
+        The request to admit next. The fast lane goes first unless the bulk
+        lane's next job has waited ``aging`` seconds: from then on nothing is
+        admitted ahead of it, so big imports are delayed but never starved.
+        Within a lane workspaces share admissions fairly and a workspace at
+        its concurrency cap is skipped.
+        """
+        fast = self._lanes[FAST_LANE].peek(self._below_cap)
+        bulk = self._lanes[BULK_LANE].peek(self._below_cap)
+        if bulk is not None and self._aged(bulk):
+            return bulk
+        if fast is not None and (bulk is None or self._fits(fast)):
+            return fast
+        return bulk
+
+    def _metric_label(self, workspace_id: str) -> str:
+        return workspace_id if workspace_id in self.metric_workspaces else OTHER_WORKSPACES
+
+    def _set_workspace_metrics(self, workspace_id: Optional[str]) -> None:
+        if workspace_id is None:
+            return
+        label = self._metric_label(workspace_id)
+
+        def counted(other: Optional[str]) -> bool:
+            return other is not None and self._metric_label(other) == label
+
+        active = sum(n for other, n in self._active_by_workspace.items() if counted(other))
+        queued = sum(
+            n for lane in self._lanes.values() for other, n in lane.depths().items() if counted(other)
+        )
+        if active or queued:
+            WORKSPACE_ACTIVE.labels(workspace_id=label).set(active)
+            WORKSPACE_QUEUE_DEPTH.labels(workspace_id=label).set(queued)
+        else:
+            # Drop idle workspaces so the gauges only list current tenants
+            for gauge in (WORKSPACE_ACTIVE, WORKSPACE_QUEUE_DEPTH):
+                try:
+                    gauge.remove(label)
+                except KeyError:
+                    pass
+
+    def _admit(self, waiter: _Waiter) -> Ticket:
+        self.active += 1
+        self._active_by_lane[waiter.lane] += 1
+        self._active_by_workspace[waiter.workspace_id] = self._active_by_workspace.get(waiter.workspace_id, 0) + 1
+        self.inflight_memory += waiter.cost.memory_bytes
+        ADMISSION_ACTIVE.labels(lane=waiter.lane).set(self._active_by_lane[waiter.lane])
+        ADMISSION_INFLIGHT_MEMORY.set(self.inflight_memory)
+        if waiter.workspace_id is not None:
+            label = self._metric_label(waiter.workspace_id)
+            WORKSPACE_ADMITTED.labels(workspace_id=label).inc()
+            WORKSPACE_ADMITTED_CELLS.labels(workspace_id=label).inc(waiter.cost.cells)
+        ticket = Ticket(self, waiter.cost, waiter.route, waiter.lane, waiter.workspace_id)
+        ticket.wait_seconds = ticket.admitted_at - waiter.enqueued_at
+        return ticket
+
+    def _dispatch(self) -> None:
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None or not self._fits(waiter):
+                break
+            self._lanes[waiter.lane].pop(waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(self._admit(waiter))
+            self._set_workspace_metrics(waiter.workspace_id)
+        for lane, waiters in self._lanes.items():
+            ADMISSION_QUEUE_DEPTH.labels(lane=lane).set(len(waiters))
+
+    def _release(self, ticket: Ticket) -> None:
+        self.active -= 1
+        self._active_by_lane[ticket.lane] -= 1
+        self._active_by_workspace[ticket.workspace_id] -= 1
+        if not self._active_by_workspace[ticket.workspace_id]:
+            del self._active_by_workspace[ticket.workspace_id]
+        self.inflight_memory -= ticket.cost.memory_bytes
+        held = time.monotonic() - ticket.admitted_at
+        self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held
+        ADMISSION_ACTIVE.labels(lane=ticket.lane).set(self._active_by_lane[ticket.lane])
+        ADMISSION_INFLIGHT_MEMORY.set(self.inflight_memory)
+        self._set_workspace_metrics(ticket.workspace_id)
+        self._dispatch()
+
+    def _reject(self, route: str, status_code: int, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.labels(route=route, reason=reason).inc()
+        return AdmissionRejected(status_code, self.retry_after(), reason)
+
+    def _drop(self, waiter: _Waiter) -> None:
+        self._lanes[waiter.lane].remove(waiter)
+        self._set_workspace_metrics(waiter.workspace_id)
+        # A large job leaving the head may unblock the ones behind it
+        self._dispatch()
+
+    async def acquire(self, cost: JobCost, route: str, workspace_id: Optional[str] = None) -> Ticket:
+        """
+        Wait for a ticket for a job of ``cost``. Raises ``AdmissionRejected``
+        when the queue is full or the wait exceeds ``queue_timeout``.
+        """
+        lane = self.lane_for(cost)
+        if not self.enabled:
+            return Ticket(None, cost, route, lane, workspace_id)
+
+        waiter = _Waiter(
+            cost, route, lane, workspace_id, asyncio.get_running_loop().create_future(), time.monotonic()
+        )
+        self._lanes[lane].push(waiter, self.workspace_weights.get(workspace_id or "", 1.0))
+        self._dispatch()
+        if waiter.future.done():
+            ADMISSION_WAIT.labels(route=route, lane=lane, outcome="admitted").observe(0)
+            return waiter.future.result()
+        if self.queued > self.max_queue:
+            self._drop(waiter)
+            raise self._reject(route, 429, "queue_full")
+        self._set_workspace_metrics(workspace_id)
+
+        try:
+            ticket = await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._drop(waiter)
+            ADMISSION_WAIT.labels(route=route, lane=lane, outcome="timeout").observe(
+                time.monotonic() - waiter.enqueued_at
+            )
+            raise self._reject(route, 503, "queue_timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a ticket granted at the last moment
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release()
+            self._drop(waiter)
+            ADMISSION_WAIT.labels(route=route, lane=lane, outcome="cancelled").observe(
+                time.monotonic() - waiter.enqueued_at
+            )
+            raise
+        ADMISSION_WAIT.labels(route=route, lane=lane, outcome="admitted").observe(ticket.wait_seconds)
+        return ticket
+
+
+admission = AdmissionController.from_settings(settings)
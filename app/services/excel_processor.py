@@ -1,21 +1,52 @@
 import pandas as pd
+import numpy as np
+import hashlib
 import io
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+import zipfile
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Any, Deque, Iterator, List, Optional, Tuple
 from datetime import datetime
 import re
+from xml.etree import ElementTree
 import openpyxl
 from openpyxl.utils.exceptions import InvalidFileException
+from app.observability import observe_stage, tracer
+from app.services.exceptions import ExcelProcessingError
+from app.services.parse_pool import parse_pool
 
 logger = logging.getLogger(__name__)
 
-
-class ExcelProcessingError(Exception):
-    """Custom exception for Excel processing errors"""
-    def __init__(self, message: str, error_code: str):
-        self.message = message
-        self.error_code = error_code
-        super().__init__(self.message)
+# BIFF .xls files are OLE2 compound documents; .xlsx files are zip archives
+_XLS_MAGIC = b"\xd0\xcf\x11\xe0"
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_DOC_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def worksheet_names(file_content: bytes) -> Optional[List[str]]:
+    """
+    Worksheet names of an xlsx in workbook order (chartsheets left out, as in
+    ``pd.ExcelFile.sheet_names``), read from ``xl/workbook.xml`` and its
+    relationships without loading the workbook. None when the file is not
+    such a zip, so the caller opens it the usual way.
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_content)) as archive:
+            workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+            relationships = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        return None
+    worksheets = {
+        rel.get("Id") for rel in relationships.iter(f"{_PKG_REL_NS}Relationship")
+        if rel.get("Type", "").endswith("/worksheet")
+    }
+    sheets = list(workbook.iter(f"{_MAIN_NS}sheet"))
+    if not sheets:
+        return None
+    return [sheet.get("name") for sheet in sheets if sheet.get(f"{_DOC_REL_NS}id") in worksheets]
 
 
 class ExcelProcessor:
@@ -24,18 +55,18 @@ class ExcelProcessor:
     def __init__(self):
         self.supported_extensions = ['.xlsx', '.xls']
     
-    def validate_file(self, file_content: bytes, filename: str) -> Tuple[bool, List[str]]:
-        """Valida un archivo Excel y detecta archivos corruptos"""
-        errors = []
-        
-        # Validar extensión
+    def check_upload(self, file_content: bytes, filename: str) -> Tuple[bool, List[str]]:
+        """Validaciones que no abren el workbook: extensión y archivo vacío"""
         if not any(filename.lower().endswith(ext) for ext in self.supported_extensions):
-            errors.append(f"Extensión no soportada. Use: {', '.join(self.supported_extensions)}")
-            return False, errors
-        
-        # Validar que no esté vacío
+            return False, [f"Extensión no soportada. Use: {', '.join(self.supported_extensions)}"]
         if len(file_content) == 0:
-            errors.append("El archivo está vacío")
+            return False, ["El archivo está vacío"]
+        return True, []
+    
+    def validate_file(self, file_content: bytes, filename: str) -> Tuple[bool, List[str]]:
+        """Valida un archivo Excel y detecta archivos corruptos"""
+        is_valid, errors = self.check_upload(file_content, filename)
+        if not is_valid:
             return False, errors
         
         # Validación 1: Intentar abrir con openpyxl (detecta archivos corruptos)
@@ -116,20 +147,26 @@ class ExcelProcessor:
             start_time = datetime.now()
             
             # Leer Excel
-            df = pd.read_excel(io.BytesIO(file_content), sheet_name=0)
+            with observe_stage("parse"):
+                df = pd.read_excel(io.BytesIO(file_content), sheet_name=0)
             
             # Limpiar nombres de columnas
             df.columns = [self._sanitize_column_name(col) for col in df.columns]
             
             # Convertir a formato JSON-friendly
-            data = df.to_dict('records')
+            with observe_stage("records"):
+                data = df.to_dict('records')
             
             # Limpiar valores NaN
-            data = self._clean_nan_values(data)
+            with observe_stage("nan_cleaning"):
+                data = self._clean_nan_values(data)
             
             # Generar nombre de tabla
             table_name = self._generate_table_name(dashboard_name or "excel_data")
             
+            with observe_stage("type_inference"):
+                column_types = self._get_column_types(df)
+            
             # Calcular tiempo de procesamiento
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -140,7 +177,7 @@ class ExcelProcessor:
                 "rows_processed": len(data),
                 "columns": len(df.columns),
                 "column_names": list(df.columns),
-                "column_types": self._get_column_types(df),
+                "column_types": column_types,
                 "processing_time": processing_time,
             }
             
@@ -151,20 +188,117 @@ class ExcelProcessor:
                 "error": str(e),
             }
     
-    def get_data_preview(self, file_content: bytes, rows: int = 10) -> Dict[str, Any]:
-        """Obtiene un preview de los datos del Excel"""
+    def get_data_preview(
+        self,
+        file_content: bytes,
+        rows: int = 10,
+        sheet: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Header and first ``rows`` rows of one sheet (the first by default).
+
+        Only those rows are decoded: xlsx sheets are streamed by openpyxl in
+        read-only mode up to row ``rows + 1`` and .xls workbooks load just
+        the requested sheet, so the cost does not grow with the sheet's size.
+        Headers follow pandas' naming (``Unnamed: 2``, ``amount.1``).
+        """
         try:
-            df = pd.read_excel(io.BytesIO(file_content), sheet_name=0, nrows=rows)
-            
-            return {
-                "headers": list(df.columns),
-                "rows": df.values.tolist(),
-                "total_rows": len(df),
-                "sample_size": min(rows, len(df)),
-            }
+            if file_content[:4] == _XLS_MAGIC:
+                sheet_names, sheet_name, values = self._xls_head(file_content, rows + 1, sheet)
+            else:
+                sheet_names, sheet_name, values = self._xlsx_head(file_content, rows + 1, sheet)
+        except ExcelProcessingError:
+            raise
         except Exception as e:
             logger.error(f"Error getting preview: {str(e)}")
-            raise
+            raise ExcelProcessingError("El archivo Excel está corrupto o dañado", "CORRUPTED_FILE")
+
+        # Like pandas, trailing blank rows are not data
+        while values and all(value is None for value in values[-1]):
+            values.pop()
+        headers = self._preview_headers(values[0] if values else [])
+        data = [
+            list(row[:len(headers)]) + [None] * (len(headers) - len(row))
+            for row in values[1:]
+        ]
+        return {
+            "headers": headers,
+            "rows": data,
+            "total_rows": len(data),
+            "sample_size": min(rows, len(data)),
+            "sheet_name": sheet_name,
+            "sheets": sheet_names,
+        }
+
+    @staticmethod
+    def _pick_sheet(sheet_names: List[str], sheet: Optional[str]) -> str:
+        if sheet is None:
+            return sheet_names[0]
+        if sheet not in sheet_names:
+            raise ExcelProcessingError(f"La hoja '{sheet}' no existe en el archivo", "SHEET_NOT_FOUND")
+        return sheet
+
+    def _xlsx_head(
+        self, file_content: bytes, max_row: int, sheet: Optional[str]
+    ) -> Tuple[List[str], str, List[List[Any]]]:
+        workbook = openpyxl.load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
+        try:
+            sheet_name = self._pick_sheet(workbook.sheetnames, sheet)
+            with observe_stage("parse", sheet_name, rows=max_row):
+                values = [
+                    list(row)
+                    for row in workbook[sheet_name].iter_rows(max_row=max_row, values_only=True)
+                ]
+            return workbook.sheetnames, sheet_name, values
+        finally:
+            workbook.close()
+
+    def _xls_head(
+        self, file_content: bytes, max_row: int, sheet: Optional[str]
+    ) -> Tuple[List[str], str, List[List[Any]]]:
+        import xlrd
+
+        book = xlrd.open_workbook(file_contents=file_content, on_demand=True)
+        try:
+            sheet_name = self._pick_sheet(book.sheet_names(), sheet)
+            with observe_stage("parse", sheet_name, rows=max_row):
+                worksheet = book.sheet_by_name(sheet_name)
+                values = [
+                    [self._xls_value(cell, book.datemode) for cell in worksheet.row(index)]
+                    for index in range(min(max_row, worksheet.nrows))
+                ]
+            return book.sheet_names(), sheet_name, values
+        finally:
+            book.release_resources()
+
+    @staticmethod
+    def _xls_value(cell: Any, datemode: int) -> Any:
+        """xlrd cell -> the value pandas would produce (dates, bools, integral floats)"""
+        import xlrd
+
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        if cell.ctype == xlrd.XL_CELL_NUMBER and float(cell.value).is_integer():
+            return int(cell.value)
+        return cell.value
+
+    @staticmethod
+    def _preview_headers(header_row: List[Any]) -> List[str]:
+        headers: List[str] = []
+        seen: Dict[str, int] = {}
+        for position, value in enumerate(header_row):
+            name = f"Unnamed: {position}" if value is None else str(value)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            headers.append(name)
+        return headers
     
     def _detect_column_type(self, series: pd.Series) -> str:
         """Detecta el tipo de dato de una columna"""
@@ -221,6 +355,26 @@ class ExcelProcessor:
             cleaned.append(cleaned_row)
         return cleaned
     
+    def _column_values(self, df: pd.DataFrame) -> List[List[Any]]:
+        """
+        Each column as a list of Python values with NaN/NaT/NA as None: one
+        vectorized boxing and masking pass per column (over the memory-mapped
+        buffers after a worker handoff) instead of ``pd.isna`` on every cell.
+        """
+        values = []
+        for _, series in df.items():
+            column = series.to_numpy(dtype=object)
+            column[series.isna().to_numpy()] = None
+            values.append(column.tolist())
+        return values
+
+    @staticmethod
+    def _zip_records(names: List[str], values: List[List[Any]], rows: int) -> List[Dict[str, Any]]:
+        """Rows as dicts from column lists (same output as ``to_dict("records")`` + ``_clean_nan_values``)"""
+        if not names:
+            return [{} for _ in range(rows)]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
     def _get_column_types(self, df: pd.DataFrame) -> Dict[str, str]:
         """Obtiene los tipos de todas las columnas"""
         return {
@@ -236,75 +390,247 @@ class ExcelProcessor:
         self,
         file_content: bytes,
         workspace_id: str,
+        sheets: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
-        """Process every sheet in the workbook and return a widget-ready payload."""
+        """
+        Process every sheet in the workbook (or only ``sheets``, keeping only
+        ``columns``) and return a widget-ready payload. An unknown sheet or a
+        sheet without any of ``columns`` raises ExcelProcessingError.
+        """
         try:
             start_time = datetime.now()
-            excel_file = pd.ExcelFile(io.BytesIO(file_content))
-            sheet_names: List[str] = excel_file.sheet_names
+            with tracer.start_as_current_span(
+                "process_all_sheets", {"workspace_id": workspace_id, "bytes": len(file_content)}
+            ):
+                sheets_results = list(self.iter_sheets(file_content, workspace_id, sheets, columns))
+            processing_time = (datetime.now() - start_time).total_seconds()
+            return self.summarize_sheets(sheets_results, processing_time)
 
-            sheets_results: List[Dict[str, Any]] = []
-            all_tables: List[str] = []
-            total_widgets = 0
+        except ExcelProcessingError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in process_all_sheets: {str(e)}")
+            return {"success": False, "error": str(e)}
 
-            for sheet_name in sheet_names:
-                sheet_result = self._process_single_sheet(
-                    file_content, sheet_name, workspace_id
+    def iter_sheets(
+        self,
+        file_content: bytes,
+        workspace_id: str,
+        sheets: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield one widget-ready sheet result at a time.
+
+        The workbook is opened once and each sheet is parsed lazily, so callers
+        (e.g. the NDJSON streaming route) can hand the first sheet downstream
+        before the remaining ones are read. Like ``_data``, the internal
+        ``_sheet_index``/``_sheet_count`` keys are for storage only.
+
+        With ``sheets`` only those sheets are parsed (the read-only workbook
+        never loads the others) and with ``columns`` the rest of the columns
+        are dropped by the reader (``usecols``) before a DataFrame is built.
+
+        With ``PARSE_WORKERS`` the next sheets are parsed in worker processes
+        (up to one per worker) while the current one is processed here. The
+        upload is staged for them once and an xlsx is not opened in this
+        process at all.
+        """
+        workbook = parse_pool.stage(file_content) if parse_pool.enabled else None
+        parsing: Deque[Future] = deque()
+        try:
+            excel_file, sheet_names = self._open_workbook(file_content, workbook is not None)
+            selected = self._select_sheets(sheet_names, sheets)
+            sheet_count = len(selected)
+            ahead = parse_pool.workers if workbook is not None else 0
+            parsing.extend(parse_pool.submit(workbook, name, columns) for name in selected[:ahead])
+            for index, sheet_name in enumerate(selected):
+                current = parsing.popleft() if ahead else None
+                if ahead and index + ahead < len(selected):
+                    parsing.append(parse_pool.submit(workbook, selected[index + ahead], columns))
+                sheet = self._process_single_sheet(
+                    excel_file, sheet_name, workspace_id, columns=columns, parsing=current
                 )
-                sheets_results.append(sheet_result)
-                all_tables.append(sheet_result["table_name"])
-                total_widgets += len(sheet_result["widget_suggestions"])
+                sheet["_sheet_index"] = index
+                sheet["_sheet_count"] = sheet_count
+                yield sheet
+        finally:
+            # Abandoned stream or failed sheet: drop what the workers parsed ahead
+            for future in parsing:
+                parse_pool.spool.discard_when_done(future)
+            if workbook is not None:
+                parse_pool.unstage(workbook)
+
+    def _open_workbook(
+        self, file_content: bytes, in_workers: bool
+    ) -> Tuple[Optional[pd.ExcelFile], List[str]]:
+        """
+        The workbook to parse sheets from here and its sheet names. When the
+        workers parse the sheets, an xlsx's names come from its zip directory
+        and no ``pd.ExcelFile`` is opened in this process.
+        """
+        if in_workers:
+            names = worksheet_names(file_content)
+            if names is not None:
+                return None, names
+        with observe_stage("open_workbook", bytes=len(file_content)):
+            excel_file = pd.ExcelFile(io.BytesIO(file_content))
+        return excel_file, excel_file.sheet_names
 
-            processing_time = (datetime.now() - start_time).total_seconds()
+    def summarize_sheets(
+        self,
+        sheets_results: List[Dict[str, Any]],
+        processing_time: float,
+    ) -> Dict[str, Any]:
+        """Build the multi-sheet envelope (tables, widget count, message)."""
+        all_tables = [sheet["table_name"] for sheet in sheets_results]
+        total_widgets = sum(len(sheet["widget_suggestions"]) for sheet in sheets_results)
 
-            return {
-                "success": True,
-                "sheets_processed": len(sheets_results),
-                "sheets": sheets_results,
-                "tables": all_tables,
-                "processing_time": processing_time,
-                "widgets_created": total_widgets,
-                "message": (
-                    f"{len(sheets_results)} hoja(s) procesada(s) exitosamente. "
-                    f"{total_widgets} widget(s) sugerido(s)."
-                ),
-            }
+        return {
+            "success": True,
+            "sheets_processed": len(sheets_results),
+            "sheets": sheets_results,
+            "tables": all_tables,
+            "processing_time": processing_time,
+            "widgets_created": total_widgets,
+            "message": (
+                f"{len(sheets_results)} hoja(s) procesada(s) exitosamente. "
+                f"{total_widgets} widget(s) sugerido(s)."
+            ),
+        }
 
-        except Exception as e:
-            logger.error(f"Error in process_all_sheets: {str(e)}")
-            return {"success": False, "error": str(e)}
+    def process_sheet(
+        self,
+        file_content: bytes,
+        workspace_id: str,
+        sheet_name: Optional[str] = None,
+        table_name: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Process a single sheet (the first one by default), e.g. to update an existing table."""
+        workbook = parse_pool.stage(file_content) if parse_pool.enabled else None
+        try:
+            excel_file, sheet_names = self._open_workbook(file_content, workbook is not None)
+            if sheet_name is None:
+                sheet_name = sheet_names[0]
+            else:
+                sheet_name = self._select_sheets(sheet_names, [sheet_name])[0]
+            parsing = parse_pool.submit(workbook, sheet_name, columns) if workbook is not None else None
+            return self._process_single_sheet(excel_file, sheet_name, workspace_id, table_name, columns, parsing)
+        finally:
+            if workbook is not None:
+                parse_pool.unstage(workbook)
+
+    @staticmethod
+    def _select_sheets(sheet_names: List[str], sheets: Optional[List[str]]) -> List[str]:
+        """``sheets`` in workbook order, or every sheet when no selection was given"""
+        if not sheets:
+            return list(sheet_names)
+        missing = [name for name in sheets if name not in sheet_names]
+        if missing:
+            raise ExcelProcessingError(
+                f"La hoja '{missing[0]}' no existe en el archivo", "SHEET_NOT_FOUND"
+            )
+        return [name for name in sheet_names if name in sheets]
+
+    def _column_selector(self, columns: Optional[List[str]]):
+        """``usecols`` callable matching a header by its name or its sanitized name"""
+        if not columns:
+            return None
+        wanted = set(columns)
+        return lambda name: str(name) in wanted or self._sanitize_column_name(name) in wanted
+
+    def read_sheet(
+        self,
+        excel_file: pd.ExcelFile,
+        sheet_name: str,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Parse one sheet, keeping only ``columns`` (also the parse-worker entry point)"""
+        return excel_file.parse(sheet_name=sheet_name, usecols=self._column_selector(columns))
+
+    def row_hashes(self, df: pd.DataFrame) -> List[int]:
+        """
+        One signed 64-bit hash per row (vectorized), mixed with the column
+        names so a renamed column changes every row's hash.
+
+        Numeric columns are hashed as float64, so a column that reads as
+        integers one month and gains a decimal the next does not make every
+        row look changed (1 and 1.0 are the same value once stored as JSONB).
+        """
+        if df.columns.empty:
+            return [0] * len(df)
+        normalized = pd.DataFrame({
+            position: (
+                column.astype("float64")
+                if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+                else column
+            )
+            for position, (_, column) in enumerate(df.items())
+        })
+        columns_key = "\x1f".join(str(col) for col in df.columns).encode()
+        columns_hash = np.uint64(int.from_bytes(hashlib.blake2b(columns_key, digest_size=8).digest(), "little"))
+        hashes = pd.util.hash_pandas_object(normalized, index=False).to_numpy() ^ columns_hash
+        return hashes.view(np.int64).tolist()
 
     def _process_single_sheet(
         self,
-        file_content: bytes,
+        excel_file: Optional[pd.ExcelFile],
         sheet_name: str,
         workspace_id: str,
+        table_name: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        parsing: Optional[Future] = None,
     ) -> Dict[str, Any]:
-        """Process one sheet and return its widget-ready metadata."""
-        df = pd.read_excel(io.BytesIO(file_content), sheet_name=sheet_name)
-        df.columns = [self._sanitize_column_name(col) for col in df.columns]
+        """
+        Process one sheet and return its widget-ready metadata. ``parsing`` is
+        the sheet's parse already submitted to ``parse_pool`` (then
+        ``excel_file`` may be None).
+        """
+        with tracer.start_as_current_span("process_sheet", {"sheet_name": sheet_name}) as span:
+            with observe_stage("parse", sheet_name):
+                if parsing is not None:
+                    df = parse_pool.collect(parsing)
+                else:
+                    df = self.read_sheet(excel_file, sheet_name, columns)
+            if columns and df.columns.empty:
+                raise ExcelProcessingError(
+                    f"Ninguna de las columnas pedidas existe en la hoja '{sheet_name}'", "COLUMN_NOT_FOUND"
+                )
+            span.set_attributes({"rows": len(df), "columns": len(df.columns)})
+            df.columns = [self._sanitize_column_name(col) for col in df.columns]
 
-        column_types = self._get_column_types(df)
-        table_name = self._generate_table_name(sheet_name)
-        sample_rows = self._clean_nan_values(df.head(5).to_dict("records"))
+            with observe_stage("type_inference", sheet_name):
+                column_types = self._get_column_types(df)
+            table_name = table_name or self._generate_table_name(sheet_name)
 
-        widget_suggestions = self._suggest_widgets(column_types, table_name, sheet_name)
+            with observe_stage("row_hashing", sheet_name):
+                row_hashes = self.row_hashes(df)
+            with observe_stage("nan_cleaning", sheet_name):
+                values = self._column_values(df)
+            with observe_stage("records", sheet_name):
+                data = self._zip_records(list(df.columns), values, len(df))
+            sample_rows = data[:5]
 
-        user_import_info = self._detect_user_import(df.columns.tolist())
+            with observe_stage("widget_suggestion", sheet_name):
+                widget_suggestions = self._suggest_widgets(column_types, table_name, sheet_name)
 
-        return {
-            "sheet_name": sheet_name,
-            "table_name": table_name,
-            "rows": len(df),
-            "columns": len(df.columns),
-            "column_types": column_types,
-            "sample_rows": sample_rows,
-            "widget_suggestions": widget_suggestions,
-            "suggests_user_import": user_import_info["suggests"],
-            "user_columns": user_import_info["mapping"] if user_import_info["suggests"] else None,
-            # raw data for storage
-            "_data": self._clean_nan_values(df.to_dict("records")),
-        }
+            user_import_info = self._detect_user_import(df.columns.tolist())
+
+            return {
+                "sheet_name": sheet_name,
+                "table_name": table_name,
+                "rows": len(df),
+                "columns": len(df.columns),
+                "column_types": column_types,
+                "sample_rows": sample_rows,
+                "widget_suggestions": widget_suggestions,
+                "suggests_user_import": user_import_info["suggests"],
+                "user_columns": user_import_info["mapping"] if user_import_info["suggests"] else None,
+                # raw data for storage
+                "_data": data,
+                "_row_hashes": row_hashes,
+            }
 
     # -----------------------------------------------------------------------
     # Widget suggestion engine
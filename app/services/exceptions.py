@@ -0,0 +1,9 @@
+"""Service-layer exceptions, importable without loading pandas/openpyxl"""
+
+
+class ExcelProcessingError(Exception):
+    """Custom exception for Excel processing errors"""
+    def __init__(self, message: str, error_code: str):
+        self.message = message
+        self.error_code = error_code
+        super().__init__(self.message)
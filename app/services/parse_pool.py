@@ -0,0 +1,299 @@
+"""
+Sheet parsing in worker processes, with a memory-mapped handoff.
+
+With ``PARSE_WORKERS`` > 0 ``ExcelProcessor`` sends the pandas parse of each
+sheet (the step that holds the GIL the longest) to a process pool, so a big
+import no longer stalls the event loop or the threads serving other uploads.
+
+The upload crosses to the workers once: ``ParsePool.stage`` writes it to
+``PARSE_HANDOFF_DIR`` and each task carries only its path and sheet name. A
+worker opens a workbook the first time it gets one of its sheets and keeps
+it open (``WORKBOOK_CACHE_SIZE`` uploads per worker), so every further sheet
+of the same upload is parsed from the already loaded workbook. The parent
+reads the sheet names from the zip directory and does not open it at all.
+
+A parsed DataFrame has to come back to this process. Pickling it through the
+pool's result pipe copies every buffer twice (worker → pipe → parent) and
+unpickles it while holding the parent's GIL. With ``PARSE_HANDOFF=arrow``
+(default) the worker writes the frame as an Arrow IPC file in
+``PARSE_HANDOFF_DIR`` (``/dev/shm``, i.e. RAM, when available) and only a
+small ``FrameHandle`` crosses the pipe; the parent memory-maps the file
+read-only and builds its DataFrame over the mapped buffers. Numeric and
+datetime columns are written without a null bitmap (NaN/NaT stay in the
+values) so they come back zero-copy; string columns become Python objects
+either way. A column Arrow cannot hold (an object column mixing ints and
+strings) travels pickled inside the handle. The rows stored and returned
+are still Python objects: ``ExcelProcessor`` boxes each column once from the
+mapped buffers, without a row-by-row ``to_dict``. ``PARSE_HANDOFF=pickle``
+returns the DataFrame itself, for comparison
+(``python -m tests.benchmarks.bench_handoff``).
+
+``FrameSpool`` owns the files: each frame is unlinked right after it is mapped
+(the mapping stays valid until the DataFrame is gone), handles that are
+never opened are discarded when their future completes, and files left by a
+process that died mid-handoff are swept when the pool starts. A staged
+upload is unlinked when its sheets have been collected; a worker that still
+holds it open keeps reading it until the workbook leaves its cache.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HANDOFF_MODES = ("arrow", "pickle")
+SPOOL_PREFIX = "excel-frame-"
+WORKBOOK_CACHE_SIZE = 2  # uploads a worker keeps open, so two interleaved imports do not reopen each other
+
+# Worker process: staged upload path -> its opened pd.ExcelFile, least recently used first
+_workbooks: "OrderedDict[str, Any]" = OrderedDict()
+
+
+def default_handoff_dir() -> str:
+    """``/dev/shm`` (tmpfs) when the platform has it, the temp dir otherwise"""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+@dataclass(frozen=True)
+class FrameHandle:
+    """What crosses the result pipe for one parsed sheet"""
+    labels: List[Any]                    # original column labels, in order
+    rows: int
+    path: Optional[str] = None           # Arrow IPC file (arrow handoff)
+    fallback: Dict[int, Any] = field(default_factory=dict)  # position -> Series Arrow could not hold
+    frame: Any = None                    # the DataFrame itself (pickle handoff)
+    nbytes: int = 0
+    deduplicate: bool = False            # strings repeat enough to share one object per value
+
+
+def write_frame(frame: "pd.DataFrame", directory: str) -> FrameHandle:
+    """Worker side: write ``frame`` as an Arrow IPC file in ``directory``"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays, names, fallback = [], [], {}
+    strings = distinct = 0
+    for position, (_, series) in enumerate(frame.items()):
+        try:
+            if series.dtype.kind in "fiubM":
+                # Keep NaN/NaT as values: no null bitmap, so the parent maps them zero-copy
+                array = pa.array(series.to_numpy(), from_pandas=False)
+            else:
+                array = pa.Array.from_pandas(series)
+        except (pa.ArrowException, OverflowError):
+            fallback[position] = series
+            continue
+        if pa.types.is_string(array.type):
+            strings += len(array) - array.null_count
+            distinct += pc.count_distinct(array).as_py()
+        arrays.append(array)
+        names.append(f"c{position}")
+    table = pa.Table.from_arrays(arrays, names=names)
+    path = os.path.join(directory, f"{SPOOL_PREFIX}{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return FrameHandle(
+        labels=list(frame.columns),
+        rows=len(frame),
+        path=path,
+        fallback=fallback,
+        nbytes=os.path.getsize(path),
+        # Interning repeated strings while converting pays off only when they repeat
+        deduplicate=distinct * 2 <= strings,
+    )
+
+
+def open_workbook(path: str) -> "pd.ExcelFile":
+    """Worker side: the staged upload at ``path``, opened once however many of its sheets are parsed here"""
+    import pandas as pd
+
+    excel_file = _workbooks.pop(path, None)
+    if excel_file is None:
+        excel_file = pd.ExcelFile(path)
+        while len(_workbooks) >= WORKBOOK_CACHE_SIZE:
+            _, oldest = _workbooks.popitem(last=False)
+            oldest.close()
+    _workbooks[path] = excel_file
+    return excel_file
+
+
+def parse_sheet(
+    workbook: str,
+    sheet_name: str,
+    columns: Optional[List[str]],
+    handoff: str,
+    directory: str,
+) -> FrameHandle:
+    """Worker entry point: parse one sheet of the staged ``workbook`` and hand it back with ``handoff``"""
+    from app.services.excel_processor import ExcelProcessor
+
+    frame = ExcelProcessor().read_sheet(open_workbook(workbook), sheet_name, columns)
+    if handoff == "pickle":
+        return FrameHandle(labels=list(frame.columns), rows=len(frame), frame=frame)
+    return write_frame(frame, directory)
+
+
+class FrameSpool:
+    """Lifecycle of the handoff files in ``directory``"""
+
+    def __init__(self, directory: str, stale_after: float = 600.0):
+        self.directory = directory
+        self.stale_after = stale_after
+
+    def stage(self, file_content: bytes) -> str:
+        """Write an upload for the workers to open by path"""
+        path = os.path.join(self.directory, f"{SPOOL_PREFIX}{uuid.uuid4().hex}.workbook")
+        with open(path, "wb") as sink:
+            sink.write(file_content)
+        return path
+
+    def open(self, handle: FrameHandle) -> "pd.DataFrame":
+        """Map ``handle`` read-only and rebuild its DataFrame; the file is removed"""
+        if handle.path is None:
+            return handle.frame
+        import numpy as np
+        import pyarrow as pa
+
+        try:
+            with pa.memory_map(handle.path, "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+        finally:
+            self.discard(handle)
+        if table.num_columns:
+            frame = table.to_pandas(split_blocks=True, deduplicate_objects=handle.deduplicate)
+        else:
+            import pandas as pd
+
+            frame = pd.DataFrame(index=pd.RangeIndex(handle.rows))
+        for position, column in enumerate(table.columns):
+            if column.null_count and frame.dtypes.iloc[position] == object:
+                # Arrow nulls come back as None; pandas' readers use NaN
+                values = frame.iloc[:, position].to_numpy(dtype=object, copy=True)
+                values[column.is_null().to_numpy()] = np.nan
+                frame.isetitem(position, values)
+        for position, series in sorted(handle.fallback.items()):
+            frame.insert(position, f"fallback{position}", series.to_numpy(), allow_duplicates=True)
+        frame.columns = handle.labels
+        return frame
+
+    def discard(self, handle: FrameHandle) -> None:
+        """Remove the file behind ``handle`` (already mapped or never to be opened)"""
+        if handle.path is not None:
+            self.remove(handle.path)
+
+    def remove(self, path: str) -> None:
+        """Remove a handoff file or a staged upload"""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # e.g. Windows, where a mapped or open file cannot be removed: left to sweep()
+            logger.warning(f"[parse_pool] Could not remove {path}: {e}")
+
+    def discard_when_done(self, future: "Future[FrameHandle]") -> None:
+        """Remove the file of a handle nobody will open, once the worker writes it"""
+        def _discard(done: "Future[FrameHandle]") -> None:
+            if not done.cancelled() and done.exception() is None:
+                self.discard(done.result())
+
+        if not future.cancel():
+            future.add_done_callback(_discard)
+
+    def sweep(self) -> int:
+        """Remove handoff files older than ``stale_after`` (left by a dead process)"""
+        removed = 0
+        cutoff = time.time() - self.stale_after
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            if not entry.name.startswith(SPOOL_PREFIX):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"[parse_pool] Swept {removed} stale handoff file(s) from {self.directory}")
+        return removed
+
+
+class ParsePool:
+    """Process pool for ``ExcelProcessor`` sheet parsing (disabled with 0 workers)"""
+
+    def __init__(self, workers: int = 0, handoff: str = "arrow", directory: str = ""):
+        if handoff not in HANDOFF_MODES:
+            raise ValueError(f"PARSE_HANDOFF must be one of {HANDOFF_MODES}, not {handoff!r}")
+        self.workers = max(0, workers)
+        self.handoff = handoff
+        self.spool = FrameSpool(directory or default_handoff_dir())
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_settings(cls, config: Any) -> "ParsePool":
+        return cls(
+            workers=config.parse_workers,
+            handoff=config.parse_handoff,
+            directory=config.parse_handoff_dir,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self.spool.sweep()
+            # spawn: forking a process that already runs threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def stage(self, file_content: bytes) -> str:
+        """Write an upload once for the workers; its sheets are submitted by the returned path"""
+        self._pool()  # sweeps leftovers before the first file is written
+        return self.spool.stage(file_content)
+
+    def unstage(self, workbook: str) -> None:
+        """Remove a staged upload once its sheets have been collected (or abandoned)"""
+        self.spool.remove(workbook)
+
+    def submit(
+        self,
+        workbook: str,
+        sheet_name: str,
+        columns: Optional[List[str]] = None,
+    ) -> "Future[FrameHandle]":
+        """Start parsing ``sheet_name`` of the staged ``workbook`` in a worker"""
+        return self._pool().submit(
+            parse_sheet, workbook, sheet_name, columns, self.handoff, self.spool.directory
+        )
+
+    def collect(self, future: "Future[FrameHandle]") -> "pd.DataFrame":
+        """Wait for a submitted sheet and map its frame into this process"""
+        return self.spool.open(future.result())
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+parse_pool = ParsePool.from_settings(settings)
@@ -1,6 +1,8 @@
+from starlette.concurrency import run_in_threadpool
 from supabase import create_client, Client
 from app.config import settings
 from app.infrastructure import DataStorageService
+from app.observability import tracer
 from typing import Dict, Any, List, Optional
 import logging
 
@@ -17,43 +19,45 @@ class SupabaseClient:
         )
         self.data_storage = DataStorageService(self.client)
     
+    async def _execute(self, query) -> Any:
+        """Run a (blocking) supabase-py request in the threadpool, off the event loop"""
+        return await run_in_threadpool(query.execute)
+    
     async def create_dashboard(
         self,
         workspace_id: str,
         name: str,
         description: str,
         icon: str = "table",
-        color: str = "#228BE6"
+        color: str = "#228BE6",
+        dashboard_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Crea un nuevo dashboard en el workspace"""
+        """
+        Crea un nuevo dashboard en el workspace
+
+        La posición se asigna en la base (función ``create_dashboard``,
+        migración 006) en el mismo request que el insert, bajo un lock por
+        workspace, así que dos uploads concurrentes al mismo workspace nunca
+        obtienen la misma posición.
+        Con ``dashboard_id`` el id se genera del lado del cliente, para poder
+        referenciarlo (p. ej. en el ``source`` de una tabla) mientras se crea.
+        """
         try:
-            # Obtener la posición más alta actual
-            response = self.client.table("dashboards").select("position").eq(
-                "workspace_id", workspace_id
-            ).order("position", desc=True).limit(1).execute()
-            
-            next_position = 0
-            if response.data and len(response.data) > 0:
-                next_position = response.data[0]["position"] + 1
-            
-            # Crear dashboard
-            dashboard_data = {
-                "workspace_id": workspace_id,
-                "name": name,
-                "description": description,
-                "icon": icon,
-                "position": next_position,
-                "grid_w": 4,
-                "grid_h": 2,
-                "is_system": False,
-                "color": color,
+            params = {
+                "p_workspace_id": workspace_id,
+                "p_name": name,
+                "p_description": description,
+                "p_icon": icon,
+                "p_color": color,
+                "p_id": dashboard_id,
             }
+            with tracer.start_as_current_span("supabase.rpc create_dashboard", {"workspace_id": workspace_id}):
+                result = await self._execute(self.client.rpc("create_dashboard", params))
             
-            result = self.client.table("dashboards").insert(dashboard_data).execute()
-            
-            if result.data and len(result.data) > 0:
-                logger.info(f"Dashboard created: {result.data[0]['id']}")
-                return result.data[0]
+            dashboard = result.data[0] if isinstance(result.data, list) and result.data else result.data
+            if dashboard:
+                logger.info(f"Dashboard created: {dashboard['id']} at position {dashboard['position']}")
+                return dashboard
             else:
                 raise Exception("Failed to create dashboard")
                 
@@ -66,7 +70,10 @@ class SupabaseClient:
         workspace_id: str,
         table_name: str,
         data: List[Dict[str, Any]],
-        column_types: Dict[str, str]
+        column_types: Dict[str, str],
+        fingerprint: Optional[str] = None,
+        source: Optional[Dict[str, Any]] = None,
+        row_hashes: Optional[List[int]] = None,
     ) -> int:
         """
         Stores Excel data using DataStorageService
@@ -76,9 +83,80 @@ class SupabaseClient:
             workspace_id=workspace_id,
             table_name=table_name,
             data=data,
-            column_types=column_types
+            column_types=column_types,
+            fingerprint=fingerprint,
+            source=source,
+            row_hashes=row_hashes,
+        )
+    
+    async def resume_excel_data(self, workspace_id: str, table_id: str) -> Dict[str, int]:
+        """Completa una tabla cuyo almacenamiento falló a mitad, desde el primer lote faltante"""
+        return await self.data_storage.resume_excel_data(workspace_id, table_id)
+    
+    async def get_table_metadata(self, workspace_id: str, table_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata de una tabla del workspace (None si no existe)"""
+        return await self.data_storage.get_table_metadata(workspace_id, table_id)
+    
+    async def get_table_data(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Página de filas de una tabla almacenada, en orden"""
+        return await self.data_storage.get_table_data(
+            table_id, limit=limit, offset=offset, row_format=row_format
+        )
+    
+    async def get_table_columns(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> Dict[str, List[Any]]:
+        """Página de una tabla almacenada, columna por columna"""
+        return await self.data_storage.get_table_columns(
+            table_id, limit=limit, offset=offset, row_format=row_format, names=names
+        )
+    
+    async def update_excel_data(
+        self,
+        workspace_id: str,
+        table_id: str,
+        data: List[Dict[str, Any]],
+        column_types: Dict[str, str],
+        row_hashes: List[int],
+        row_format: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """Actualiza una tabla existente escribiendo solo las filas que cambiaron"""
+        return await self.data_storage.update_excel_data(
+            workspace_id=workspace_id,
+            table_id=table_id,
+            data=data,
+            column_types=column_types,
+            row_hashes=row_hashes,
+            row_format=row_format,
         )
     
+    async def find_tables_by_fingerprint(
+        self,
+        workspace_id: str,
+        fingerprint: str
+    ) -> List[Dict[str, Any]]:
+        """Tablas ya ingestadas en el workspace desde un archivo idéntico"""
+        return await self.data_storage.find_tables_by_fingerprint(workspace_id, fingerprint)
+    
+    async def reserve_upload(self, workspace_id: str, fingerprint: str) -> Optional[str]:
+        """Reserva el fingerprint para un ingest (token), o None si otro upload idéntico está en curso"""
+        return await self.data_storage.reserve_upload(workspace_id, fingerprint)
+    
+    async def release_upload(self, workspace_id: str, fingerprint: str, token: str) -> None:
+        """Libera la reserva tomada con ``token``"""
+        await self.data_storage.release_upload(workspace_id, fingerprint, token)
+    
     async def create_widget(
         self,
         dashboard_id: str,
@@ -96,7 +174,10 @@ class SupabaseClient:
                 "height": 4,
             }
             
-            result = self.client.table("widgets").insert(widget_data).execute()
+            with tracer.start_as_current_span(
+                "supabase.insert widgets", {"dashboard_id": dashboard_id, "widget_type": widget_type}
+            ):
+                result = await self._execute(self.client.table("widgets").insert(widget_data))
             
             if result.data and len(result.data) > 0:
                 logger.info(f"Widget created: {result.data[0]['id']}")
@@ -108,12 +189,49 @@ class SupabaseClient:
             logger.error(f"Error creating widget: {str(e)}")
             raise
     
+    async def create_widgets(
+        self,
+        dashboard_id: str,
+        widgets: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Crea todos los widgets ({widget_type, config}) de un dashboard en un solo insert"""
+        if not widgets:
+            return []
+        try:
+            widget_data = [
+                {
+                    "dashboard_id": dashboard_id,
+                    "type": widget["widget_type"],
+                    "config": widget["config"],
+                    "position": position,
+                    "width": 6,
+                    "height": 4,
+                }
+                for position, widget in enumerate(widgets)
+            ]
+            
+            with tracer.start_as_current_span(
+                "supabase.insert widgets", {"dashboard_id": dashboard_id, "widgets": len(widgets)}
+            ):
+                result = await self._execute(self.client.table("widgets").insert(widget_data))
+            
+            if not result.data or len(result.data) != len(widgets):
+                raise Exception("Failed to create widgets")
+            logger.info(f"{len(result.data)} widgets created in dashboard {dashboard_id}")
+            return result.data
+                
+        except Exception as e:
+            logger.error(f"Error creating widgets: {str(e)}")
+            raise
+    
     async def get_workspace(self, workspace_id: str) -> Optional[Dict[str, Any]]:
         """Obtiene información de un workspace"""
         try:
-            result = self.client.table("workspaces").select("*").eq(
-                "id", workspace_id
-            ).single().execute()
+            result = await self._execute(
+                self.client.table("workspaces").select("*").eq(
+                    "id", workspace_id
+                ).single()
+            )
             
             return result.data if result.data else None
         except Exception as e:
@@ -0,0 +1,60 @@
+"""
+Upload fingerprints — recognise a workbook already ingested into a workspace.
+
+Every table stored from an upload is tagged with the file's SHA-256 and a
+``source`` record (``mode``, ``upload_id``, ``sheet_index``, ``sheet_count``
+and the ``result`` returned to the client). The tag is written after the
+table's last row, so only fully stored uploads are ever matched.
+"""
+import hashlib
+from typing import Any, Dict, List, Optional
+
+
+def file_fingerprint(file_content: bytes, projection: Optional[Dict[str, List[str]]] = None) -> str:
+    """
+    SHA-256 of the raw upload (hex). A ``sheets``/``columns`` projection is
+    hashed in too, so a projected upload never matches the full one.
+    """
+    digest = hashlib.sha256(file_content)
+    for key, names in sorted((projection or {}).items()):
+        digest.update(f"\0{key}=".encode() + "\0".join(sorted(names)).encode())
+    return digest.hexdigest()
+
+
+def build_source(
+    mode: str,
+    upload_id: str,
+    sheet_index: int,
+    sheet_count: int,
+    result: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        "upload_id": upload_id,
+        "sheet_index": sheet_index,
+        "sheet_count": sheet_count,
+        "result": result,
+    }
+
+
+def latest_complete_upload(tables: List[Dict[str, Any]], mode: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Pick the newest upload (in ``mode``) whose tables were all stored.
+
+    ``tables`` are metadata rows sharing a fingerprint, newest first. Returns
+    the ``source["result"]`` of each of its tables in workbook order, or None
+    when there is no complete upload (e.g. a sheet failed to store).
+    """
+    uploads: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    for table in tables:
+        source = table.get("source") or {}
+        if source.get("mode") != mode:
+            continue
+        sheets = uploads.setdefault(source["upload_id"], {})
+        sheets[source["sheet_index"]] = source
+
+    for sheets in uploads.values():  # insertion order == newest first
+        sheet_count = next(iter(sheets.values()))["sheet_count"]
+        if len(sheets) == sheet_count:
+            return [sheets[index]["result"] for index in sorted(sheets)]
+    return None
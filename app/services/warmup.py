@@ -0,0 +1,110 @@
+"""
+Cold-start warm-up.
+
+Importing the app no longer loads pandas, openpyxl or supabase, so ``/`` and
+``/health`` answer as soon as the server is listening. The first upload
+would pay for those imports (and for openpyxl/pandas' own first-call
+setup) instead; ``warmup.start()`` runs from the lifespan and pushes a tiny
+workbook through validation and processing in the threadpool so that cost is
+paid before real traffic arrives. ``GET /ready`` reports when it is done.
+
+The warm-up workbook goes through the normal pipeline, so it shows up as one
+observation in the per-stage histograms and as its own ``warmup`` trace.
+"""
+import asyncio
+import io
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.observability import tracer
+
+logger = logging.getLogger(__name__)
+
+
+def _tiny_workbook() -> bytes:
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "warmup"
+    sheet.append(["fecha", "categoria", "monto", "activo"])
+    sheet.append(["2026-01-01", "a", 1.5, True])
+    sheet.append(["2026-01-02", "b", 2, False])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _warm_pipeline() -> None:
+    """Import the heavy modules and run the processing pipeline once"""
+    from app.services.excel_processor import ExcelProcessor
+    import app.services.supabase_client  # noqa: F401
+
+    content = _tiny_workbook()
+    processor = ExcelProcessor()
+    is_valid, errors = processor.validate_file(content, "warmup.xlsx")
+    if not is_valid:
+        raise RuntimeError(f"warm-up workbook rejected: {errors}")
+    result = processor.process_all_sheets(content, "warmup")
+    if not result.get("success"):
+        raise RuntimeError(f"warm-up processing failed: {result.get('error')}")
+
+
+class Warmup:
+    """Runs ``_warm_pipeline`` once in the background and tracks its state"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return not self.enabled or self.finished_at is not None
+
+    def start(self) -> None:
+        self.enabled = True
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.error = None
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            with tracer.start_as_current_span("warmup"):
+                await run_in_threadpool(_warm_pipeline)
+        except Exception as warmup_err:
+            # The service still works without warm-up: report it and stay ready
+            self.error = str(warmup_err)
+            logger.warning(f"[warmup] Failed: {warmup_err}")
+        self.finished_at = time.perf_counter()
+        logger.info(f"[warmup] Finished in {self.finished_at - self.started_at:.2f}s")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        duration = (
+            round(self.finished_at - self.started_at, 3)
+            if self.finished_at is not None and self.started_at is not None else None
+        )
+        return {
+            "enabled": self.enabled,
+            "finished": self.finished_at is not None,
+            "duration_seconds": duration,
+            "error": self.error,
+        }
+
+
+warmup = Warmup()
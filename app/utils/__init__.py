@@ -1,4 +1,5 @@
 from app.utils.validators import validate_workspace_access
 from app.utils.helpers import generate_unique_id, format_file_size
+from app.utils.serialization import FastJSONResponse
 
-__all__ = ["validate_workspace_access", "generate_unique_id", "format_file_size"]
+__all__ = ["validate_workspace_access", "generate_unique_id", "format_file_size", "FastJSONResponse"]
@@ -0,0 +1,85 @@
+"""
+Arrow IPC encoding for row payloads (``Accept: application/vnd.apache.arrow.stream``).
+
+Rows are sent column by column: each column becomes one typed Arrow array and
+its name travels once in the schema instead of once per row as in JSON.
+pyarrow is imported on first use so it does not weigh on cold start.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _arrow_type(pa: Any, column_type: Optional[str]) -> Any:
+    """Arrow type for a column type of ``ExcelProcessor._detect_column_type``"""
+    return {
+        "integer": pa.int64(),
+        "number": pa.float64(),
+        "boolean": pa.bool_(),
+        "date": pa.timestamp("us"),
+        "string": pa.string(),
+    }.get(column_type)
+
+
+def _column_array(pa: Any, values: Sequence[Any], column_type: Optional[str]) -> Any:
+    """
+    Typed array for one column. The type is inferred from the values and then
+    cast to the declared ``column_type`` (ISO strings read back from the
+    database become timestamps); a cast that would lose data keeps the
+    inferred type, and a column pyarrow cannot infer (mixed int/str) is sent
+    as strings.
+    """
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowException, OverflowError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+    target = _arrow_type(pa, column_type)
+    if target is not None and array.type != target:
+        try:
+            array = array.cast(target)
+        except pa.ArrowException:
+            pass
+    return array
+
+
+def columns_to_ipc(
+    columns: Dict[str, Sequence[Any]],
+    column_types: Optional[Dict[str, str]] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    """
+    Encode ``{name: values}`` as one Arrow IPC stream. ``metadata`` goes into
+    the schema metadata, each value JSON-encoded.
+    """
+    import pyarrow as pa
+
+    column_types = column_types or {}
+    table = pa.Table.from_arrays(
+        [_column_array(pa, values, column_types.get(name)) for name, values in columns.items()],
+        names=[str(name) for name in columns],
+    )
+    if metadata:
+        table = table.replace_schema_metadata({key: orjson.dumps(value) for key, value in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def rows_to_columns(headers: List[str], rows: List[Sequence[Any]]) -> Dict[str, List[Any]]:
+    """Transpose positional rows (as returned by /preview) into columns"""
+    columns = list(zip(*rows)) if rows else [() for _ in headers]
+    return {name: list(values) for name, values in zip(headers, columns)}
+
+
+def records_to_columns(records: List[Dict[str, Any]], names: Sequence[str] = ()) -> Dict[str, List[Any]]:
+    """
+    Column-wise view of stored row dicts: ``names`` first (the table schema),
+    then any other key in order of first appearance.
+    """
+    ordered = dict.fromkeys(names)
+    for record in records:
+        ordered.update(dict.fromkeys(key for key in record if key not in ordered))
+    return {name: [record.get(name) for record in records] for name in ordered}
@@ -0,0 +1,48 @@
+"""Fast JSON encoding for internally built response payloads"""
+from datetime import datetime
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Fallback for types orjson does not encode natively.
+
+    - Pydantic models (also those built with ``model_construct``) are dumped
+      with ``model_dump(mode="json", by_alias=True)`` (as FastAPI renders a
+      ``response_model``), so aliases, field serializers and nested models are
+      honoured. ``Any`` fields that still hold numpy/pandas scalars are left
+      to orjson (python-mode dump) instead of failing the response.
+    - ``pd.Timestamp`` (a datetime subclass) becomes ISO-8601, ``pd.NaT`` null.
+    """
+    if isinstance(obj, BaseModel):
+        try:
+            return obj.model_dump(mode="json", by_alias=True, warnings=False)
+        except PydanticSerializationError:
+            return obj.model_dump(by_alias=True, warnings=False)
+    if isinstance(obj, datetime):
+        # NaT is the only datetime that is not equal to itself
+        return None if obj != obj else obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content with orjson, numpy scalars and pandas timestamps included."""
+    return orjson.dumps(content, default=json_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse that also understands pydantic models, numpy scalars and
+    pandas timestamps. Routes return it directly so FastAPI skips the
+    response_model re-validation and the stdlib ``json`` encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
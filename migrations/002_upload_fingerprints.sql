@@ -0,0 +1,15 @@
+-- Migration: Upload fingerprints for idempotent ingestion
+-- A table is tagged with the SHA-256 of the uploaded file once all of its rows
+-- are stored, so re-uploading the same workbook to the same workspace can
+-- return the existing tables instead of ingesting everything again.
+
+ALTER TABLE data_tables_metadata
+    ADD COLUMN IF NOT EXISTS file_fingerprint TEXT,
+    ADD COLUMN IF NOT EXISTS source JSONB;
+
+CREATE INDEX IF NOT EXISTS idx_data_tables_fingerprint
+    ON data_tables_metadata(workspace_id, file_fingerprint)
+    WHERE file_fingerprint IS NOT NULL;
+
+COMMENT ON COLUMN data_tables_metadata.file_fingerprint IS 'SHA-256 (hex) of the uploaded file; set only after every row was stored';
+COMMENT ON COLUMN data_tables_metadata.source IS 'Upload that produced the table: {mode, upload_id, sheet_index, sheet_count, result}';
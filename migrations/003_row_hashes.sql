@@ -0,0 +1,8 @@
+-- Migration: Per-row content hashes for incremental re-uploads
+-- /process with table_id compares the hash of every row of the new workbook
+-- against row_hash and only upserts/deletes the rows that changed.
+
+ALTER TABLE data_table_rows
+    ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+
+COMMENT ON COLUMN data_table_rows.row_hash IS '64-bit hash of the row values and column names (NULL for rows stored before hashing)';
@@ -0,0 +1,15 @@
+-- Migration: Ingestion status for resumable storage
+-- A table is 'processing' while its row batches are being inserted,
+-- 'completed' once the last batch committed and 'failed' if storage stopped
+-- part-way (row_count then holds the committed rows). Failed tables are
+-- finished with POST /api/excel/tables/{table_id}/resume.
+
+ALTER TABLE data_tables_metadata
+    ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'completed'
+        CHECK (status IN ('processing', 'completed', 'failed'));
+
+CREATE INDEX IF NOT EXISTS idx_data_tables_unfinished
+    ON data_tables_metadata(workspace_id, status)
+    WHERE status <> 'completed';
+
+COMMENT ON COLUMN data_tables_metadata.status IS 'processing | completed | failed (row_count = rows committed so far)';
@@ -0,0 +1,72 @@
+-- Migration: Single round-trip ingestion RPC
+-- ingest_table_chunk() stores a chunk of rows in one call, creating the table
+-- metadata on the first chunk and completing it (row_count, status,
+-- fingerprint) on the last one. With STORAGE_INGEST_RPC=True a sheet costs one
+-- request per chunk instead of metadata insert + N batch inserts + update.
+--
+-- Every call is one transaction and idempotent: the table id is generated by
+-- the client, metadata is created with ON CONFLICT (id) DO NOTHING and rows
+-- with ON CONFLICT (table_id, row_number) DO NOTHING, so a chunk retried after
+-- a lost response never duplicates anything. SECURITY INVOKER keeps the RLS
+-- policies of 001_data_storage_tables.sql in force.
+
+CREATE OR REPLACE FUNCTION ingest_table_chunk(
+    p_table_id UUID,
+    p_rows JSONB,
+    p_metadata JSONB DEFAULT NULL,
+    p_is_last BOOLEAN DEFAULT FALSE,
+    p_fingerprint TEXT DEFAULT NULL,
+    p_source JSONB DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+DECLARE
+    v_inserted INTEGER;
+    v_row_count INTEGER;
+BEGIN
+    IF p_metadata IS NOT NULL THEN
+        INSERT INTO data_tables_metadata (id, workspace_id, table_name, columns, row_count, status)
+        VALUES (
+            p_table_id,
+            (p_metadata->>'workspace_id')::UUID,
+            p_metadata->>'table_name',
+            p_metadata->'columns',
+            0,
+            'processing'
+        )
+        ON CONFLICT (id) DO NOTHING;
+    END IF;
+
+    INSERT INTO data_table_rows (table_id, workspace_id, row_number, row_data, row_hash)
+    SELECT
+        p_table_id,
+        (r->>'workspace_id')::UUID,
+        (r->>'row_number')::INTEGER,
+        r->'row_data',
+        (r->>'row_hash')::BIGINT
+    FROM jsonb_array_elements(COALESCE(p_rows, '[]'::JSONB)) AS r
+    ON CONFLICT (table_id, row_number) DO NOTHING;
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+
+    IF p_is_last THEN
+        SELECT COUNT(*) INTO v_row_count FROM data_table_rows WHERE table_id = p_table_id;
+        UPDATE data_tables_metadata
+        SET row_count = v_row_count,
+            status = 'completed',
+            file_fingerprint = COALESCE(p_fingerprint, file_fingerprint),
+            source = COALESCE(p_source, source),
+            updated_at = NOW()
+        WHERE id = p_table_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'table_id', p_table_id,
+        'rows_inserted', v_inserted,
+        'row_count', v_row_count
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION ingest_table_chunk IS 'Stores one chunk of a sheet: creates metadata on the first chunk, completes row_count/status on the last';
@@ -0,0 +1,50 @@
+-- Migration: Atomic dashboard position allocation
+-- create_dashboard() computes the next position of the workspace and inserts
+-- the dashboard in the same call, replacing the "select max(position), then
+-- insert position + 1" pair of requests. The position is taken from the
+-- dashboards themselves under a per-workspace transaction advisory lock, so
+-- concurrent uploads to the same workspace are serialized and never get the
+-- same position, and dashboards created any other way (e.g. from the
+-- frontend) are always accounted for.
+
+CREATE INDEX IF NOT EXISTS idx_dashboards_workspace_position
+    ON dashboards(workspace_id, position);
+
+CREATE OR REPLACE FUNCTION create_dashboard(
+    p_workspace_id UUID,
+    p_name TEXT,
+    p_description TEXT,
+    p_icon TEXT DEFAULT 'table',
+    p_color TEXT DEFAULT '#228BE6',
+    p_id UUID DEFAULT NULL
+)
+RETURNS dashboards
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+DECLARE
+    v_position INTEGER;
+    v_dashboard dashboards;
+BEGIN
+    -- Held until the transaction (this call) ends: allocations in the same
+    -- workspace run one at a time, other workspaces are not blocked
+    PERFORM pg_advisory_xact_lock(hashtext('create_dashboard'), hashtext(p_workspace_id::text));
+
+    SELECT COALESCE(MAX(position) + 1, 0) INTO v_position
+    FROM dashboards
+    WHERE workspace_id = p_workspace_id;
+
+    INSERT INTO dashboards (
+        id, workspace_id, name, description, icon, position, grid_w, grid_h, is_system, color
+    )
+    VALUES (
+        COALESCE(p_id, gen_random_uuid()), p_workspace_id, p_name, p_description, p_icon,
+        v_position, 4, 2, FALSE, p_color
+    )
+    RETURNING * INTO v_dashboard;
+
+    RETURN v_dashboard;
+END;
+$$;
+
+COMMENT ON FUNCTION create_dashboard IS 'Inserts a dashboard at the next position of its workspace in one atomic call';
@@ -0,0 +1,70 @@
+-- Migration: Compressed row blocks
+-- With STORAGE_ROW_FORMAT=zstd_blocks a table's rows are stored in
+-- data_table_blocks instead of data_table_rows: each record holds a run of
+-- consecutive rows (STORAGE_BLOCK_ROWS, default 1000) with the column names
+-- once and the values column by column, zstd-compressed into a bytea.
+-- data_tables_metadata.row_format tells readers which of the two tables holds
+-- the rows; existing tables stay 'jsonb'.
+--
+-- Blocks are identified by their first row, so a block retried after a lost
+-- response is upserted onto itself. row_hashes keeps the per-row hashes of
+-- 003_row_hashes.sql so incremental re-uploads diff without decompressing.
+
+ALTER TABLE data_tables_metadata
+    ADD COLUMN IF NOT EXISTS row_format TEXT NOT NULL DEFAULT 'jsonb'
+        CHECK (row_format IN ('jsonb', 'zstd_blocks'));
+
+CREATE TABLE IF NOT EXISTS data_table_blocks (
+    table_id UUID NOT NULL REFERENCES data_tables_metadata(id) ON DELETE CASCADE,
+    workspace_id UUID NOT NULL REFERENCES workspaces(id) ON DELETE CASCADE,
+    first_row INTEGER NOT NULL,
+    last_row INTEGER NOT NULL,
+    row_hashes BIGINT[],
+    raw_bytes INTEGER NOT NULL,
+    payload BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (table_id, first_row),
+    CHECK (last_row >= first_row)
+);
+
+-- The payload is already compressed: store it out of line without another pglz pass
+ALTER TABLE data_table_blocks ALTER COLUMN payload SET STORAGE EXTERNAL;
+
+CREATE INDEX IF NOT EXISTS idx_data_blocks_workspace ON data_table_blocks(workspace_id);
+CREATE INDEX IF NOT EXISTS idx_data_blocks_range ON data_table_blocks(table_id, last_row);
+
+-- RLS Policies for data_table_blocks (same as data_table_rows)
+ALTER TABLE data_table_blocks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their workspace blocks"
+    ON data_table_blocks FOR SELECT
+    USING (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+CREATE POLICY "Users can insert blocks in their workspace"
+    ON data_table_blocks FOR INSERT
+    WITH CHECK (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+CREATE POLICY "Users can update their workspace blocks"
+    ON data_table_blocks FOR UPDATE
+    USING (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+CREATE POLICY "Users can delete their workspace blocks"
+    ON data_table_blocks FOR DELETE
+    USING (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+COMMENT ON TABLE data_table_blocks IS 'Rows of zstd_blocks tables: runs of consecutive rows, columnar and zstd-compressed';
+COMMENT ON COLUMN data_table_blocks.payload IS 'zstd of {"rows", "columns": [names], "values": [[column values]]} as JSON';
+COMMENT ON COLUMN data_table_blocks.raw_bytes IS 'Uncompressed payload size (needed to decompress)';
+COMMENT ON COLUMN data_tables_metadata.row_format IS 'jsonb (rows in data_table_rows) | zstd_blocks (rows in data_table_blocks)';
@@ -0,0 +1,56 @@
+-- Migration: Upload reservations
+-- 002_upload_fingerprints.sql tags a table with its file's fingerprint only
+-- after every row is stored, so two identical uploads arriving together (a
+-- double click) both miss the lookup and both ingest the file. Before
+-- ingesting, the service now inserts a 'processing' row here for
+-- (workspace_id, file_fingerprint); the unique key lets only one upload hold
+-- it. An identical upload waits until the row is gone and then finds the
+-- stored tables. The row is deleted when the ingest ends, successful or not.
+--
+-- reserved_at lets a reservation left behind by an instance that died
+-- mid-ingest be taken over after UPLOAD_RESERVATION_TTL_S. Without this
+-- migration uploads are ingested without a reservation, as before.
+
+CREATE TABLE IF NOT EXISTS upload_reservations (
+    workspace_id UUID NOT NULL REFERENCES workspaces(id) ON DELETE CASCADE,
+    file_fingerprint TEXT NOT NULL,
+    token UUID NOT NULL,
+    status TEXT NOT NULL DEFAULT 'processing' CHECK (status = 'processing'),
+    reserved_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (workspace_id, file_fingerprint)
+);
+
+-- RLS Policies for upload_reservations (same as data_tables_metadata)
+ALTER TABLE upload_reservations ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their workspace reservations"
+    ON upload_reservations FOR SELECT
+    USING (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+CREATE POLICY "Users can insert reservations in their workspace"
+    ON upload_reservations FOR INSERT
+    WITH CHECK (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+CREATE POLICY "Users can update their workspace reservations"
+    ON upload_reservations FOR UPDATE
+    USING (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+CREATE POLICY "Users can delete their workspace reservations"
+    ON upload_reservations FOR DELETE
+    USING (workspace_id IN (
+        SELECT workspace_id FROM users_workspace
+        WHERE auth_user_id = auth.uid()
+    ));
+
+COMMENT ON TABLE upload_reservations IS 'One row per upload being ingested: identical concurrent uploads wait for it instead of ingesting twice';
+COMMENT ON COLUMN upload_reservations.token IS 'Set by the holder; only the holder (same token) deletes the row';
+COMMENT ON COLUMN upload_reservations.reserved_at IS 'Reservations older than UPLOAD_RESERVATION_TTL_S can be taken over';
@@ -0,0 +1 @@
+"""Performance benchmarks (not collected by pytest — run as modules)"""
@@ -0,0 +1,80 @@
+"""
+Benchmark CLI.
+
+    python -m tests.benchmarks run --profile quick --output bench_results/current.json
+    python -m tests.benchmarks compare bench_results/baseline.json bench_results/current.json
+    python -m tests.benchmarks cold-start --output bench_results/cold_start.json
+
+``compare`` exits with status 1 when any case regressed past the threshold,
+so it can gate CI.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from tests.benchmarks.baseline import compare, format_report, load_results, save_results
+from tests.benchmarks.bench_processor import PROFILES, run_suite
+from tests.benchmarks.cold_start import format_breakdown, import_breakdown, run_cold_start
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    results = run_suite(profile=args.profile, repeat=args.repeat, only=args.only)
+    save_results(Path(args.output), results)
+    print(f"\nSaved {len(results)} result(s) to {args.output}")
+    return 0
+
+
+def _cmd_compare(args: argparse.Namespace) -> int:
+    rows = compare(
+        load_results(Path(args.baseline)),
+        load_results(Path(args.current)),
+        threshold=args.threshold,
+        metrics=tuple(args.metric),
+    )
+    print(format_report(rows))
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+def _cmd_cold_start(args: argparse.Namespace) -> int:
+    print(format_breakdown(import_breakdown(args.top)) + "\n")
+    results = run_cold_start(repeat=args.repeat)
+    save_results(Path(args.output), results)
+    print(f"\nSaved {len(results)} result(s) to {args.output}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the benchmark suite and save a JSON baseline")
+    run.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    run.add_argument("--repeat", type=int, default=None)
+    run.add_argument("--only", nargs="*", help="Only run cases whose name contains one of these")
+    run.add_argument("--output", default="bench_results/current.json")
+    run.set_defaults(func=_cmd_run)
+
+    cmp_ = sub.add_parser("compare", help="Compare two saved runs and flag regressions")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.15, help="Relative increase (0.15 = +15%%)")
+    cmp_.add_argument("--metric", nargs="*", default=["median_ms", "peak_kb"])
+    cmp_.set_defaults(func=_cmd_compare)
+
+    cold = sub.add_parser("cold-start", help="Time import, first /health and first /process in fresh processes")
+    cold.add_argument("--repeat", type=int, default=3)
+    cold.add_argument("--top", type=int, default=10, help="Modules to list in the import breakdown")
+    cold.add_argument("--output", default="bench_results/cold_start.json")
+    cold.set_defaults(func=_cmd_cold_start)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
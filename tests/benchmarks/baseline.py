@@ -0,0 +1,73 @@
+"""Save benchmark results as JSON baselines and compare two runs"""
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pandas as pd
+
+
+def environment() -> Dict[str, str]:
+    """Describe the machine/runtime so baselines are only compared like-for-like."""
+    return {
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def save_results(path: Path, results: Dict[str, Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=2, sort_keys=True))
+
+
+def load_results(path: Path) -> Dict[str, Dict[str, Any]]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float = 0.15,
+    metrics: tuple = ("median_ms", "peak_kb"),
+) -> List[Dict[str, Any]]:
+    """
+    Return one entry per (case, metric) present in both runs, flagging every
+    metric that grew by more than ``threshold`` (0.15 = +15%).
+    """
+    rows = []
+    for case in sorted(set(baseline) & set(current)):
+        for metric in metrics:
+            before = baseline[case].get(metric)
+            after = current[case].get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            rows.append({
+                "case": case,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": change > threshold,
+            })
+    return rows
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'case':<48} {'metric':<10} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['case']:<48} {row['metric']:<10} {row['baseline']:>12.2f} "
+            f"{row['current']:>12.2f} {row['change']:>+7.1%}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+"""
+Benchmark: handing a parsed DataFrame from a parse worker back to the parent.
+
+A single spawned worker builds the frame once (``generate_frames``, no Excel
+parsing) and keeps it; each sample then only measures the transfer:
+
+- ``pickle``: the worker returns the DataFrame through the pool's result pipe
+- ``arrow``: the worker writes it with ``write_frame`` and the parent maps it
+  with ``FrameSpool.open`` (``PARSE_HANDOFF=arrow``)
+
+``round_trip_ms`` is the whole submit → DataFrame-in-parent time;
+``parent_ms`` is the part spent in the parent process (unpickling, or mapping
+and rebuilding the frame), i.e. the time taken away from the event loop's GIL.
+
+    python -m tests.benchmarks.bench_handoff --rows 50000 --columns 20 --cardinality 50 1000000
+"""
+import argparse
+import multiprocessing
+import pickle
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from app.services.parse_pool import FrameSpool, default_handoff_dir, write_frame
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_frames
+
+_FRAME = None
+
+
+def _load(spec: WorkbookSpec) -> int:
+    global _FRAME
+    _FRAME = next(iter(generate_frames(spec).values()))
+    return len(_FRAME)
+
+
+def _send_pickle():
+    return _FRAME
+
+
+def _send_arrow(directory: str):
+    return write_frame(_FRAME, directory)
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run(spec: WorkbookSpec, repeat: int = 7, directory: str = "") -> List[Dict[str, Any]]:
+    spool = FrameSpool(directory or default_handoff_dir())
+    frame = next(iter(generate_frames(spec).values()))
+    pickled = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+    probe = write_frame(frame, spool.directory)
+    arrow_bytes = probe.nbytes
+    spool.open(probe)
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pool.submit(_load, spec).result()
+        results = [
+            {
+                "handoff": "pickle",
+                "bytes": len(pickled),
+                "round_trip_ms": _median_ms(lambda: pool.submit(_send_pickle).result(), repeat),
+                "parent_ms": _median_ms(lambda: pickle.loads(pickled), repeat),
+            },
+        ]
+        handles = []
+
+        def arrow_round_trip():
+            spool.open(pool.submit(_send_arrow, spool.directory).result())
+
+        def arrow_parent():
+            spool.open(handles.pop())
+
+        round_trip = _median_ms(arrow_round_trip, repeat)
+        handles.extend(pool.submit(_send_arrow, spool.directory).result() for _ in range(repeat))
+        results.append({
+            "handoff": "arrow",
+            "bytes": arrow_bytes,
+            "round_trip_ms": round_trip,
+            "parent_ms": _median_ms(arrow_parent, repeat),
+        })
+    for result in results:
+        result["case"] = spec.label
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks.bench_handoff")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--null-density", type=float, default=0.05)
+    parser.add_argument("--cardinality", type=int, nargs="*", default=[50, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--dir", default="", help="Handoff directory (default /dev/shm)")
+    args = parser.parse_args(argv)
+
+    for cardinality in args.cardinality:
+        spec = WorkbookSpec(
+            rows=args.rows, columns=args.columns,
+            null_density=args.null_density, string_cardinality=cardinality,
+        )
+        for r in run(spec, args.repeat, args.dir):
+            print(
+                f"{r['case']:<40} {r['handoff']:<7} {r['bytes'] / 2**20:6.1f} MiB"
+                f"  round trip {r['round_trip_ms']:7.1f} ms  parent {r['parent_ms']:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
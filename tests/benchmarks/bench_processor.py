@@ -0,0 +1,125 @@
+"""
+Timing and peak-memory benchmarks for ExcelProcessor hot paths.
+
+Each case runs one processor method against a synthetic workbook from
+``workbook_factory`` and records wall time (median / min / p95 per call)
+plus the tracemalloc peak of a single call.
+"""
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.excel_processor import ExcelProcessor
+from tests.benchmarks import bench_serialization
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_frames, generate_workbook
+
+PROFILES: Dict[str, List[WorkbookSpec]] = {
+    "quick": [
+        WorkbookSpec(rows=500, columns=10),
+        WorkbookSpec(rows=200, columns=8, sheets=5),
+        WorkbookSpec(rows=500, columns=10, null_density=0.3, string_cardinality=5000),
+    ],
+    "full": [
+        WorkbookSpec(rows=20_000, columns=20),
+        WorkbookSpec(rows=5_000, columns=60),
+        WorkbookSpec(rows=2_000, columns=12, sheets=10),
+        WorkbookSpec(rows=20_000, columns=20, null_density=0.5),
+        WorkbookSpec(rows=20_000, columns=20, string_cardinality=20_000,
+                     dtype_mix={"string": 0.8, "integer": 0.2}),
+    ],
+}
+
+DEFAULT_REPEAT = {"quick": 5, "full": 10}
+
+# Below this a single call is too short to time reliably, so it gets looped
+_MIN_SAMPLE_SECONDS = 0.005
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5) -> Dict[str, float]:
+    """Time ``fn`` and record the tracemalloc peak of one extra call."""
+    start = time.perf_counter()
+    fn()  # warm-up, also used to calibrate the inner loop
+    elapsed = time.perf_counter() - start
+    number = max(1, int(_MIN_SAMPLE_SECONDS / elapsed)) if elapsed > 0 else 1000
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    p95_index = min(len(samples) - 1, round(0.95 * (len(samples) - 1)))
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": samples[0] * 1000,
+        "p95_ms": samples[p95_index] * 1000,
+        "peak_kb": peak / 1024,
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def processor_cases(spec: WorkbookSpec) -> List[Tuple[str, Callable[[], Any]]]:
+    """(name, callable) pairs for every benchmarked ExcelProcessor entry point."""
+    processor = ExcelProcessor()
+    content = generate_workbook(spec)
+    first_frame = next(iter(generate_frames(spec).values()))
+    first_frame.columns = [processor._sanitize_column_name(c) for c in first_frame.columns]
+    raw_records = first_frame.to_dict("records")
+    column_types = processor._get_column_types(first_frame)
+
+    return [
+        ("validate_file", lambda: processor.validate_file(content, "bench.xlsx")),
+        ("analyze_file", lambda: processor.analyze_file(content)),
+        ("process_excel", lambda: processor.process_excel(content, "ws-bench", "bench")),
+        ("process_all_sheets", lambda: processor.process_all_sheets(content, "ws-bench")),
+        ("_clean_nan_values", lambda: processor._clean_nan_values(raw_records)),
+        ("_suggest_widgets", lambda: processor._suggest_widgets(column_types, "tbl", "Hoja1")),
+        ("get_data_preview", lambda: processor.get_data_preview(content, 10)),
+    ]
+
+
+def serialization_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    payload = bench_serialization.build_sheets(sheets=30, columns=40)
+    return [
+        ("response_encode[validated]", lambda: bench_serialization.validated_path(payload)),
+        ("response_encode[trusted]", lambda: bench_serialization.trusted_path(payload)),
+    ]
+
+
+def run_suite(
+    profile: str = "quick",
+    repeat: Optional[int] = None,
+    only: Optional[List[str]] = None,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Dict[str, Any]]:
+    """Run every case of a profile and return ``{case_name: stats}``."""
+    repeat = repeat or DEFAULT_REPEAT[profile]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def _run(name: str, fn: Callable[[], Any], spec: Optional[WorkbookSpec] = None) -> None:
+        if only and not any(pattern in name for pattern in only):
+            return
+        stats = measure(fn, repeat)
+        if spec is not None:
+            stats["spec"] = spec.to_dict()
+        results[name] = stats
+        log(f"{name:<60} {stats['median_ms']:>10.3f} ms  peak {stats['peak_kb']:>10.1f} KiB")
+
+    for spec in PROFILES[profile]:
+        for name, fn in processor_cases(spec):
+            _run(f"{name}[{spec.label}]", fn, spec)
+    for name, fn in serialization_cases():
+        _run(name, fn)
+
+    return results
@@ -0,0 +1,131 @@
+"""
+Benchmark: row storage as JSONB rows vs compressed blocks (``STORAGE_ROW_FORMAT``).
+
+One sheet of a synthetic workbook goes through ``ExcelProcessor`` and is then
+stored both ways, without a database; everything measured is what this
+service does and sends:
+
+- ``stored``: the ``row_data`` JSON text of every row (a lower bound for
+  JSONB, which also keeps a per-row tuple header, ids and index entries) vs
+  the compressed ``payload`` bytes of the blocks
+- ``wire``: bytes of the insert request bodies (blocks travel as hex, twice
+  their size)
+- ``write_ms``: building those bodies (records + JSON, and for blocks the
+  columnar encoding and zstd)
+- ``read_ms``: turning the select responses for the whole table back into
+  row dicts (JSON parse, and for blocks hex + zstd + rebuild)
+- ``page_ms``: the same for one ``GET /tables/{id}/data`` page of 100 rows,
+  which for blocks decodes the whole block(s) it falls in
+
+    python -m tests.benchmarks.bench_row_storage --rows 20000 --columns 20 --cardinality 50 1000000
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import orjson
+
+from app.infrastructure.data_storage import BATCH_SIZE, SELECT_PAGE_SIZE, _row_payloads
+from app.infrastructure.row_blocks import block_from_row_payloads, decode_block_records, from_bytea
+from app.services.excel_processor import ExcelProcessor
+from app.utils.serialization import dumps
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_workbook
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run(spec: WorkbookSpec, block_rows: int = 1000, repeat: int = 5, page_offset: int = 0) -> List[Dict[str, Any]]:
+    sheet = next(ExcelProcessor().iter_sheets(generate_workbook(spec), "ws-bench"))
+    data, row_hashes = sheet["_data"], sheet["_row_hashes"]
+    table_id, workspace_id = "00000000-0000-0000-0000-000000000001", "00000000-0000-0000-0000-000000000002"
+
+    def jsonb_bodies() -> List[bytes]:
+        rows = _row_payloads(workspace_id, table_id, data, row_hashes)
+        return [dumps(batch) for batch in _chunks(rows, BATCH_SIZE)]
+
+    def block_bodies() -> List[bytes]:
+        rows = _row_payloads(workspace_id, table_id, data, row_hashes)
+        return [dumps([block_from_row_payloads(batch)]) for batch in _chunks(rows, block_rows)]
+
+    stored_rows = orjson.loads(dumps(_row_payloads(workspace_id, table_id, data, row_hashes)))
+    row_pages = [dumps(page) for page in _chunks(
+        [{"row_data": row["row_data"], "row_number": row["row_number"]} for row in stored_rows], SELECT_PAGE_SIZE
+    )]
+    blocks = [orjson.loads(body)[0] for body in block_bodies()]
+    block_response = dumps(blocks)
+    row_page = dumps(orjson.loads(row_pages[page_offset // SELECT_PAGE_SIZE])[
+        page_offset % SELECT_PAGE_SIZE:page_offset % SELECT_PAGE_SIZE + 100
+    ])
+    page_blocks = dumps([b for b in blocks if b["last_row"] > page_offset and b["first_row"] <= page_offset + 100])
+
+    def read_rows(pages: List[bytes]) -> List[Dict[str, Any]]:
+        return [row["row_data"] for page in pages for row in orjson.loads(page)]
+
+    def read_blocks(response: bytes) -> List[Dict[str, Any]]:
+        return decode_block_records(orjson.loads(response))
+
+    assert read_blocks(block_response) == read_rows(row_pages)
+    results = [
+        {
+            "format": "jsonb",
+            "stored": sum(len(dumps(row["row_data"])) for row in stored_rows),
+            "wire": sum(map(len, jsonb_bodies())),
+            "write_ms": _median_ms(jsonb_bodies, repeat),
+            "read_ms": _median_ms(lambda: read_rows(row_pages), repeat),
+            "page_ms": _median_ms(lambda: read_rows([row_page]), repeat),
+        },
+        {
+            "format": "zstd_blocks",
+            "stored": sum(len(from_bytea(block["payload"])) for block in blocks),
+            "wire": sum(map(len, block_bodies())),
+            "write_ms": _median_ms(block_bodies, repeat),
+            "read_ms": _median_ms(lambda: read_blocks(block_response), repeat),
+            "page_ms": _median_ms(lambda: read_blocks(page_blocks), repeat),
+        },
+    ]
+    for result in results:
+        result["case"] = spec.label
+        result["rows"] = len(data)
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks.bench_row_storage")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--null-density", type=float, default=0.05)
+    parser.add_argument("--cardinality", type=int, nargs="*", default=[50, 1_000_000])
+    parser.add_argument("--block-rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for cardinality in args.cardinality:
+        spec = WorkbookSpec(
+            rows=args.rows, columns=args.columns,
+            null_density=args.null_density, string_cardinality=cardinality,
+        )
+        for r in run(spec, args.block_rows, args.repeat):
+            rows_per_s = r["rows"] / r["write_ms"] * 1000, r["rows"] / r["read_ms"] * 1000
+            print(
+                f"{r['case']:<40} {r['format']:<12} stored {r['stored'] / 2**20:6.2f} MiB"
+                f"  wire {r['wire'] / 2**20:6.2f} MiB"
+                f"  write {r['write_ms']:6.1f} ms ({rows_per_s[0] / 1000:5.0f}k rows/s)"
+                f"  read {r['read_ms']:6.1f} ms ({rows_per_s[1] / 1000:5.0f}k rows/s)"
+                f"  page {r['page_ms']:5.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: /process response build + encode.
+
+Compares the validated path (``SheetProcessingResult(**sheet)`` + FastAPI's
+``jsonable_encoder`` + stdlib ``json``) with the trusted path
+(``model_construct`` + ``FastJSONResponse``).
+
+    python -m tests.benchmarks.bench_serialization --sheets 30 --columns 40
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models import ExcelProcessResponse, SheetProcessingResult
+from app.services.excel_processor import ExcelProcessor
+from app.utils.serialization import FastJSONResponse
+
+
+def build_sheets(sheets: int, columns: int, sample_rows: int = 5) -> List[Dict[str, Any]]:
+    """Sheet dicts shaped like ExcelProcessor._process_single_sheet output."""
+    processor = ExcelProcessor()
+    rng = np.random.default_rng(0)
+    result = []
+    for s in range(sheets):
+        df = pd.DataFrame({
+            f"col_{c}": (
+                rng.integers(0, 1000, sample_rows) if c % 3 == 0
+                else rng.random(sample_rows) if c % 3 == 1
+                else pd.date_range("2024-01-01", periods=sample_rows)
+            )
+            for c in range(columns)
+        })
+        column_types = processor._get_column_types(df)
+        table_name = f"sheet_{s}_20240101_000000"
+        result.append({
+            "sheet_name": f"Sheet{s}",
+            "table_name": table_name,
+            "rows": sample_rows,
+            "columns": columns,
+            "column_types": column_types,
+            "sample_rows": processor._clean_nan_values(df.to_dict("records")),
+            "widget_suggestions": processor._suggest_widgets(column_types, table_name, f"Sheet{s}"),
+            "suggests_user_import": False,
+            "user_columns": None,
+        })
+    return result
+
+
+def _envelope(sheets: List[Any]) -> Dict[str, Any]:
+    return dict(
+        success=True,
+        message="bench",
+        sheets_processed=len(sheets),
+        sheets=sheets,
+        tables=[f"t{i}" for i in range(len(sheets))],
+        processing_time=0.0,
+        widgets_created=0,
+    )
+
+
+def validated_path(sheets: List[Dict[str, Any]]) -> bytes:
+    response = ExcelProcessResponse(**_envelope([SheetProcessingResult(**s) for s in sheets]))
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def trusted_path(sheets: List[Dict[str, Any]]) -> bytes:
+    response = ExcelProcessResponse.model_construct(
+        **_envelope([SheetProcessingResult.model_construct(**s) for s in sheets])
+    )
+    return FastJSONResponse(response).body
+
+
+def time_call(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+    }
+
+
+def run(sheets: int = 30, columns: int = 40, repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    payload = build_sheets(sheets, columns)
+    return {
+        "validated": time_call(lambda: validated_path(payload), repeat),
+        "trusted": time_call(lambda: trusted_path(payload), repeat),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sheets", type=int, default=30)
+    parser.add_argument("--columns", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = run(args.sheets, args.columns, args.repeat)
+    for name, stats in results.items():
+        print(f"{name:>10}: median {stats['median_ms']:.2f} ms  min {stats['min_ms']:.2f} ms")
+    speedup = results["validated"]["median_ms"] / results["trusted"]["median_ms"]
+    print(f"   speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
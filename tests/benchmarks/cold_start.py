@@ -0,0 +1,151 @@
+"""
+Cold-start benchmark.
+
+Each sample starts a fresh interpreter that imports ``app.main``, runs the
+app's lifespan and talks to it through ``httpx.ASGITransport`` (no server,
+no network; the database is ``tests.fakes.InMemoryDatabaseClient``). Times
+are measured from just before the interpreter was spawned:
+
+- ``import_ms``: ``import app.main`` alone
+- ``first_health_ms``: first ``GET /health`` answered
+- ``ready_ms``: ``GET /ready`` returned 200
+- ``first_process_ms``: first successful ``POST /api/excel/process``
+- ``process_latency_ms``: latency of that request alone
+
+Scenario ``cold`` disables the warm-up (``/ready`` is 200 at once) and posts
+right after ``/health``; ``warmup`` enables it and posts once ``/ready`` is
+200, like a load balancer that gates traffic on readiness. The cost of importing the benchmark's own
+HTTP client is measured in the child and subtracted.
+
+``import_breakdown`` runs ``python -X importtime`` to list the modules that
+dominate ``import app.main``.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+SCENARIOS = {"cold": False, "warmup": True}
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "supabase")
+
+
+async def _drive(content: bytes, t0: float, wait_ready: bool) -> Dict[str, float]:
+    harness_start = time.perf_counter()
+    import httpx
+    harness_s = time.perf_counter() - harness_start
+
+    start = time.perf_counter()
+    from app.main import app
+    import_s = time.perf_counter() - start
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    from app.factories import get_database_client
+    from tests.fakes import InMemoryDatabaseClient
+    app.dependency_overrides[get_database_client] = InMemoryDatabaseClient
+
+    def since_spawn() -> float:
+        return (time.time() - t0 - harness_s) * 1000
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+            assert (await client.get("/health")).status_code == 200
+            first_health = since_spawn()
+
+            if wait_ready:
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.005)
+            else:
+                assert (await client.get("/ready")).status_code == 200
+            ready = since_spawn()
+
+            request_start = time.perf_counter()
+            response = await client.post(
+                "/api/excel/process",
+                files={"file": ("cold_start.xlsx", content, "application/octet-stream")},
+                data={"workspace_id": "ws-cold", "user_id": "user-cold"},
+            )
+            assert response.status_code == 200, response.text
+            latency = (time.perf_counter() - request_start) * 1000
+            first_process = since_spawn()
+
+    return {
+        "import_ms": import_s * 1000,
+        "first_health_ms": first_health,
+        "ready_ms": ready,
+        "first_process_ms": first_process,
+        "process_latency_ms": latency,
+        "heavy_modules_at_import": loaded,
+    }
+
+
+def _child(workbook_path: str, wait_ready: bool) -> None:
+    content = Path(workbook_path).read_bytes()
+    t0 = float(os.environ["COLD_START_T0"])
+    print(json.dumps(asyncio.run(_drive(content, t0, wait_ready))))
+
+
+def _sample(workbook_path: str, warmup: bool) -> Dict[str, Any]:
+    env = {**os.environ, "WARMUP_ENABLED": str(warmup), "LOOP_MONITOR_ENABLED": "False"}
+    env["COLD_START_T0"] = repr(time.time())
+    output = subprocess.run(
+        [sys.executable, "-m", "tests.benchmarks.cold_start", "--child", workbook_path, str(warmup)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_cold_start(repeat: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Median of ``repeat`` fresh-process samples per scenario."""
+    from tests.benchmarks.workbook_factory import WorkbookSpec, generate_workbook
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook_path = os.path.join(tmp, "cold_start.xlsx")
+        Path(workbook_path).write_bytes(generate_workbook(WorkbookSpec(rows=200, columns=8)))
+        for scenario, warmup in SCENARIOS.items():
+            samples = [_sample(workbook_path, warmup) for _ in range(repeat)]
+            result: Dict[str, Any] = {
+                metric: round(statistics.median(s[metric] for s in samples), 1)
+                for metric in samples[0] if metric.endswith("_ms")
+            }
+            result["heavy_modules_at_import"] = samples[0]["heavy_modules_at_import"]
+            results[f"cold_start/{scenario}"] = result
+            print(f"{scenario:<8} " + "  ".join(
+                f"{metric} {value:>8.1f}" for metric, value in result.items() if metric.endswith("_ms")
+            ))
+    return results
+
+
+def import_breakdown(top: int = 10) -> List[Dict[str, Any]]:
+    """Modules with the largest cumulative import time under ``import app.main``."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        modules.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules[:top]
+
+
+def format_breakdown(modules: List[Dict[str, Any]]) -> str:
+    lines = [f"{'module':<40} {'cumulative_ms':>14} {'self_ms':>8}"]
+    lines.extend(
+        f"{m['module'].strip():<40} {m['cumulative_ms']:>14.1f} {m['self_ms']:>8.1f}" for m in modules
+    )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__" and len(sys.argv) == 4 and sys.argv[1] == "--child":
+    _child(sys.argv[2], sys.argv[3] == "True")
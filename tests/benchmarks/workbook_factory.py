@@ -0,0 +1,100 @@
+"""
+Deterministic synthetic workbook generator for benchmarks and memory tests.
+
+Every workbook is fully described by a ``WorkbookSpec``: the same spec (and
+seed) always produces the same cell values, so timings taken on different
+commits are comparable.
+"""
+import io
+from dataclasses import asdict, dataclass, field
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DTYPE_MIX: Dict[str, float] = {
+    "integer": 0.3,
+    "number": 0.3,
+    "string": 0.25,
+    "date": 0.1,
+    "boolean": 0.05,
+}
+
+
+@dataclass(frozen=True)
+class WorkbookSpec:
+    """Shape of a synthetic workbook"""
+    rows: int = 1000
+    columns: int = 10
+    sheets: int = 1
+    dtype_mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_DTYPE_MIX))
+    null_density: float = 0.0         # fraction of cells left empty (0..1)
+    string_cardinality: int = 50      # distinct values per string column
+    seed: int = 0
+
+    @property
+    def label(self) -> str:
+        return (
+            f"{self.sheets}x{self.rows}x{self.columns}"
+            f"-null{self.null_density:g}-card{self.string_cardinality}"
+        )
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def _column_dtypes(spec: WorkbookSpec) -> list:
+    """Assign a dtype to each column following spec.dtype_mix proportions."""
+    total = sum(spec.dtype_mix.values())
+    dtypes = []
+    for dtype, weight in spec.dtype_mix.items():
+        dtypes.extend([dtype] * round(spec.columns * weight / total))
+    # Rounding may leave us short or long — pad with the first dtype / trim
+    first = next(iter(spec.dtype_mix))
+    dtypes = (dtypes + [first] * spec.columns)[: spec.columns]
+    return dtypes
+
+
+def _make_column(dtype: str, spec: WorkbookSpec, rng: np.random.Generator) -> pd.Series:
+    n = spec.rows
+    if dtype == "integer":
+        values = pd.Series(rng.integers(0, 100_000, n))
+    elif dtype == "number":
+        values = pd.Series(rng.random(n) * 10_000)
+    elif dtype == "string":
+        vocabulary = np.array([f"valor_{i}" for i in range(max(spec.string_cardinality, 1))])
+        values = pd.Series(vocabulary[rng.integers(0, len(vocabulary), n)])
+    elif dtype == "date":
+        days = rng.integers(0, 3650, n)
+        values = pd.Series(pd.Timestamp("2015-01-01") + pd.to_timedelta(days, unit="D"))
+    elif dtype == "boolean":
+        values = pd.Series(rng.random(n) < 0.5)
+    else:
+        raise ValueError(f"Unknown dtype in dtype_mix: {dtype}")
+
+    if spec.null_density > 0:
+        mask = rng.random(n) < spec.null_density
+        values = values.where(~mask)
+    return values
+
+
+def generate_frames(spec: WorkbookSpec) -> Dict[str, pd.DataFrame]:
+    """Build one DataFrame per sheet (sheet name → frame)."""
+    rng = np.random.default_rng(spec.seed)
+    dtypes = _column_dtypes(spec)
+    frames = {}
+    for s in range(spec.sheets):
+        frames[f"Hoja{s + 1}"] = pd.DataFrame({
+            f"{dtype.title()} {c}": _make_column(dtype, spec, rng)
+            for c, dtype in enumerate(dtypes)
+        })
+    return frames
+
+
+def generate_workbook(spec: WorkbookSpec) -> bytes:
+    """Render the spec as .xlsx bytes."""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for sheet_name, df in generate_frames(spec).items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return buffer.getvalue()
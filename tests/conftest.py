@@ -2,9 +2,14 @@
 Pytest configuration — mock Supabase client before any app import
 so tests run without a live Supabase connection or the cryptography DLL.
 """
+import os
 import sys
 from unittest.mock import MagicMock, AsyncMock
 
+# Lifespan warm-up would run the pipeline (spans, metrics) inside tests that use
+# ``with TestClient(app)``; tests/test_startup.py enables it explicitly.
+os.environ.setdefault("WARMUP_ENABLED", "False")
+
 # ---------------------------------------------------------------------------
 # Stub the entire supabase / gotrue stack before app modules are imported.
 # This prevents the cryptography DLL load error on Windows dev machines.
@@ -33,19 +38,34 @@ import pytest
 
 class MockDBClient:
     async def create_dashboard(
-        self, workspace_id, name, description, icon="table", color="#228BE6"
+        self, workspace_id, name, description, icon="table", color="#228BE6", dashboard_id=None,
     ):
-        return {"id": "dashboard-test", "name": name}
+        return {"id": dashboard_id or "dashboard-test", "name": name}
 
-    async def store_excel_data(self, workspace_id, table_name, data, column_types):
+    async def store_excel_data(
+        self, workspace_id, table_name, data, column_types,
+        fingerprint=None, source=None, row_hashes=None,
+    ):
         return len(data)
 
+    async def find_tables_by_fingerprint(self, workspace_id, fingerprint):
+        return []
+
     async def create_widget(self, dashboard_id, widget_type, config):
         return {"id": "widget-test"}
 
+    async def create_widgets(self, dashboard_id, widgets):
+        return [{"id": f"widget-test-{i}"} for i in range(len(widgets))]
+
     async def get_workspace(self, workspace_id):
         return {"id": workspace_id}
 
+    async def reserve_upload(self, workspace_id, fingerprint):
+        return "reservation-test"
+
+    async def release_upload(self, workspace_id, fingerprint, token):
+        return None
+
 
 @pytest.fixture
 def mock_db_client():
@@ -0,0 +1,550 @@
+"""
+In-memory IDatabaseClient double with injectable latency and failures.
+
+Unlike ``conftest.MockDBClient`` (which returns immediately), every call here
+costs one simulated Supabase round trip, and ``store_excel_data`` costs as many
+round trips as the real ``DataStorageService`` (metadata insert, one insert
+per batch, row_count update). Used by the load harness and by tests that need
+the database to keep state between calls.
+
+``FakeSupabase`` sits one level lower: it replaces the supabase-py client so
+the real ``DataStorageService`` can be exercised (failures, retries, resume).
+"""
+import asyncio
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from app.config import settings
+from app.infrastructure.data_storage import SELECT_PAGE_SIZE, diff_row_hashes
+from app.utils.arrow import records_to_columns
+from app.utils.serialization import dumps
+
+
+class SimulatedDatabaseError(Exception):
+    """Injected failure (failure_rate)"""
+
+
+class PayloadTooLargeError(SimulatedDatabaseError):
+    """Request body exceeded max_payload_bytes (PostgREST 413)"""
+
+
+class InMemoryDatabaseClient:
+    """
+    Fake workspace database.
+
+    - ``latency`` / ``jitter``: seconds per round trip, uniformly +/- jitter
+    - ``failure_rate``: probability (0..1) that a round trip raises
+    - ``max_payload_bytes``: reject any single request body larger than this
+    - ``blocking``: sleep with ``time.sleep`` instead of ``asyncio.sleep``,
+      reproducing the synchronous supabase-py client that blocks the event loop
+    - ``batch_size``: rows per insert request in ``store_excel_data``
+    - ``ingest_rpc``: model ``store_excel_data`` as one ``ingest_table_chunk``
+      call per batch (``settings.storage_ingest_rpc``)
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        max_payload_bytes: Optional[int] = None,
+        blocking: bool = False,
+        batch_size: int = 100,
+        ingest_rpc: bool = False,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.max_payload_bytes = max_payload_bytes
+        self.blocking = blocking
+        self.batch_size = batch_size
+        self.ingest_rpc = ingest_rpc
+        self._random = random.Random(seed)
+        self._positions = itertools.count()
+
+        self.calls: Counter = Counter()
+        self.bytes_sent = 0
+        self.dashboards: Dict[str, Dict[str, Any]] = {}
+        self.widgets: Dict[str, Dict[str, Any]] = {}
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.rows: Dict[str, List[Dict[str, Any]]] = {}
+        self.reservations: Dict[tuple, Dict[str, Any]] = {}
+
+    async def _round_trip(self, operation: str, payload: Any = None) -> None:
+        self.calls[operation] += 1
+        body = dumps(payload) if payload is not None else b""
+        self.bytes_sent += len(body)
+
+        if self.max_payload_bytes is not None and len(body) > self.max_payload_bytes:
+            raise PayloadTooLargeError(
+                f"{operation}: payload of {len(body)} bytes exceeds {self.max_payload_bytes}"
+            )
+
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            if self.blocking:
+                time.sleep(delay)
+            else:
+                await asyncio.sleep(delay)
+
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise SimulatedDatabaseError(f"{operation}: injected failure")
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    async def create_dashboard(
+        self,
+        workspace_id: str,
+        name: str,
+        description: str,
+        icon: str = "table",
+        color: str = "#228BE6",
+        dashboard_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        dashboard = {
+            "id": dashboard_id or str(uuid.uuid4()),
+            "workspace_id": workspace_id,
+            "name": name,
+            "description": description,
+            "icon": icon,
+            "color": color,
+            "position": next(self._positions),
+        }
+        await self._round_trip("insert_dashboard", dashboard)
+        self.dashboards[dashboard["id"]] = dashboard
+        return dashboard
+
+    async def create_widget(
+        self,
+        dashboard_id: str,
+        widget_type: str,
+        config: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        widget = {
+            "id": str(uuid.uuid4()),
+            "dashboard_id": dashboard_id,
+            "type": widget_type,
+            "config": config,
+        }
+        await self._round_trip("insert_widget", widget)
+        self.widgets[widget["id"]] = widget
+        return widget
+
+    async def create_widgets(
+        self,
+        dashboard_id: str,
+        widgets: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        created = [
+            {
+                "id": str(uuid.uuid4()),
+                "dashboard_id": dashboard_id,
+                "type": widget["widget_type"],
+                "config": widget["config"],
+                "position": position,
+            }
+            for position, widget in enumerate(widgets)
+        ]
+        if created:
+            await self._round_trip("insert_widgets", created)
+        self.widgets.update((widget["id"], widget) for widget in created)
+        return created
+
+    async def get_workspace(self, workspace_id: str) -> Optional[Dict[str, Any]]:
+        await self._round_trip("select_workspace")
+        return {"id": workspace_id}
+
+    async def store_excel_data(
+        self,
+        workspace_id: str,
+        table_name: str,
+        data: List[Dict[str, Any]],
+        column_types: Dict[str, str],
+        fingerprint: Optional[str] = None,
+        source: Optional[Dict[str, Any]] = None,
+        row_hashes: Optional[List[int]] = None,
+    ) -> int:
+        metadata = {
+            "id": str(uuid.uuid4()),
+            "workspace_id": workspace_id,
+            "table_name": table_name,
+            "columns": [
+                {"name": name, "type": col_type, "nullable": True}
+                for name, col_type in column_types.items()
+            ],
+            "row_count": len(data),
+        }
+        if not self.ingest_rpc:
+            await self._round_trip("insert_metadata", metadata)
+        self.tables[metadata["id"]] = metadata
+        self.rows[metadata["id"]] = []
+
+        for start in range(0, len(data), self.batch_size):
+            batch = [
+                {
+                    "table_id": metadata["id"],
+                    "row_number": idx,
+                    "row_data": row,
+                    "row_hash": row_hashes[idx - 1] if row_hashes is not None else None,
+                }
+                for idx, row in enumerate(data[start:start + self.batch_size], start=start + 1)
+            ]
+            if self.ingest_rpc:
+                is_last = start + self.batch_size >= len(data)
+                await self._round_trip("ingest_table_chunk", {
+                    "p_rows": batch,
+                    "p_metadata": metadata if start == 0 else None,
+                    "p_is_last": is_last,
+                })
+            else:
+                await self._round_trip("insert_rows", batch)
+            # Round-trip through JSON like PostgREST would
+            self.rows[metadata["id"]].extend(orjson.loads(dumps(batch)))
+
+        update = {"row_count": len(self.rows[metadata["id"]])}
+        if fingerprint is not None:
+            update.update(file_fingerprint=fingerprint, source=source)
+        if not self.ingest_rpc:
+            await self._round_trip("update_row_count", update)
+        elif not data:
+            await self._round_trip("ingest_table_chunk", {"p_metadata": metadata, "p_is_last": True})
+        metadata.update(update)
+        return metadata["row_count"]
+
+    async def get_table_metadata(self, workspace_id: str, table_id: str) -> Optional[Dict[str, Any]]:
+        await self._round_trip("select_metadata")
+        table = self.tables.get(table_id)
+        return table if table is not None and table["workspace_id"] == workspace_id else None
+
+    async def get_table_data(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        await self._round_trip("select_rows")
+        return [row["row_data"] for row in self.rows.get(table_id, [])[offset:offset + limit]]
+
+    async def get_table_columns(
+        self,
+        table_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        row_format: Optional[str] = None,
+        names: Optional[List[str]] = None,
+    ) -> Dict[str, List[Any]]:
+        rows = await self.get_table_data(table_id, limit=limit, offset=offset, row_format=row_format)
+        return records_to_columns(rows, names or [])
+
+    async def update_excel_data(
+        self,
+        workspace_id: str,
+        table_id: str,
+        data: List[Dict[str, Any]],
+        column_types: Dict[str, str],
+        row_hashes: List[int],
+        row_format: Optional[str] = None,
+    ) -> Dict[str, int]:
+        rows = {row["row_number"]: row for row in self.rows[table_id]}
+        for _ in range(len(rows) // SELECT_PAGE_SIZE + 1):
+            await self._round_trip("select_row_hashes")
+        diff = diff_row_hashes({n: row["row_hash"] for n, row in rows.items()}, row_hashes)
+
+        changed = diff["inserts"] + diff["updates"]
+        for start in range(0, len(changed), self.batch_size):
+            batch = [
+                {
+                    "table_id": table_id,
+                    "row_number": row_number,
+                    "row_data": data[row_number - 1],
+                    "row_hash": row_hashes[row_number - 1],
+                }
+                for row_number in changed[start:start + self.batch_size]
+            ]
+            await self._round_trip("upsert_rows", batch)
+            rows.update((row["row_number"], row) for row in orjson.loads(dumps(batch)))
+        if diff["deleted"]:
+            await self._round_trip("delete_rows")
+            rows = {n: row for n, row in rows.items() if n <= len(data)}
+
+        self.rows[table_id] = [rows[n] for n in sorted(rows)]
+        await self._round_trip("update_row_count", {"row_count": len(data)})
+        self.tables[table_id].update(row_count=len(data), file_fingerprint=None, source=None)
+        return {
+            "inserted": len(diff["inserts"]),
+            "updated": len(diff["updates"]),
+            "deleted": diff["deleted"],
+            "unchanged": diff["unchanged"],
+        }
+
+    async def find_tables_by_fingerprint(
+        self,
+        workspace_id: str,
+        fingerprint: str
+    ) -> List[Dict[str, Any]]:
+        await self._round_trip("select_fingerprint")
+        matches = [
+            table for table in self.tables.values()
+            if table["workspace_id"] == workspace_id and table.get("file_fingerprint") == fingerprint
+        ]
+        return list(reversed(matches))
+
+
+    async def reserve_upload(self, workspace_id: str, fingerprint: str) -> Optional[str]:
+        await self._round_trip("reserve_upload")
+        key = (workspace_id, fingerprint)
+        held = self.reservations.get(key)
+        if held is not None and time.monotonic() - held["reserved_at"] < settings.upload_reservation_ttl_s:
+            return None
+        token = str(uuid.uuid4())
+        self.reservations[key] = {"token": token, "reserved_at": time.monotonic()}
+        return token
+
+    async def release_upload(self, workspace_id: str, fingerprint: str, token: str) -> None:
+        await self._round_trip("release_upload")
+        key = (workspace_id, fingerprint)
+        if self.reservations.get(key, {}).get("token") == token:
+            del self.reservations[key]
+
+
+_UNIQUE_KEYS = {
+    "data_table_rows": ("table_id", "row_number"),
+    "data_table_blocks": ("table_id", "first_row"),
+    "upload_reservations": ("workspace_id", "file_fingerprint"),
+}
+
+
+class _FakeQuery:
+    """Chainable subset of the postgrest query builder used by DataStorageService"""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._payload: Any = None
+        self._options: Dict[str, Any] = {}
+        self._filters: List[Any] = []
+        self._order: Optional[tuple] = None
+        self._slice: Optional[tuple] = None
+
+    def select(self, columns: str = "*") -> "_FakeQuery":
+        self._op = "select"
+        self._payload = [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, payload: Any, returning: str = "representation") -> "_FakeQuery":
+        self._op, self._payload = "insert", payload
+        self._options = {"returning": returning}
+        return self
+
+    def upsert(
+        self,
+        payload: Any,
+        on_conflict: str = "",
+        ignore_duplicates: bool = False,
+        returning: str = "representation",
+    ) -> "_FakeQuery":
+        self._op, self._payload = "upsert", payload
+        self._options = {
+            "on_conflict": on_conflict, "ignore_duplicates": ignore_duplicates, "returning": returning,
+        }
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "_FakeQuery":
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self) -> "_FakeQuery":
+        self._op = "delete"
+        return self
+
+    def eq(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def lt(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def gte(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lte(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_FakeQuery":
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count: int) -> "_FakeQuery":
+        self._slice = (0, count)
+        return self
+
+    def range(self, start: int, end: int) -> "_FakeQuery":
+        self._slice = (start, end + 1)
+        return self
+
+    def execute(self) -> Any:
+        return self._db._execute(self)
+
+
+class FakeSupabase:
+    """
+    In-memory stand-in for the supabase-py ``Client`` (tables only).
+
+    Lets the real ``DataStorageService`` run against a stateful backend.
+    ``data_table_rows`` enforces the unique ``(table_id, row_number)`` key and
+    ``data_table_blocks`` its ``(table_id, first_row)`` primary key and
+    ``upload_reservations`` its ``(workspace_id, file_fingerprint)`` one.
+    ``fail_when(predicate)`` makes any request for which
+    ``predicate(table, op, payload)`` is true raise ``SimulatedDatabaseError``
+    (RPC calls arrive as ``(function_name, "rpc", params)``).
+    ``rpc("ingest_table_chunk", ...)`` mirrors migration 005 and
+    ``rpc("create_dashboard", ...)`` migration 006. Requests run one at a
+    time, like statements serialized on the same rows.
+    """
+
+    def __init__(self) -> None:
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests: Counter = Counter()
+        self._fail_when = None
+        self._lock = threading.Lock()
+
+    def fail_when(self, predicate) -> None:
+        self._fail_when = predicate
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> SimpleNamespace:
+        return SimpleNamespace(execute=lambda: self._rpc(name, params))
+
+    def _rpc(self, name: str, params: Dict[str, Any]) -> Any:
+        self.requests[(name, "rpc")] += 1
+        if self._fail_when is not None and self._fail_when(name, "rpc", params):
+            raise SimulatedDatabaseError(f"rpc {name}: injected failure")
+        function = getattr(self, f"_rpc_{name}", None)
+        if function is None:
+            raise SimulatedDatabaseError(f"unknown function {name}")
+        with self._lock:
+            return SimpleNamespace(data=function(orjson.loads(dumps(params))))
+
+    def _rpc_create_dashboard(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        dashboards = self.tables.setdefault("dashboards", [])
+        workspace_id = params["p_workspace_id"]
+        # Same as the advisory lock + MAX(position) in migration 006 (the fake's lock)
+        existing = [d["position"] for d in dashboards if d["workspace_id"] == workspace_id]
+        position = max(existing, default=-1) + 1
+        dashboard = {
+            "id": params.get("p_id") or str(uuid.uuid4()),
+            "workspace_id": workspace_id,
+            "name": params["p_name"],
+            "description": params["p_description"],
+            "icon": params.get("p_icon", "table"),
+            "color": params.get("p_color", "#228BE6"),
+            "position": position,
+            "grid_w": 4,
+            "grid_h": 2,
+            "is_system": False,
+        }
+        dashboards.append(dashboard)
+        return dashboard
+
+    def _rpc_ingest_table_chunk(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        table_id = params["p_table_id"]
+        tables = self.tables.setdefault("data_tables_metadata", [])
+        rows = self.tables.setdefault("data_table_rows", [])
+        metadata = next((table for table in tables if table["id"] == table_id), None)
+        if params.get("p_metadata") and metadata is None:
+            metadata = {**params["p_metadata"], "id": table_id, "row_count": 0, "status": "processing"}
+            tables.append(metadata)
+
+        stored = {row["row_number"] for row in rows if row["table_id"] == table_id}
+        inserted = 0
+        for row in params.get("p_rows") or []:
+            if row["row_number"] not in stored:
+                rows.append({**row, "id": str(uuid.uuid4()), "table_id": table_id})
+                stored.add(row["row_number"])
+                inserted += 1
+
+        row_count = None
+        if params.get("p_is_last"):
+            row_count = len(stored)
+            metadata.update(row_count=row_count, status="completed")
+            if params.get("p_fingerprint") is not None:
+                metadata["file_fingerprint"] = params["p_fingerprint"]
+            if params.get("p_source") is not None:
+                metadata["source"] = params["p_source"]
+        return {"table_id": table_id, "rows_inserted": inserted, "row_count": row_count}
+
+    def _execute(self, query: _FakeQuery) -> Any:
+        self.requests[(query._table, query._op)] += 1
+        if self._fail_when is not None and self._fail_when(query._table, query._op, query._payload):
+            raise SimulatedDatabaseError(f"{query._op} {query._table}: injected failure")
+        with self._lock:
+            return self._apply(query)
+
+    def _apply(self, query: _FakeQuery) -> Any:
+        rows = self.tables.setdefault(query._table, [])
+        matching = [row for row in rows if all(f(row) for f in query._filters)]
+        if query._op == "select":
+            if query._order is not None:
+                column, desc = query._order
+                matching.sort(key=lambda row: row.get(column), reverse=desc)
+            if query._slice is not None:
+                matching = matching[query._slice[0]:query._slice[1]]
+            columns = query._payload
+            data = [row if columns == ["*"] else {c: row.get(c) for c in columns} for row in matching]
+        elif query._op in ("insert", "upsert"):
+            data = self._write(query, rows)
+            if query._options.get("returning") == "minimal":
+                data = []
+        elif query._op == "update":
+            for row in matching:
+                row.update(query._payload)
+            data = matching
+        else:  # delete
+            self.tables[query._table] = [row for row in rows if row not in matching]
+            data = matching
+        return SimpleNamespace(data=orjson.loads(dumps(data)))
+
+    def _write(self, query: _FakeQuery, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload = orjson.loads(dumps(query._payload if isinstance(query._payload, list) else [query._payload]))
+        written = []
+        unique = _UNIQUE_KEYS.get(query._table)
+        if query._op == "insert" and unique is not None:
+            # A multi-row INSERT is one statement: a conflict rejects the whole batch
+            stored = {tuple(row[c] for c in unique) for row in rows}
+            if any(tuple(new[c] for c in unique) in stored for new in payload):
+                raise SimulatedDatabaseError(f"duplicate key in {query._table}")
+        for new in payload:
+            new.setdefault("id", str(uuid.uuid4()))
+            existing = None
+            if unique is not None:
+                key = tuple(new.get(c) for c in unique)
+                existing = next((row for row in rows if tuple(row[c] for c in unique) == key), None)
+            if existing is None:
+                rows.append(new)
+                written.append(new)
+            elif not query._options.get("ignore_duplicates"):
+                existing.update({k: v for k, v in new.items() if k != "id"})
+                written.append(existing)
+        return written
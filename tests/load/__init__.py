@@ -0,0 +1 @@
+"""End-to-end load harness (run as ``python -m tests.load``)"""
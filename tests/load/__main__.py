@@ -0,0 +1,58 @@
+"""
+Load test CLI.
+
+    python -m tests.load --requests 40 --concurrency 8 --rows 2000 --latency 0.05 --blocking
+    python -m tests.load --requests 40 --rows 20 --background-rows 50000 --background-concurrency 3
+"""
+import argparse
+import asyncio
+import json
+
+from tests.benchmarks.workbook_factory import WorkbookSpec
+from tests.load.harness import LoadConfig, format_report, run_load
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tests.load")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--endpoint", default="/api/excel/process")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--sheets", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per DB round trip")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-payload-bytes", type=int, default=None)
+    parser.add_argument("--blocking", action="store_true",
+                        help="Simulate the synchronous supabase client (time.sleep)")
+    parser.add_argument("--ingest-rpc", action="store_true",
+                        help="Store sheets with one ingest_table_chunk call per batch")
+    parser.add_argument("--background-rows", type=int, default=0,
+                        help="Upload a workbook of this many rows in a loop while the requests run")
+    parser.add_argument("--background-concurrency", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        endpoint=args.endpoint,
+        workbook=WorkbookSpec(rows=args.rows, columns=args.columns, sheets=args.sheets),
+        db_latency=args.latency,
+        db_jitter=args.jitter,
+        db_failure_rate=args.failure_rate,
+        db_max_payload_bytes=args.max_payload_bytes,
+        db_blocking=args.blocking,
+        db_ingest_rpc=args.ingest_rpc,
+        background=(
+            WorkbookSpec(rows=args.background_rows, columns=args.columns) if args.background_rows else None
+        ),
+        background_concurrency=args.background_concurrency,
+    )
+    report = asyncio.run(run_load(config))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Concurrent upload load generator against the real FastAPI app.
+
+Requests go through ``httpx.ASGITransport`` (no network) while the database
+is replaced by ``tests.fakes.InMemoryDatabaseClient``, so the numbers reflect
+our own parsing/serialization cost plus the injected storage latency. A ticker
+task running on the same event loop measures how long the loop was stalled.
+With ``background`` set, that workbook is uploaded in a loop by
+``background_concurrency`` extra clients while the measured requests run, to
+see how big imports affect the latency of the others.
+"""
+import asyncio
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.factories import get_database_client
+from app.main import app
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_workbook
+from tests.fakes import InMemoryDatabaseClient
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@dataclass
+class LoadConfig:
+    """What to send and how the fake database behaves"""
+    requests: int = 20
+    concurrency: int = 4
+    endpoint: str = "/api/excel/process"
+    workbook: WorkbookSpec = field(default_factory=lambda: WorkbookSpec(rows=500, columns=10))
+    db_latency: float = 0.02
+    db_jitter: float = 0.005
+    db_failure_rate: float = 0.0
+    db_max_payload_bytes: Optional[int] = None
+    db_blocking: bool = False
+    db_ingest_rpc: bool = False
+    # Large imports uploaded back to back while the measured requests run
+    background: Optional[WorkbookSpec] = None
+    background_concurrency: int = 1
+    stall_tick: float = 0.01          # ticker period in seconds
+    stall_threshold: float = 0.05     # overshoot counted as a stall
+
+
+class LoopStallMonitor:
+    """Ticks every ``tick`` seconds and accumulates how late each tick fired."""
+
+    def __init__(self, tick: float, threshold: float):
+        self.tick = tick
+        self.threshold = threshold
+        self.total_stall = 0.0
+        self.max_stall = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.tick
+            await asyncio.sleep(self.tick)
+            lag = time.perf_counter() - expected
+            if lag > self.threshold:
+                self.stalls += 1
+                self.total_stall += lag
+            self.max_stall = max(self.max_stall, lag)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_load(config: LoadConfig) -> Dict[str, Any]:
+    """Send ``config.requests`` uploads with ``config.concurrency`` in flight."""
+    content = generate_workbook(config.workbook)
+    db = InMemoryDatabaseClient(
+        latency=config.db_latency,
+        jitter=config.db_jitter,
+        failure_rate=config.db_failure_rate,
+        max_payload_bytes=config.db_max_payload_bytes,
+        blocking=config.db_blocking,
+        ingest_rpc=config.db_ingest_rpc,
+        seed=0,
+    )
+    previous_overrides = dict(app.dependency_overrides)
+    app.dependency_overrides[get_database_client] = lambda: db
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(config.requests):
+        queue.put_nowait(i)
+
+    monitor = LoopStallMonitor(config.stall_tick, config.stall_threshold)
+    background_content = generate_workbook(config.background) if config.background else None
+    background_done = 0
+    foreground_finished = asyncio.Event()
+
+    async def post(client: httpx.AsyncClient, name: str, payload: bytes, i: int) -> httpx.Response:
+        return await client.post(
+            config.endpoint,
+            files={"file": (name, payload, XLSX_MEDIA_TYPE)},
+            # Every request sends the same workbook: force re-ingestion so the
+            # duplicate-upload shortcut does not short-circuit the load
+            data={"workspace_id": f"ws-load-{i % 4}", "user_id": "user-load", "force": "true"},
+        )
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            response = await post(client, f"load_{i}.xlsx", content, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def background_worker(client: httpx.AsyncClient) -> None:
+        nonlocal background_done
+        while not foreground_finished.is_set():
+            await post(client, "background.xlsx", background_content, background_done)
+            background_done += 1
+
+    async def foreground(client: httpx.AsyncClient) -> None:
+        try:
+            await asyncio.gather(*(worker(client) for _ in range(config.concurrency)))
+        finally:
+            foreground_finished.set()
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            monitor.start()
+            started = time.perf_counter()
+            background_workers = [
+                asyncio.ensure_future(background_worker(client))
+                for _ in range(config.background_concurrency if background_content else 0)
+            ]
+            await foreground(client)
+            elapsed = time.perf_counter() - started
+            await asyncio.gather(*background_workers)
+            await monitor.stop()
+    finally:
+        app.dependency_overrides = previous_overrides
+
+    ordered = sorted(latencies)
+    return {
+        "config": {
+            **asdict(config),
+            "workbook": config.workbook.to_dict(),
+            "background": config.background.to_dict() if config.background else None,
+        },
+        "workbook_bytes": len(content),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.fmean(ordered) * 1000 if ordered else 0.0,
+            "p50": _percentile(ordered, 50) * 1000,
+            "p95": _percentile(ordered, 95) * 1000,
+            "p99": _percentile(ordered, 99) * 1000,
+            "max": (ordered[-1] * 1000) if ordered else 0.0,
+        },
+        "status_codes": statuses,
+        "background_completed": background_done,
+        "loop_stall": {
+            "total_s": monitor.total_stall,
+            "max_ms": monitor.max_stall * 1000,
+            "count": monitor.stalls,
+        },
+        "db": {"round_trips": db.round_trips, "calls": dict(db.calls), "bytes_sent": db.bytes_sent},
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lat = report["latency_ms"]
+    stall = report["loop_stall"]
+    return "\n".join([
+        f"requests      {sum(report['status_codes'].values())}  statuses {report['status_codes']}",
+        f"elapsed       {report['elapsed_s']:.2f} s   throughput {report['throughput_rps']:.2f} req/s",
+        f"latency (ms)  p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}",
+        f"loop stalls   {stall['count']}  total {stall['total_s']:.2f} s  max {stall['max_ms']:.1f} ms",
+        f"db            {report['db']['round_trips']} round trips  {report['db']['bytes_sent'] / 1024:.0f} KiB sent",
+        f"background    {report['background_completed']} large uploads completed",
+    ])
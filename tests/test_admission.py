@@ -0,0 +1,306 @@
+"""Tests for admission control of the heavy Excel routes"""
+import asyncio
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import excel as excel_routes
+from app.services.admission import AdmissionController, AdmissionRejected, JobCost, estimate_cost, workbook_cells
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_workbook
+
+MIB = 1024 * 1024
+
+
+def _cost(memory_mb: float) -> JobCost:
+    return JobCost(file_size=0, cells=0, memory_bytes=int(memory_mb * MIB), exact=True)
+
+
+def test_workbook_cells_reads_sheet_dimensions():
+    content = generate_workbook(WorkbookSpec(rows=100, columns=5, sheets=2))
+    # Every sheet has a header row on top of its data rows
+    assert workbook_cells(io.BytesIO(content)) == 2 * 101 * 5
+
+
+def test_estimate_cost_falls_back_to_file_size():
+    cost = estimate_cost(io.BytesIO(b"not a zip" * 100), 900, bytes_per_cell=200)
+    assert cost.exact is False
+    assert cost.cells > 0
+    assert cost.memory_bytes == cost.cells * 200 + 2 * 900
+
+
+def test_controller_limits_slots_and_memory():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2, memory_budget=100 * MIB, max_queue=4, queue_timeout=5)
+        first = await controller.acquire(_cost(60), "process")
+        # Fits a slot but not the memory budget: queued behind `first`
+        second = asyncio.ensure_future(controller.acquire(_cost(60), "process"))
+        await asyncio.sleep(0.01)
+        assert controller.queued == 1 and not second.done()
+
+        first.release()
+        ticket = await asyncio.wait_for(second, 1)
+        assert controller.active == 1 and controller.queued == 0
+        ticket.release()
+        ticket.release()
+        assert controller.active == 0 and controller.inflight_memory == 0
+
+    asyncio.run(scenario())
+
+
+def test_oversized_job_runs_alone():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=4, memory_budget=100 * MIB, max_queue=4, queue_timeout=5)
+        huge = await controller.acquire(_cost(500), "process")
+        small = asyncio.ensure_future(controller.acquire(_cost(1), "validate"))
+        await asyncio.sleep(0.01)
+        assert not small.done()
+        huge.release()
+        (await small).release()
+
+    asyncio.run(scenario())
+
+
+def test_controller_rejects_full_queue_and_timeouts():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, memory_budget=100 * MIB, max_queue=1, queue_timeout=0.05)
+        held = await controller.acquire(_cost(1), "process")
+        waiting = asyncio.ensure_future(controller.acquire(_cost(1), "process"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire(_cost(1), "process")
+        assert full.value.status_code == 429 and full.value.retry_after >= 1
+
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await waiting
+        assert timed_out.value.status_code == 503
+        assert controller.queued == 0
+        held.release()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, memory_budget=100 * MIB, max_queue=4, queue_timeout=5)
+        held = await controller.acquire(_cost(1), "process")
+        waiting = asyncio.ensure_future(controller.acquire(_cost(1), "process"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert controller.queued == 0
+        held.release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(max_concurrent=1, memory_budget=100 * MIB, max_queue=0, queue_timeout=0.05)
+    monkeypatch.setattr(excel_routes, "admission", controller)
+    return controller
+
+
+@pytest.fixture
+def workbook():
+    return generate_workbook(WorkbookSpec(rows=20, columns=4))
+
+
+def _validate(workbook: bytes):
+    client = TestClient(app)
+    return client.post("/api/excel/validate", files={"file": ("book.xlsx", workbook, "application/octet-stream")})
+
+
+def test_route_rejects_with_retry_after_when_saturated(controller, workbook):
+    held = asyncio.run(controller.acquire(_cost(1), "process"))
+
+    full = _validate(workbook)
+    assert full.status_code == 429
+    assert full.json()["detail"]["error_code"] == "TOO_MANY_REQUESTS"
+    assert int(full.headers["Retry-After"]) >= 1
+
+    controller.max_queue = 1
+    busy = _validate(workbook)
+    assert busy.status_code == 503
+    assert busy.json()["detail"]["error_code"] == "SERVER_BUSY"
+    assert "Retry-After" in busy.headers
+
+    held.release()
+    assert _validate(workbook).status_code == 200
+    assert controller.active == 0
+
+
+def test_ndjson_stream_holds_ticket_until_the_end(controller, workbook):
+    from app.factories import get_database_client
+    from tests.fakes import InMemoryDatabaseClient
+
+    app.dependency_overrides[get_database_client] = InMemoryDatabaseClient
+    try:
+        response = TestClient(app).post(
+            "/api/excel/process",
+            files={"file": ("book.xlsx", workbook, "application/octet-stream")},
+            data={"workspace_id": "ws-1", "user_id": "user-1"},
+            headers={"Accept": "application/x-ndjson"},
+        )
+    finally:
+        app.dependency_overrides = {}
+    assert response.status_code == 200
+    assert response.text.strip().splitlines()[-1].startswith('{"type":"summary"')
+    assert controller.active == 0 and controller.inflight_memory == 0
+
+
+def _cells(cells: int, memory_mb: float = 1) -> JobCost:
+    return JobCost(file_size=0, cells=cells, memory_bytes=int(memory_mb * MIB), exact=True)
+
+
+def test_small_jobs_use_the_fast_lane():
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=2, memory_budget=100 * MIB, max_queue=8, queue_timeout=5,
+            fast_lane_max_cells=1000, fast_lane_slots=1, aging=60,
+        )
+        running = await controller.acquire(_cells(100_000), "process")
+        assert running.lane == "bulk"
+        # The only free slot is reserved: the second import queues...
+        queued_bulk = asyncio.ensure_future(controller.acquire(_cells(100_000), "process"))
+        await asyncio.sleep(0)
+        assert not queued_bulk.done()
+        # ...while a small workbook takes it at once, ahead of the queued import
+        small = await asyncio.wait_for(controller.acquire(_cells(10), "process"), 1)
+        assert small.lane == "fast" and small.wait_seconds < 0.1
+
+        small.release()
+        assert not queued_bulk.done()
+        running.release()
+        (await asyncio.wait_for(queued_bulk, 1)).release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_aged_bulk_job_is_not_starved():
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=2, memory_budget=100 * MIB, max_queue=8, queue_timeout=5,
+            fast_lane_max_cells=1000, fast_lane_slots=1, aging=0.05,
+        )
+        first = await controller.acquire(_cells(10), "process")
+        second = await controller.acquire(_cells(10), "process")
+        bulk = asyncio.ensure_future(controller.acquire(_cells(100_000), "process"))
+        await asyncio.sleep(0.06)
+        small = asyncio.ensure_future(controller.acquire(_cells(10), "process"))
+        await asyncio.sleep(0)
+
+        # The freed slot goes to the bulk job that waited past `aging`, not the newer small one
+        first.release()
+        assert (await asyncio.wait_for(bulk, 1)).lane == "bulk"
+        assert not small.done()
+        second.release()
+        (await asyncio.wait_for(small, 1)).release()
+
+    asyncio.run(scenario())
+
+
+def test_workspaces_share_admissions_fairly():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, memory_budget=100 * MIB, max_queue=16, queue_timeout=5)
+        held = await controller.acquire(_cells(10), "process", "ws-noisy")
+        order = []
+
+        async def upload(workspace_id):
+            ticket = await controller.acquire(_cells(10), "process", workspace_id)
+            order.append(workspace_id)
+            await asyncio.sleep(0)
+            ticket.release()
+
+        noisy = [asyncio.ensure_future(upload("ws-noisy")) for _ in range(4)]
+        await asyncio.sleep(0)
+        quiet = asyncio.ensure_future(upload("ws-quiet"))
+        await asyncio.sleep(0)
+
+        held.release()
+        await asyncio.wait_for(asyncio.gather(*noisy, quiet), 1)
+        # The quiet workspace arrived last but does not wait for the whole backlog
+        assert order.index("ws-quiet") <= 1
+
+    asyncio.run(scenario())
+
+
+def test_workspace_concurrency_cap():
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=4, memory_budget=100 * MIB, max_queue=16, queue_timeout=5, workspace_max_concurrent=1,
+        )
+        first = await controller.acquire(_cells(10), "process", "ws-a")
+        capped = asyncio.ensure_future(controller.acquire(_cells(10), "process", "ws-a"))
+        await asyncio.sleep(0)
+        assert not capped.done()
+        # Other workspaces and uploads without workspace still get the free slots
+        other = await asyncio.wait_for(controller.acquire(_cells(10), "process", "ws-b"), 1)
+        anonymous = await asyncio.wait_for(controller.acquire(_cells(10), "validate"), 1)
+
+        first.release()
+        for ticket in (await asyncio.wait_for(capped, 1), other, anonymous):
+            ticket.release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_workspace_weights_setting():
+    from app.config import Settings
+
+    config = Settings(admission_workspace_weights="ws-a=2, ws-b=0.5,ws-c=0,bad,ws-d=alto")
+    assert config.admission_workspace_weights_map == {"ws-a": 2.0, "ws-b": 0.5}
+    config = Settings(admission_workspace_weights="ws-a=2", admission_workspace_metrics="ws-x, ws-a")
+    assert config.admission_workspace_metrics_list == ["ws-x", "ws-a"]
+
+
+def test_workspace_metrics_bucket_untracked_workspaces():
+    from prometheus_client import REGISTRY
+
+    def sample(name, workspace_id):
+        return REGISTRY.get_sample_value(name, {"workspace_id": workspace_id}) or 0
+
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=4, memory_budget=100 * MIB, max_queue=16, queue_timeout=5, metric_workspaces=["ws-a"],
+        )
+        admitted = sample("excel_workspace_admitted_jobs_total", "other")
+        tickets = [await controller.acquire(_cells(10), "process", ws) for ws in ("ws-a", "ws-b", "ws-c")]
+
+        assert sample("excel_workspace_active_jobs", "ws-a") == 1
+        assert sample("excel_workspace_active_jobs", "other") == 2
+        assert sample("excel_workspace_admitted_jobs_total", "other") == admitted + 2
+        assert REGISTRY.get_sample_value("excel_workspace_active_jobs", {"workspace_id": "ws-b"}) is None
+
+        tickets[1].release()
+        assert sample("excel_workspace_active_jobs", "other") == 1
+        for ticket in (tickets[0], tickets[2]):
+            ticket.release()
+        assert REGISTRY.get_sample_value("excel_workspace_active_jobs", {"workspace_id": "other"}) is None
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_files_with_bounded_parallelism(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "batch_max_concurrent", 2)
+    running, peak = 0, 0
+
+    async def process(index, upload):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - index))
+        running -= 1
+        return index
+
+    finished = [result async for result in excel_routes._run_batch(list("abcde"), process)]
+    assert sorted(finished) == [0, 1, 2, 3, 4] and peak == 2
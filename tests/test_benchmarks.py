@@ -0,0 +1,56 @@
+"""Tests for the benchmark tooling (generator determinism, regression flagging)"""
+import io
+
+import pandas as pd
+
+from tests.benchmarks.baseline import compare, load_results, save_results
+from tests.benchmarks.bench_processor import measure
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_frames, generate_workbook
+
+
+class TestWorkbookFactory:
+
+    def test_same_spec_same_data(self):
+        spec = WorkbookSpec(rows=50, columns=6, null_density=0.2, seed=7)
+        first, second = generate_frames(spec), generate_frames(spec)
+        for name in first:
+            pd.testing.assert_frame_equal(first[name], second[name])
+
+    def test_workbook_shape(self):
+        spec = WorkbookSpec(rows=20, columns=5, sheets=3)
+        excel = pd.ExcelFile(io.BytesIO(generate_workbook(spec)))
+        assert len(excel.sheet_names) == 3
+        df = excel.parse(excel.sheet_names[0])
+        assert df.shape == (20, 5)
+
+    def test_null_density(self):
+        spec = WorkbookSpec(rows=2000, columns=4, null_density=0.5,
+                            dtype_mix={"number": 1.0})
+        df = next(iter(generate_frames(spec).values()))
+        assert 0.4 < df.isna().mean().mean() < 0.6
+
+    def test_string_cardinality(self):
+        spec = WorkbookSpec(rows=500, columns=1, string_cardinality=3,
+                            dtype_mix={"string": 1.0})
+        df = next(iter(generate_frames(spec).values()))
+        assert df.iloc[:, 0].nunique() <= 3
+
+
+class TestBaselineCompare:
+
+    def test_flags_regression_above_threshold(self):
+        baseline = {"case": {"median_ms": 10.0, "peak_kb": 100.0}}
+        current = {"case": {"median_ms": 13.0, "peak_kb": 101.0}}
+        rows = compare(baseline, current, threshold=0.2)
+        flagged = {row["metric"] for row in rows if row["regression"]}
+        assert flagged == {"median_ms"}
+
+    def test_ignores_cases_missing_from_one_run(self):
+        rows = compare({"a": {"median_ms": 1.0}}, {"b": {"median_ms": 1.0}})
+        assert rows == []
+
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        results = {"case": measure(lambda: sum(range(100)), repeat=2)}
+        save_results(path, results)
+        assert load_results(path)["case"]["median_ms"] == results["case"]["median_ms"]
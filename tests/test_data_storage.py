@@ -1,7 +1,12 @@
 """Tests for DataStorageService"""
 import pytest
 from unittest.mock import Mock, AsyncMock, MagicMock
-from app.infrastructure.data_storage import DataStorageService
+from app.infrastructure.data_storage import (
+    DataStorageService,
+    PartialIngestError,
+    ResumeUnavailableError,
+    diff_row_hashes,
+)
 
 
 @pytest.fixture
@@ -136,3 +141,350 @@ async def test_get_table_data_success(data_storage_service, mock_supabase_client
     assert result == expected_data
     query_mock.select.assert_called_once_with("row_data, row_number")
     query_mock.eq.assert_called_once_with("table_id", table_id)
+
+
+@pytest.mark.asyncio
+async def test_store_excel_data_tags_fingerprint_after_rows(data_storage_service, mock_supabase_client):
+    """The upload fingerprint is only written with the final row_count update"""
+    metadata_mock = Mock()
+    metadata_mock.insert = Mock(return_value=metadata_mock)
+    metadata_mock.execute = Mock(return_value=Mock(data=[{"id": "table-id-123"}]))
+    rows_mock = Mock()
+    rows_mock.insert = Mock(return_value=rows_mock)
+    rows_mock.execute = Mock(return_value=Mock(data=[{}]))
+    update_mock = Mock()
+    update_mock.update = Mock(return_value=update_mock)
+    update_mock.eq = Mock(return_value=update_mock)
+    update_mock.execute = Mock(return_value=Mock())
+    mock_supabase_client.table = Mock(side_effect=[metadata_mock, rows_mock, update_mock])
+    source = {"mode": "process", "upload_id": "u1", "sheet_index": 0, "sheet_count": 1, "result": {}}
+
+    await data_storage_service.store_excel_data(
+        "workspace-123", "tbl", [{"a": 1}], {"a": "integer"}, fingerprint="abc", source=source
+    )
+
+    assert "file_fingerprint" not in metadata_mock.insert.call_args.args[0]
+    update_mock.update.assert_called_once_with(
+        {"row_count": 1, "status": "completed", "file_fingerprint": "abc", "source": source}
+    )
+
+
+def test_diff_row_hashes_is_positional():
+    """Edited rows are updates, extra rows inserts, missing trailing rows deletes"""
+    stored = {1: 10, 2: 20, 3: 30, 4: None}
+
+    grown = diff_row_hashes(stored, [10, 21, 30, 40, 50])
+    assert grown == {"inserts": [5], "updates": [2, 4], "deleted": 0, "unchanged": 2}
+
+    shrunk = diff_row_hashes(stored, [10, 20])
+    assert shrunk == {"inserts": [], "updates": [], "deleted": 2, "unchanged": 2}
+
+
+@pytest.fixture
+def db():
+    """FakeSupabase behind the real DataStorageService"""
+    from tests.fakes import FakeSupabase
+    return FakeSupabase()
+
+
+@pytest.fixture
+def service_options():
+    """Extra DataStorageService arguments; classes override it"""
+    return {}
+
+
+@pytest.fixture
+def service(db, tmp_path, monkeypatch, service_options):
+    """DataStorageService over ``db`` with a spool in tmp_path and no retry backoff"""
+    from app.config import settings
+    from app.infrastructure.ingest_spool import IngestSpool
+    monkeypatch.setattr(settings, "storage_retry_backoff_ms", 0.0)
+    return DataStorageService(db, spool=IngestSpool(str(tmp_path)), **service_options)
+
+
+class TestResumableStorage:
+
+    @staticmethod
+    def _rows(n):
+        return [{"n": i} for i in range(n)]
+
+    @staticmethod
+    def _fails_on_batch(first_row):
+        return lambda table, op, payload: (
+            table == "data_table_rows" and op in ("insert", "upsert") and payload[0]["row_number"] == first_row
+        )
+
+    @pytest.mark.asyncio
+    async def test_transient_batch_failure_is_retried(self, db, service):
+        attempts = []
+
+        def fail_once(table, op, payload):
+            if table == "data_table_rows" and op == "insert" and payload[0]["row_number"] == 101:
+                attempts.append(op)
+                return len(attempts) == 1
+            return False
+
+        db.fail_when(fail_once)
+        stored = await service.store_excel_data("ws-1", "tbl", self._rows(250), {"n": "integer"})
+
+        assert stored == 250
+        assert db.requests[("data_table_rows", "upsert")] == 1
+        (metadata,) = db.tables["data_tables_metadata"]
+        assert (metadata["status"], metadata["row_count"]) == ("completed", 250)
+
+    @pytest.mark.asyncio
+    async def test_failed_ingest_resumes_from_first_missing_batch(self, db, service):
+        db.fail_when(self._fails_on_batch(201))
+
+        with pytest.raises(PartialIngestError) as exc:
+            await service.store_excel_data("ws-1", "tbl", self._rows(450), {"n": "integer"})
+
+        table_id = exc.value.table_id
+        assert (exc.value.committed_rows, exc.value.total_rows) == (200, 450)
+        (metadata,) = db.tables["data_tables_metadata"]
+        assert (metadata["status"], metadata["row_count"]) == ("failed", 200)
+
+        db.fail_when(None)
+        result = await service.resume_excel_data("ws-1", table_id)
+
+        assert result == {"resumed_from_row": 201, "rows_written": 250, "row_count": 450}
+        assert (metadata["status"], metadata["row_count"]) == ("completed", 450)
+        assert sorted(r["row_number"] for r in db.tables["data_table_rows"]) == list(range(1, 451))
+        assert db.requests[("data_table_rows", "upsert")] == 2 + 3  # 2 failed retries + 3 resume batches
+        assert service.spool.load(table_id) is None
+
+    @pytest.mark.asyncio
+    async def test_spool_is_written_off_the_event_loop(self, db, service):
+        import threading
+        threads = []
+        save = service.spool.save
+
+        def recording_save(table_id, payload):
+            threads.append(threading.get_ident())
+            save(table_id, payload)
+
+        service.spool.save = recording_save
+        db.fail_when(self._fails_on_batch(101))
+        with pytest.raises(PartialIngestError) as exc:
+            await service.store_excel_data("ws-1", "tbl", self._rows(150), {"n": "integer"})
+
+        assert threads and threading.get_ident() not in threads
+        assert len(service.spool.load(exc.value.table_id)["rows"]) == 50
+
+    @pytest.mark.asyncio
+    async def test_resume_without_spool_or_other_workspace(self, db, service):
+        db.fail_when(self._fails_on_batch(101))
+        with pytest.raises(PartialIngestError) as exc:
+            await service.store_excel_data("ws-1", "tbl", self._rows(150), {"n": "integer"})
+        db.fail_when(None)
+
+        with pytest.raises(ResumeUnavailableError):
+            await service.resume_excel_data("ws-other", exc.value.table_id)
+        service.spool.discard(exc.value.table_id)
+        with pytest.raises(ResumeUnavailableError):
+            await service.resume_excel_data("ws-1", exc.value.table_id)
+
+    @pytest.mark.asyncio
+    async def test_jsonb_tables_work_without_the_row_format_column(self, db, service):
+        """Without migration 007 row_format is neither written nor selected"""
+        def missing_column(table, op, payload):
+            # select payloads are the column list, insert/update ones the metadata dict
+            return table == "data_tables_metadata" and op != "delete" and "row_format" in payload
+
+        db.fail_when(missing_column)
+
+        assert await service.store_excel_data("ws-1", "tbl", self._rows(150), {"n": "integer"}) == 150
+        (metadata,) = db.tables["data_tables_metadata"]
+        table = await service.get_table_metadata("ws-1", metadata["id"])
+
+        assert table["table_name"] == "tbl" and "row_format" not in table
+        rows = await service.get_table_data(metadata["id"], limit=1000, row_format=table.get("row_format"))
+        assert [row["n"] for row in rows] == list(range(150))
+
+
+class TestIngestRpc:
+
+    @pytest.fixture
+    def service_options(self):
+        return {"ingest_rpc": True}
+
+    @pytest.mark.asyncio
+    async def test_one_request_per_chunk(self, db, service):
+        rows = [{"n": i} for i in range(250)]
+        stored = await service.store_excel_data(
+            "ws-1", "tbl", rows, {"n": "integer"}, fingerprint="abc", row_hashes=list(range(250))
+        )
+
+        assert stored == 250
+        assert dict(db.requests) == {("ingest_table_chunk", "rpc"): 3}
+        (metadata,) = db.tables["data_tables_metadata"]
+        assert (metadata["status"], metadata["row_count"], metadata["file_fingerprint"]) == ("completed", 250, "abc")
+        assert metadata["columns"] == [{"name": "n", "type": "integer", "nullable": True}]
+        assert [r["row_hash"] for r in db.tables["data_table_rows"]] == list(range(250))
+
+    @pytest.mark.asyncio
+    async def test_empty_sheet_is_a_single_call(self, db, service):
+        assert await service.store_excel_data("ws-1", "tbl", [], {"n": "integer"}) == 0
+        assert dict(db.requests) == {("ingest_table_chunk", "rpc"): 1}
+        assert db.tables["data_tables_metadata"][0]["status"] == "completed"
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_is_checkpointed_and_resumable(self, db, service):
+        db.fail_when(lambda name, op, params: op == "rpc" and params["p_rows"][0]["row_number"] == 101)
+
+        with pytest.raises(PartialIngestError) as exc:
+            await service.store_excel_data("ws-1", "tbl", [{"n": i} for i in range(250)], {"n": "integer"})
+
+        assert (exc.value.committed_rows, exc.value.total_rows) == (100, 250)
+        (metadata,) = db.tables["data_tables_metadata"]
+        assert (metadata["status"], metadata["row_count"]) == ("failed", 100)
+
+        db.fail_when(None)
+        result = await service.resume_excel_data("ws-1", exc.value.table_id)
+        assert result == {"resumed_from_row": 101, "rows_written": 150, "row_count": 250}
+        assert (metadata["status"], metadata["row_count"]) == ("completed", 250)
+
+    @pytest.mark.asyncio
+    async def test_failed_first_chunk_stores_nothing(self, db, service):
+        db.fail_when(lambda name, op, params: op == "rpc")
+
+        with pytest.raises(Exception) as exc:
+            await service.store_excel_data("ws-1", "tbl", [{"n": 1}], {"n": "integer"})
+
+        assert not isinstance(exc.value, PartialIngestError)
+        assert db.requests[("ingest_table_chunk", "rpc")] == 3  # first attempt + 2 retries
+        assert not db.tables.get("data_tables_metadata")
+
+
+def test_plan_block_writes_touches_only_affected_blocks():
+    from app.infrastructure.row_blocks import plan_block_writes
+
+    stored = [(1, 100), (101, 200), (201, 250)]
+    # An edit in the second block; the short last block is filled before appending
+    assert plan_block_writes(stored, [150, 251, 320], 320, 100) == [(101, 200), (201, 300), (301, 320)]
+    assert plan_block_writes(stored, [], 250, 100) == []
+    # The table now ends inside the second block; the third is left to the delete
+    assert plan_block_writes(stored, [], 120, 100) == [(101, 120)]
+
+
+class TestCompressedBlocks:
+
+    @pytest.fixture
+    def service_options(self):
+        return {"row_format": "zstd_blocks", "block_rows": 100}
+
+    @staticmethod
+    def _rows(n, version=0):
+        return [{"n": i, "nombre": f"fila {i % 7}", "monto": i * 1.5 + version, "activo": None} for i in range(n)]
+
+    async def _read_all(self, service, table_id):
+        return await service.get_table_data(table_id, limit=10_000, row_format="zstd_blocks")
+
+    @pytest.mark.asyncio
+    async def test_rows_are_stored_in_compressed_blocks(self, db, service):
+        import pandas as pd
+        from app.utils.serialization import dumps
+        import orjson
+
+        rows = self._rows(250)
+        rows[3]["fecha"] = pd.Timestamp("2024-05-01")
+        stored = await service.store_excel_data("ws-1", "tbl", rows, {"n": "integer"}, row_hashes=list(range(250)))
+
+        assert stored == 250
+        assert "data_table_rows" not in db.tables
+        blocks = db.tables["data_table_blocks"]
+        assert [(b["first_row"], b["last_row"]) for b in blocks] == [(1, 100), (101, 200), (201, 250)]
+        assert blocks[2]["row_hashes"] == list(range(200, 250))
+        (metadata,) = db.tables["data_tables_metadata"]
+        assert (metadata["row_format"], metadata["status"], metadata["row_count"]) == ("zstd_blocks", "completed", 250)
+        assert sum(len(b["payload"]) // 2 for b in blocks) < len(dumps(rows)) / 3
+
+        table_id = metadata["id"]
+        expected = orjson.loads(dumps(rows))
+        assert await self._read_all(service, table_id) == expected
+        # A page across a block boundary reads only the two blocks it overlaps
+        page = await service.get_table_data(table_id, limit=20, offset=90, row_format="zstd_blocks")
+        assert page == expected[90:110]
+        assert await service.get_table_data(table_id, limit=10, offset=300, row_format="zstd_blocks") == []
+
+    @pytest.mark.asyncio
+    async def test_pages_read_as_columns_match_the_rows(self, db, service):
+        from app.utils.arrow import records_to_columns
+
+        rows = self._rows(250)
+        rows[95]["nota"] = "solo esta fila"
+        await service.store_excel_data("ws-1", "tbl", rows, {"n": "integer"})
+        table_id = db.tables["data_tables_metadata"][0]["id"]
+
+        for limit, offset in ((20, 90), (100, 0), (50, 0), (60, 200), (10, 300)):
+            page = await service.get_table_data(table_id, limit=limit, offset=offset, row_format="zstd_blocks")
+            columns = await service.get_table_columns(
+                table_id, limit=limit, offset=offset, row_format="zstd_blocks", names=["monto", "n"]
+            )
+            assert columns == records_to_columns(page, ["monto", "n"])
+            assert list(columns)[:2] == ["monto", "n"]
+        assert columns == {"monto": [], "n": []}
+
+    @pytest.mark.asyncio
+    async def test_failed_block_resumes(self, db, service):
+        db.fail_when(lambda table, op, payload: table == "data_table_blocks" and payload[0]["first_row"] == 101)
+        with pytest.raises(PartialIngestError) as exc:
+            await service.store_excel_data("ws-1", "tbl", self._rows(250), {"n": "integer"})
+        assert exc.value.committed_rows == 100
+
+        db.fail_when(None)
+        result = await service.resume_excel_data("ws-1", exc.value.table_id)
+        assert result == {"resumed_from_row": 101, "rows_written": 150, "row_count": 250}
+        assert await self._read_all(service, exc.value.table_id) == self._rows(250)
+
+    @pytest.mark.asyncio
+    async def test_update_rewrites_changed_blocks_only(self, db, service):
+        await service.store_excel_data("ws-1", "tbl", self._rows(250), {"n": "integer"}, row_hashes=list(range(250)))
+        table_id = db.tables["data_tables_metadata"][0]["id"]
+        db.requests.clear()
+
+        new = self._rows(320)
+        new[150]["nombre"] = "editada"
+        hashes = list(range(320))
+        hashes[150] = -1
+        diff = await service.update_excel_data(
+            "ws-1", table_id, new, {"n": "integer"}, hashes, row_format="zstd_blocks"
+        )
+
+        assert diff == {"inserted": 70, "updated": 1, "deleted": 0, "unchanged": 249}
+        # Block 101-200 (edited) and the short last block, filled up to 300, plus 301-320
+        assert db.requests[("data_table_blocks", "upsert")] == 3
+        assert await self._read_all(service, table_id) == new
+
+        diff = await service.update_excel_data(
+            "ws-1", table_id, new[:120], {"n": "integer"}, hashes[:120], row_format="zstd_blocks"
+        )
+        assert diff["deleted"] == 200
+        blocks = db.tables["data_table_blocks"]
+        assert sorted((b["first_row"], b["last_row"]) for b in blocks) == [(1, 100), (101, 120)]
+        assert await self._read_all(service, table_id) == new[:120]
+
+
+@pytest.mark.asyncio
+async def test_upload_reservation_is_held_until_released_or_stale(db, service, monkeypatch):
+    import asyncio
+    from app.config import settings
+
+    first = await service.reserve_upload("ws-1", "abc")
+    assert first is not None
+    assert await service.reserve_upload("ws-1", "abc") is None
+    assert await service.reserve_upload("ws-2", "abc") is not None
+    await service.release_upload("ws-1", "abc", "someone-else")
+    assert await service.reserve_upload("ws-1", "abc") is None
+
+    await service.release_upload("ws-1", "abc", first)
+    second = await service.reserve_upload("ws-1", "abc")
+    assert second not in (None, first)
+
+    # A holder that died mid-ingest is taken over after the TTL; its late release is a no-op
+    monkeypatch.setattr(settings, "upload_reservation_ttl_s", 0.0)
+    await asyncio.sleep(0.01)
+    third = await service.reserve_upload("ws-1", "abc")
+    assert third not in (None, second)
+    await service.release_upload("ws-1", "abc", second)
+    assert [r["token"] for r in db.tables["upload_reservations"] if r["workspace_id"] == "ws-1"] == [third]
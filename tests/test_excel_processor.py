@@ -82,6 +82,36 @@ class TestExcelProcessor:
         assert len(preview["rows"]) == 2
         assert preview["total_rows"] == 2
     
+    def test_get_data_preview_sheet_and_headers(self, excel_processor):
+        """Preview de una hoja elegida, con encabezados al estilo pandas"""
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Resumen"
+        detail = workbook.create_sheet("Detalle")
+        detail.append(["monto", None, "monto"])
+        for i in range(50):
+            detail.append([i, f"fila {i}", i * 2])
+        detail.append([None, None, None])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        preview = excel_processor.get_data_preview(buffer.getvalue(), rows=3, sheet="Detalle")
+
+        assert preview["sheet_name"] == "Detalle"
+        assert preview["sheets"] == ["Resumen", "Detalle"]
+        assert preview["headers"] == ["monto", "Unnamed: 1", "monto.1"]
+        assert preview["rows"] == [[0, "fila 0", 0], [1, "fila 1", 2], [2, "fila 2", 4]]
+        assert preview["sample_size"] == 3
+
+        with pytest.raises(ExcelProcessingError) as missing:
+            excel_processor.get_data_preview(buffer.getvalue(), sheet="Otra")
+        assert missing.value.error_code == "SHEET_NOT_FOUND"
+
+    def test_get_data_preview_corrupted_file(self, excel_processor):
+        """Un archivo que no abre se reporta como corrupto"""
+        with pytest.raises(ExcelProcessingError) as corrupted:
+            excel_processor.get_data_preview(b"This is just a text file, not Excel")
+        assert corrupted.value.error_code == "CORRUPTED_FILE"
+    
     def test_detect_column_type_integer(self, excel_processor):
         """Test detección de tipo integer"""
         series = pd.Series([1, 2, 3, 4, 5])
@@ -232,6 +262,51 @@ class TestProcessAllSheets:
         assert result["success"] is False
         assert "error" in result
 
+    def test_iter_sheets_yields_in_workbook_order(self, excel_processor, multi_sheet_excel_bytes):
+        sheets = excel_processor.iter_sheets(multi_sheet_excel_bytes, "ws-1")
+        first = next(sheets)
+        assert first["sheet_name"] == "Ventas"
+        assert [s["sheet_name"] for s in sheets] == ["Empleados"]
+
+    def test_process_sheet_selects_sheet_and_table_name(self, excel_processor, multi_sheet_excel_bytes):
+        sheet = excel_processor.process_sheet(multi_sheet_excel_bytes, "ws-1", "Empleados", "empleados_2024")
+        assert sheet["sheet_name"] == "Empleados"
+        assert sheet["table_name"] == "empleados_2024"
+        assert len(sheet["_row_hashes"]) == sheet["rows"]
+
+    def test_process_sheet_unknown_sheet(self, excel_processor, multi_sheet_excel_bytes):
+        with pytest.raises(ExcelProcessingError) as exc:
+            excel_processor.process_sheet(multi_sheet_excel_bytes, "ws-1", "Nope")
+        assert exc.value.error_code == "SHEET_NOT_FOUND"
+
+    def test_sheet_and_column_projection(self, excel_processor, multi_sheet_excel_bytes):
+        result = excel_processor.process_all_sheets(
+            multi_sheet_excel_bytes, "ws-1", sheets=["Empleados"], columns=["email", "nombre"]
+        )
+        assert [s["sheet_name"] for s in result["sheets"]] == ["Empleados"]
+        sheet = result["sheets"][0]
+        assert sheet["columns"] == 2 and sheet["_sheet_count"] == 1
+        assert list(sheet["_data"][0]) == ["nombre", "email"]
+
+    def test_projection_unknown_sheet_or_columns(self, excel_processor, multi_sheet_excel_bytes):
+        with pytest.raises(ExcelProcessingError) as sheet_missing:
+            excel_processor.process_all_sheets(multi_sheet_excel_bytes, "ws-1", sheets=["Nope"])
+        assert sheet_missing.value.error_code == "SHEET_NOT_FOUND"
+        with pytest.raises(ExcelProcessingError) as column_missing:
+            list(excel_processor.iter_sheets(multi_sheet_excel_bytes, "ws-1", columns=["monto"]))
+        assert column_missing.value.error_code == "COLUMN_NOT_FOUND"
+
+    def test_row_hashes_track_values_and_columns(self, excel_processor):
+        df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        edited = df.copy()
+        edited.loc[1, "b"] = "changed"
+
+        hashes = excel_processor.row_hashes(df)
+        assert hashes == excel_processor.row_hashes(df.copy())
+        assert [h1 == h2 for h1, h2 in zip(hashes, excel_processor.row_hashes(edited))] == [True, False, True]
+        assert set(hashes).isdisjoint(excel_processor.row_hashes(df.rename(columns={"b": "c"})))
+        assert all(-2**63 <= h < 2**63 for h in hashes)
+
 
 class TestSuggestWidgets:
 
@@ -0,0 +1,67 @@
+"""Tests for the in-memory database double and the load harness"""
+import pytest
+
+from tests.benchmarks.workbook_factory import WorkbookSpec
+from tests.fakes import InMemoryDatabaseClient, PayloadTooLargeError, SimulatedDatabaseError
+from tests.load.harness import LoadConfig, run_load
+
+
+class TestInMemoryDatabaseClient:
+
+    @pytest.mark.asyncio
+    async def test_store_counts_one_round_trip_per_batch(self):
+        db = InMemoryDatabaseClient(batch_size=100)
+        data = [{"a": i} for i in range(250)]
+
+        stored = await db.store_excel_data("ws-1", "tbl", data, {"a": "integer"})
+
+        assert stored == 250
+        assert db.calls["insert_rows"] == 3
+        assert db.round_trips == 5  # metadata + 3 batches + row_count update
+
+    @pytest.mark.asyncio
+    async def test_payload_limit(self):
+        db = InMemoryDatabaseClient(max_payload_bytes=200)
+
+        with pytest.raises(PayloadTooLargeError):
+            await db.store_excel_data("ws-1", "tbl", [{"a": "x" * 500}], {"a": "string"})
+
+    @pytest.mark.asyncio
+    async def test_failure_rate(self):
+        db = InMemoryDatabaseClient(failure_rate=1.0)
+
+        with pytest.raises(SimulatedDatabaseError):
+            await db.get_workspace("ws-1")
+
+
+@pytest.mark.asyncio
+async def test_run_load_reports_latency_and_stalls():
+    report = await run_load(LoadConfig(
+        requests=4,
+        concurrency=2,
+        workbook=WorkbookSpec(rows=20, columns=4),
+        db_latency=0.001,
+        db_jitter=0.0,
+    ))
+
+    assert report["status_codes"] == {200: 4}
+    assert report["throughput_rps"] > 0
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99"]
+    assert report["db"]["calls"]["insert_metadata"] == 4
+    assert set(report["loop_stall"]) == {"total_s", "max_ms", "count"}
+
+
+@pytest.mark.asyncio
+async def test_run_load_with_background_imports():
+    report = await run_load(LoadConfig(
+        requests=3,
+        concurrency=1,
+        workbook=WorkbookSpec(rows=5, columns=3),
+        db_latency=0.0,
+        db_jitter=0.0,
+        background=WorkbookSpec(rows=200, columns=4),
+        background_concurrency=1,
+    ))
+
+    assert report["status_codes"] == {200: 3}
+    assert report["background_completed"] >= 1
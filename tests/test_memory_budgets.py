@@ -0,0 +1,79 @@
+"""
+Peak-memory budgets for reference workbooks.
+
+Each case runs one ExcelProcessor operation under tracemalloc and asserts
+the peak stays under its budget. Budgets sit at roughly twice the peaks
+measured when they were set; a failure means a change made the pipeline
+hold noticeably more memory for the same workbook shape. Raise a budget only
+after confirming the new peak is intended.
+"""
+import gc
+import tracemalloc
+
+import pytest
+
+from app.services.excel_processor import ExcelProcessor
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_workbook
+
+MIB = 1024 * 1024
+
+REFERENCE_WORKBOOKS = {
+    "long": WorkbookSpec(rows=5000, columns=10),
+    "many_sheets": WorkbookSpec(rows=500, columns=8, sheets=10),
+    "wide": WorkbookSpec(rows=2000, columns=60),
+    "sparse": WorkbookSpec(rows=5000, columns=10, null_density=0.5),
+}
+
+# (workbook, operation) -> budget in MiB
+BUDGETS = {
+    ("long", "validate"): 4,
+    ("long", "process"): 10,
+    ("long", "preview"): 2,
+    ("many_sheets", "validate"): 6,
+    ("many_sheets", "process"): 7,
+    ("many_sheets", "preview"): 5,
+    ("wide", "validate"): 2,
+    ("wide", "process"): 22,
+    ("wide", "preview"): 2,
+    ("sparse", "validate"): 3,
+    ("sparse", "process"): 9,
+    ("sparse", "preview"): 2,
+}
+
+OPERATIONS = {
+    "validate": lambda processor, content: processor.validate_file(content, "book.xlsx"),
+    "process": lambda processor, content: processor.process_all_sheets(content, "ws-1"),
+    "preview": lambda processor, content: processor.get_data_preview(content, 10),
+}
+
+
+@pytest.fixture(scope="module")
+def workbooks():
+    return {name: generate_workbook(spec) for name, spec in REFERENCE_WORKBOOKS.items()}
+
+
+def _peak_bytes(fn) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+@pytest.mark.parametrize("workbook,operation", sorted(BUDGETS), ids=lambda v: str(v))
+def test_peak_memory_within_budget(workbooks, workbook, operation):
+    processor = ExcelProcessor()
+    content = workbooks[workbook]
+    OPERATIONS[operation](processor, content)  # warm imports and caches outside the trace
+
+    peak = _peak_bytes(lambda: OPERATIONS[operation](processor, content))
+
+    budget = BUDGETS[(workbook, operation)] * MIB
+    assert peak <= budget, (
+        f"{operation} on {REFERENCE_WORKBOOKS[workbook].label} peaked at "
+        f"{peak / MIB:.1f} MiB, budget {budget / MIB:.0f} MiB"
+    )
@@ -0,0 +1,326 @@
+"""Tests for per-request timings and the on-demand profiler"""
+import io
+import json
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.factories import get_database_client
+from app.main import app
+from app.observability.memory import track_memory
+from app.observability.timing import RequestTimings, _current_timings
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+@pytest.fixture
+def client(mock_db_client):
+    app.dependency_overrides = {get_database_client: lambda: mock_db_client}
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides = {}
+
+
+@pytest.fixture
+def workbook():
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        pd.DataFrame({"a": [1, 2]}).to_excel(writer, sheet_name="Hoja1", index=False)
+        pd.DataFrame({"b": ["x"]}).to_excel(writer, sheet_name="Hoja2", index=False)
+    return buf.getvalue()
+
+
+def _process(client, workbook, headers=None):
+    return client.post(
+        "/api/excel/process",
+        files={"file": ("book.xlsx", workbook, XLSX)},
+        data={"workspace_id": "ws-1", "user_id": "user-1"},
+        headers=headers or {},
+    )
+
+
+class TestRequestTimings:
+
+    def test_aggregates_repeated_stages(self):
+        timings = RequestTimings()
+        timings.add("storage_batch", 0.010, "tbl")
+        timings.add("storage_batch", 0.030, "tbl")
+
+        (entry,) = timings.entries()
+
+        assert entry["count"] == 2
+        assert entry["dur_ms"] == pytest.approx(40.0)
+        assert 'storage_batch;desc="tbl x2";dur=40.0' in timings.server_timing()
+
+    def test_server_timing_header_on_process(self, client, workbook):
+        response = _process(client, workbook)
+
+        assert response.status_code == 200
+        header = response.headers["server-timing"]
+        for stage in ("read_upload", "validate", "parse", "nan_cleaning", "storage", "total"):
+            assert f"{stage};" in header
+        assert 'parse;desc="Hoja1"' in header
+        assert 'parse;desc="Hoja2"' in header
+
+    def test_timing_log_line(self, client, workbook, caplog):
+        with caplog.at_level("INFO", logger="app.observability.timing"):
+            _process(client, workbook)
+
+        lines = [r.getMessage() for r in caplog.records if r.getMessage().startswith("[timing]")]
+        assert lines and '"path": "/api/excel/process"' in lines[-1]
+
+
+class TestProfiler:
+
+    def test_privileged_header_writes_profile(self, client, workbook, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "profiling_token", "secret")
+        monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "profiling_interval_ms", 1.0)
+
+        response = _process(client, workbook, headers={"X-Profile-Token": "secret"})
+
+        profile = tmp_path / response.headers["x-profile-file"]
+        assert profile.exists()
+        lines = profile.read_text().splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    def test_wrong_token_is_ignored(self, client, workbook, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "profiling_token", "secret")
+        monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+
+        response = _process(client, workbook, headers={"X-Profile-Token": "nope"})
+
+        assert "x-profile-file" not in response.headers
+        assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def span_exporter():
+    from app.observability.tracing import InMemorySpanExporter, tracer
+
+    exporter = InMemorySpanExporter()
+    tracer.set_exporter(exporter)
+    yield exporter
+    tracer.set_exporter(None)
+
+
+class TestTracing:
+
+    def test_process_spans_form_one_trace(self, client, workbook, span_exporter):
+        _process(client, workbook)
+
+        spans = {s.name: s for s in span_exporter.get_finished_spans()}
+        root = spans["POST /api/excel/process"]
+        assert root.parent_id is None
+        assert root.attributes["http.status_code"] == 200
+        assert root.attributes["workspace_id"] == "ws-1"
+        assert {s.trace_id for s in span_exporter.get_finished_spans()} == {root.trace_id}
+
+        sheet_spans = [s for s in span_exporter.get_finished_spans() if s.name == "process_sheet"]
+        assert sorted(s.attributes["sheet_name"] for s in sheet_spans) == ["Hoja1", "Hoja2"]
+        assert all("rows" in s.attributes for s in sheet_spans)
+        parse = next(s for s in span_exporter.get_finished_spans() if s.name == "parse")
+        assert parse.parent_id in {s.span_id for s in sheet_spans}
+        assert spans["read_upload"].attributes["bytes"] == len(workbook)
+
+    @pytest.mark.asyncio
+    async def test_storage_batches_carry_batch_index(self, span_exporter):
+        from unittest.mock import Mock
+        from app.infrastructure.data_storage import DataStorageService
+
+        table = Mock()
+        table.insert.return_value = table
+        table.update.return_value = table
+        table.eq.return_value = table
+        table.execute.return_value = Mock(data=[{"id": "table-1"}])
+        client = Mock()
+        client.table.return_value = table
+
+        await DataStorageService(client).store_excel_data(
+            "ws-1", "tbl", [{"a": i} for i in range(250)], {"a": "integer"}
+        )
+
+        batches = [s for s in span_exporter.get_finished_spans() if s.name == "storage_batch"]
+        assert [s.attributes["batch_index"] for s in batches] == [0, 1, 2]
+        assert [s.attributes["rows"] for s in batches] == [100, 100, 50]
+
+    def test_critical_path_follows_latest_child(self):
+        from app.observability.tracing import critical_path
+
+        spans = [
+            {"span_id": "r", "parent_id": None, "end_time": 10, "name": "root"},
+            {"span_id": "a", "parent_id": "r", "end_time": 4, "name": "validate"},
+            {"span_id": "b", "parent_id": "r", "end_time": 9, "name": "storage"},
+            {"span_id": "c", "parent_id": "b", "end_time": 9, "name": "storage_batch"},
+        ]
+
+        assert [s["name"] for s in critical_path(spans)] == ["root", "storage", "storage_batch"]
+
+    def test_file_exporter_writes_jsonl(self, tmp_path):
+        import json
+        from app.observability.tracing import JsonlFileSpanExporter, Tracer
+
+        path = tmp_path / "spans.jsonl"
+        exporter = JsonlFileSpanExporter(str(path))
+        local = Tracer(exporter)
+        with local.start_as_current_span("outer"):
+            with local.start_as_current_span("inner", {"rows": 3}):
+                pass
+        # Written by the exporter's thread, not by the code that ended the span
+        exporter.flush()
+
+        inner, outer = [json.loads(line) for line in path.read_text().splitlines()]
+        assert inner["parent_id"] == outer["span_id"]
+        assert inner["attributes"] == {"rows": 3}
+
+        with local.start_as_current_span("last"):
+            pass
+        local.shutdown()
+        assert json.loads(path.read_text().splitlines()[-1])["name"] == "last"
+
+
+class TestEventLoopMonitor:
+
+    @pytest.mark.asyncio
+    async def test_detects_blocking_call_with_route_and_stack(self, caplog):
+        import asyncio
+        import time
+        from app.observability.loop_monitor import EventLoopMonitor
+
+        monitor = EventLoopMonitor(interval=0.02, block_threshold=0.1)
+        monitor.start()
+        monitor.tag_current_task("POST /api/excel/slow")
+        with caplog.at_level("WARNING", logger="app.observability.loop_monitor"):
+            time.sleep(0.4)  # deliberately block the loop
+            await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert monitor.blocked_events >= 1
+        message = next(r.getMessage() for r in caplog.records if "[loop]" in r.getMessage())
+        assert "POST /api/excel/slow" in message
+        assert "test_detects_blocking_call_with_route_and_stack" in message
+
+    @pytest.mark.asyncio
+    async def test_requests_are_tagged_with_the_route_template(self, monkeypatch):
+        """Table ids in the path must not become loop-monitor labels"""
+        import httpx
+        from app.observability import middleware
+        from tests.fakes import InMemoryDatabaseClient
+
+        tags = []
+        monkeypatch.setattr(middleware.loop_monitor, "tag_current_task", tags.append)
+        app.dependency_overrides = {get_database_client: lambda: InMemoryDatabaseClient()}
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                await client.get("/api/excel/tables/table-123/data", params={"workspace_id": "ws-1"})
+                await client.get("/api/excel/no-such-route/table-123")
+        finally:
+            app.dependency_overrides = {}
+
+        assert tags == ["GET /api/excel/tables/{table_id}/data", "GET unmatched"]
+
+    @pytest.mark.asyncio
+    async def test_process_keeps_parsing_off_the_loop(self, workbook, mock_db_client):
+        """Slow parsing/validation must run in the threadpool, never on the loop"""
+        import time
+        import httpx
+        from app.factories import get_excel_processor
+        from app.observability.loop_monitor import EventLoopMonitor
+        from app.services.excel_processor import ExcelProcessor
+
+        class SlowProcessor(ExcelProcessor):
+            def validate_file(self, file_content, filename):
+                time.sleep(0.3)
+                return super().validate_file(file_content, filename)
+
+            def process_all_sheets(self, file_content, workspace_id):
+                time.sleep(0.3)
+                return super().process_all_sheets(file_content, workspace_id)
+
+        app.dependency_overrides = {
+            get_database_client: lambda: mock_db_client,
+            get_excel_processor: lambda: SlowProcessor(),
+        }
+        monitor = EventLoopMonitor(interval=0.02, block_threshold=0.2)
+        monitor.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                response = await http.post(
+                    "/api/excel/process",
+                    files={"file": ("book.xlsx", workbook, XLSX)},
+                    data={"workspace_id": "ws-1", "user_id": "user-1"},
+                )
+        finally:
+            await monitor.stop()
+            app.dependency_overrides = {}
+
+        assert response.status_code == 200
+        assert monitor.blocked_events == 0
+
+
+class TestMemoryTracking:
+
+    def test_log_line_carries_shape_and_memory(self, client, workbook, caplog, monkeypatch):
+        monkeypatch.setattr(settings, "memory_tracemalloc", True)
+        with caplog.at_level("INFO", logger="app.observability.timing"):
+            response = _process(client, workbook)
+
+        assert response.status_code == 200
+        line = [r.getMessage() for r in caplog.records if r.getMessage().startswith("[timing]")][-1]
+        record = json.loads(line[len("[timing] "):])
+        assert record["workbook"] == {
+            "rows": 3, "columns": 1, "sheets": 2, "bytes": len(workbook), "size_class": "lt_100kb",
+        }
+        assert set(record["memory"]) == {"validate", "parse", "store"}
+        assert record["memory"]["parse"]["peak"] > 0
+        assert "rss_delta" in record["memory"]["store"]
+
+    def test_memory_metrics_exported(self, client, workbook):
+        _process(client, workbook)
+
+        body = client.get("/metrics").text
+        assert 'excel_stage_rss_delta_bytes_count{size_class="lt_100kb",stage="parse"}' in body
+
+    def test_peak_kept_only_for_stages_that_ran_alone(self, monkeypatch):
+        monkeypatch.setattr(settings, "memory_tracemalloc", True)
+        alone, outer = RequestTimings(), RequestTimings()
+        token = _current_timings.set(alone)
+        try:
+            with track_memory("parse"):
+                bytearray(1024 * 1024)
+        finally:
+            _current_timings.reset(token)
+
+        # Two requests' stages overlapping share one process-wide peak: neither keeps it
+        token = _current_timings.set(outer)
+        try:
+            with track_memory("parse"):
+                inner = RequestTimings()
+                inner_token = _current_timings.set(inner)
+                try:
+                    with track_memory("store"):
+                        bytearray(1024 * 1024)
+                finally:
+                    _current_timings.reset(inner_token)
+        finally:
+            _current_timings.reset(token)
+
+        assert alone.memory["parse"]["peak"] > 512 * 1024
+        for timings, stage in ((outer, "parse"), (inner, "store")):
+            assert "peak" not in timings.memory[stage]
+            assert timings.memory[stage]["overlapped"] == 1
+
+    def test_disabled_tracking_records_nothing(self, monkeypatch):
+        monkeypatch.setattr(settings, "memory_tracking_enabled", False)
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        try:
+            with track_memory("parse"):
+                bytearray(1024)
+        finally:
+            _current_timings.reset(token)
+
+        assert timings.memory == {}
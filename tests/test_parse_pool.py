@@ -0,0 +1,124 @@
+"""Tests for parsing in worker processes and the memory-mapped frame handoff"""
+import io
+import os
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import excel_processor as processor_module
+from app.services import parse_pool as pool_module
+from app.services.excel_processor import ExcelProcessor, worksheet_names
+from app.services.parse_pool import SPOOL_PREFIX, FrameSpool, ParsePool, parse_sheet, write_frame
+from tests.benchmarks.workbook_factory import WorkbookSpec, generate_workbook
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "monto": [1.5, np.nan, 3.0],
+        "cantidad": [1, 2, 3],
+        "fecha": pd.to_datetime(["2024-01-01", None, "2024-03-01"]),
+        "nombre": ["a", np.nan, "c"],
+        "mixto": [1, "b", np.nan],
+        2024: [True, False, True],
+    })
+
+
+def test_arrow_handoff_round_trip(tmp_path, frame):
+    spool = FrameSpool(str(tmp_path))
+    handle = write_frame(frame, str(tmp_path))
+    assert handle.path.startswith(str(tmp_path)) and list(handle.fallback) == [4]
+
+    restored = spool.open(handle)
+    pd.testing.assert_frame_equal(restored, frame)
+    assert restored["nombre"].isna().tolist() == [False, True, False]
+    # Numeric columns are views over the mapped file, not copies
+    assert not restored["cantidad"].to_numpy().flags.writeable
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_discards_unopened_handles_and_sweeps_stale_files(tmp_path, frame):
+    spool = FrameSpool(str(tmp_path), stale_after=60)
+    future: Future = Future()
+    future.set_running_or_notify_cancel()
+    spool.discard_when_done(future)
+    future.set_result(write_frame(frame, str(tmp_path)))
+    assert os.listdir(tmp_path) == []
+
+    stale = tmp_path / f"{SPOOL_PREFIX}old.arrow"
+    fresh = tmp_path / f"{SPOOL_PREFIX}new.arrow"
+    other = tmp_path / "unrelated.arrow"
+    for path in (stale, fresh, other):
+        path.write_bytes(b"x")
+    os.utime(stale, (time.time() - 120, time.time() - 120))
+    assert spool.sweep() == 1
+    assert sorted(os.listdir(tmp_path)) == sorted([fresh.name, other.name])
+
+
+@pytest.mark.parametrize("handoff", ["arrow", "pickle"])
+def test_worker_parsing_matches_threadpool(tmp_path, monkeypatch, handoff):
+    content = generate_workbook(WorkbookSpec(rows=50, columns=6, sheets=3, null_density=0.1))
+    processor = ExcelProcessor()
+    expected = list(processor.iter_sheets(content, "ws-1", columns=["Integer 0", "String 4"]))
+
+    pool = ParsePool(workers=2, handoff=handoff, directory=str(tmp_path))
+    monkeypatch.setattr(processor_module, "parse_pool", pool)
+    submitted = []
+    submit = pool.submit
+    monkeypatch.setattr(pool, "submit", lambda *args: submitted.append(args) or submit(*args))
+    opened = []
+    excel_file = pd.ExcelFile
+    monkeypatch.setattr(pd, "ExcelFile", lambda *args, **kwargs: opened.append(args) or excel_file(*args, **kwargs))
+    try:
+        sheets = list(processor.iter_sheets(content, "ws-1", columns=["Integer 0", "String 4"]))
+    finally:
+        pool.shutdown()
+
+    # Tasks carry the staged path, not the upload, and this process never opens the workbook
+    assert len({workbook for workbook, *_ in submitted}) == 1 and opened == []
+
+    for got, want in zip(sheets, expected):
+        assert (got["_data"], got["_row_hashes"], got["column_types"]) == (
+            want["_data"], want["_row_hashes"], want["column_types"]
+        )
+    assert len(sheets) == 3 and os.listdir(tmp_path) == []
+
+
+def test_worker_opens_a_staged_workbook_once(tmp_path, monkeypatch):
+    content = generate_workbook(WorkbookSpec(rows=10, columns=3, sheets=3))
+    spool = FrameSpool(str(tmp_path))
+    workbook = spool.stage(content)
+    monkeypatch.setattr(pool_module, "_workbooks", pool_module.OrderedDict())
+    opened = []
+    excel_file = pd.ExcelFile
+    monkeypatch.setattr(pd, "ExcelFile", lambda *args, **kwargs: opened.append(args) or excel_file(*args, **kwargs))
+
+    for sheet_name in excel_file(io.BytesIO(content)).sheet_names:
+        spool.open(parse_sheet(workbook, sheet_name, None, "arrow", str(tmp_path)))
+
+    assert opened == [(workbook,)]
+    spool.remove(workbook)
+    assert os.listdir(tmp_path) == []
+
+
+def test_worksheet_names_match_pandas():
+    import openpyxl
+    from openpyxl.chart import BarChart
+
+    book = openpyxl.Workbook()
+    book.active.title = "Ventas & Costos"
+    book.create_chartsheet("Gráfico").add_chart(BarChart())
+    book.create_sheet("Resumen")
+    buffer = io.BytesIO()
+    book.save(buffer)
+
+    assert worksheet_names(buffer.getvalue()) == pd.ExcelFile(buffer).sheet_names == ["Ventas & Costos", "Resumen"]
+    assert worksheet_names(b"not a zip") is None
+
+
+def test_rejects_unknown_handoff():
+    with pytest.raises(ValueError):
+        ParsePool(workers=1, handoff="shm")
@@ -55,9 +55,12 @@ class TestRoutes:
             async def create_dashboard(self, workspace_id, name, description, icon="table", color="#228BE6"):
                 return {"id": "dashboard-123", "name": name}
 
-            async def store_excel_data(self, workspace_id, table_name, data, column_types):
+            async def store_excel_data(self, workspace_id, table_name, data, column_types, **tags):
                 return len(data)
 
+            async def find_tables_by_fingerprint(self, workspace_id, fingerprint):
+                return []
+
             async def create_widget(self, dashboard_id, widget_type, config):
                 return {"id": "widget-123"}
 
@@ -108,9 +111,12 @@ class TestRoutes:
             async def create_dashboard(self, workspace_id, name, description, icon="table", color="#228BE6"):
                 return {"id": "dashboard-multi", "name": name}
 
-            async def store_excel_data(self, workspace_id, table_name, data, column_types):
+            async def store_excel_data(self, workspace_id, table_name, data, column_types, **tags):
                 return len(data)
 
+            async def find_tables_by_fingerprint(self, workspace_id, fingerprint):
+                return []
+
             async def create_widget(self, dashboard_id, widget_type, config):
                 return {"id": "widget-multi"}
 
@@ -148,9 +154,12 @@ class TestRoutes:
             async def create_dashboard(self, workspace_id, name, description, icon="table", color="#228BE6"):
                 return {"id": "dashboard-123", "name": name}
 
-            async def store_excel_data(self, workspace_id, table_name, data, column_types):
+            async def store_excel_data(self, workspace_id, table_name, data, column_types, **tags):
                 return len(data)
 
+            async def find_tables_by_fingerprint(self, workspace_id, fingerprint):
+                return []
+
             async def create_widget(self, dashboard_id, widget_type, config):
                 return {"id": "widget-123"}
 
@@ -170,7 +179,20 @@ class TestRoutes:
 
         assert response.status_code == 400
         assert "errors" in response.json()["detail"]
-    
+
+    def test_validate_and_process_report_the_same_error(self, client, mock_db_client):
+        """/validate y /process responden el mismo error_code para un archivo inválido"""
+        app.dependency_overrides[get_database_client] = lambda: mock_db_client
+        for name, content in (("test.txt", b"content"), ("roto.xlsx", b"not a workbook"), ("vacio.xlsx", b"")):
+            validate = client.post("/api/excel/validate", files={"file": (name, io.BytesIO(content))})
+            process = client.post(
+                "/api/excel/process",
+                files={"file": (name, io.BytesIO(content))},
+                data={"workspace_id": "workspace-123", "user_id": "user-456"},
+            )
+            assert validate.status_code == process.status_code == 400
+            assert validate.json()["detail"] == process.json()["detail"]
+
     def test_validate_excel_success(self, client, sample_excel_file):
         """Test validación exitosa de Excel"""
         response = client.post(
@@ -209,3 +231,500 @@ class TestRoutes:
         assert data["success"] is True
         assert "data" in data
         assert "headers" in data["data"]
+
+    @pytest.mark.parametrize("rows", ["-5", "0", "1001"])
+    def test_preview_excel_rejects_out_of_range_rows(self, client, sample_excel_file, rows):
+        """rows fuera de 1..1000 responde 422 antes de abrir el archivo"""
+        response = client.post(
+            "/api/excel/preview",
+            files={"file": ("test.xlsx", sample_excel_file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"rows": rows}
+        )
+        
+        assert response.status_code == 422
+
+    def test_preview_excel_sheet_not_found(self, client, sample_excel_file):
+        """Una hoja inexistente responde 400 con SHEET_NOT_FOUND"""
+        response = client.post(
+            "/api/excel/preview",
+            files={"file": ("test.xlsx", sample_excel_file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"rows": "2", "sheet": "NoExiste"}
+        )
+        
+        assert response.status_code == 400
+        assert response.json()["detail"]["error_code"] == "SHEET_NOT_FOUND"
+
+    def test_process_excel_ndjson_stream(self, client, mock_db_client):
+        """Accept: application/x-ndjson streams one line per sheet plus a summary"""
+        import json
+
+        app.dependency_overrides[get_database_client] = lambda: mock_db_client
+
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            pd.DataFrame({"a": [1, 2], "b": [3, 4]}).to_excel(writer, sheet_name="Hoja1", index=False)
+            pd.DataFrame({"x": ["p", "q"], "y": [10, 20]}).to_excel(writer, sheet_name="Hoja2", index=False)
+        buf.seek(0)
+
+        response = client.post(
+            "/api/excel/process",
+            files={"file": ("multi.xlsx", buf, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"workspace_id": "workspace-123", "user_id": "user-456"},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+        assert [line["type"] for line in lines] == ["sheet", "sheet", "summary"]
+        assert lines[0]["sheet"]["sheet_name"] == "Hoja1"
+        assert "_data" not in lines[0]["sheet"]
+        summary = lines[-1]
+        assert summary["success"] is True
+        assert summary["sheets_processed"] == 2
+        assert len(summary["tables"]) == 2
+
+        buf.seek(0)
+        with_dashboard = client.post(
+            "/api/excel/process",
+            files={"file": ("multi.xlsx", buf, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"workspace_id": "workspace-123", "user_id": "user-456", "create_dashboard": "true"},
+            headers={"Accept": "application/x-ndjson"},
+        )
+        summary = json.loads(with_dashboard.text.splitlines()[-1])
+        assert summary["dashboard_id"] == "dashboard-test"
+        assert summary["widgets_created"] > 0
+
+    def test_metrics_endpoint(self, client, sample_excel_file, mock_db_client):
+        """/metrics exposes per-stage histograms, ingestion counters and error codes"""
+        app.dependency_overrides[get_database_client] = lambda: mock_db_client
+
+        client.post(
+            "/api/excel/process",
+            files={"file": ("test.xlsx", sample_excel_file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"workspace_id": "workspace-123", "user_id": "user-456"},
+        )
+        client.post(
+            "/api/excel/process",
+            files={"file": ("test.txt", io.BytesIO(b"content"), "text/plain")},
+            data={"workspace_id": "workspace-123", "user_id": "user-456"},
+        )
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        for stage in ("parse", "type_inference", "nan_cleaning", "widget_suggestion"):
+            assert f'excel_stage_duration_seconds_count{{stage="{stage}"}}' in body
+        assert 'excel_request_duration_seconds_count{route="/api/excel/process",status="200"}' in body
+        assert "excel_ingested_rows_total" in body
+        assert 'excel_errors_total{error_code="INVALID_FILE_TYPE",route="/api/excel/process"}' in body
+        assert "excel_inflight_requests" in body
+
+    def test_process_duplicate_returns_existing_tables(self, client, sample_excel_file):
+        """Re-uploading the same file to a workspace skips parsing and storage"""
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+        content = sample_excel_file.getvalue()
+
+        def post(workspace_id="workspace-123", **extra):
+            return client.post(
+                "/api/excel/process",
+                files={"file": ("test.xlsx", content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                data={"workspace_id": workspace_id, "user_id": "user-456", **extra},
+            )
+
+        first = post().json()
+        second = post().json()
+
+        assert first["duplicate"] is False
+        assert second["duplicate"] is True
+        assert second["tables"] == first["tables"]
+        assert second["sheets"] == first["sheets"]
+        assert db.calls["insert_metadata"] == 1
+
+        assert post(force="true").json()["duplicate"] is False
+        assert post(workspace_id="workspace-999").json()["duplicate"] is False
+        assert db.calls["insert_metadata"] == 3
+
+    def test_process_duplicate_still_creates_requested_dashboard(self, client, sample_excel_file):
+        """Dedup skips parsing and storage only: create_dashboard builds it from the stored tables"""
+        import json
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+        content = sample_excel_file.getvalue()
+
+        def post(headers=None, **extra):
+            return client.post(
+                "/api/excel/process",
+                files={"file": ("ventas.xlsx", content)},
+                data={"workspace_id": "workspace-123", "user_id": "user-456", **extra},
+                headers=headers or {},
+            )
+
+        first = post().json()
+        second = post(create_dashboard="true").json()
+
+        assert (second["duplicate"], db.calls["insert_metadata"]) == (True, 1)
+        suggested = sum(len(sheet["widget_suggestions"]) for sheet in first["sheets"])
+        assert second["dashboard_id"] in db.dashboards
+        assert db.dashboards[second["dashboard_id"]]["name"] == "ventas"
+        assert second["widgets_created"] == suggested == len(db.widgets) > 0
+        assert {w["config"]["data_source"] for w in db.widgets.values()} == set(first["tables"])
+
+        streamed = post(headers={"Accept": "application/x-ndjson"}, create_dashboard="true", dashboard_name="otro")
+        summary = json.loads(streamed.text.splitlines()[-1])
+        assert (summary["duplicate"], db.dashboards[summary["dashboard_id"]]["name"]) == (True, "otro")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_uploads_ingest_once(self, sample_excel_file, monkeypatch):
+        """A double click: the second upload waits for the first one's reservation and gets its tables"""
+        import asyncio
+        import httpx
+        from app.config import settings
+        from tests.fakes import InMemoryDatabaseClient
+
+        monkeypatch.setattr(settings, "upload_reservation_poll_ms", 5.0)
+        db = InMemoryDatabaseClient()
+        released = asyncio.Event()
+        store = db.store_excel_data
+
+        async def held_store(*args, **kwargs):
+            # Storage blocks until the second request is already waiting on the reservation
+            await released.wait()
+            return await store(*args, **kwargs)
+
+        db.store_excel_data = held_store
+        app.dependency_overrides[get_database_client] = lambda: db
+        content = sample_excel_file.getvalue()
+
+        async def post(http):
+            return await http.post(
+                "/api/excel/process",
+                files={"file": ("test.xlsx", content)},
+                data={"workspace_id": "workspace-123", "user_id": "user-456"},
+            )
+
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+                first = asyncio.ensure_future(post(http))
+                second = asyncio.ensure_future(post(http))
+                while db.calls["reserve_upload"] < 3:
+                    await asyncio.sleep(0.005)
+                released.set()
+                responses = await asyncio.gather(first, second)
+        finally:
+            app.dependency_overrides = {}
+
+        payloads = [response.json() for response in responses]
+        assert sorted(payload["duplicate"] for payload in payloads) == [False, True]
+        assert payloads[0]["tables"] == payloads[1]["tables"]
+        assert db.calls["insert_metadata"] == 1
+        assert db.reservations == {}
+
+    def test_process_projects_sheets_and_columns(self, client):
+        """Only the selected sheets are parsed and only the selected columns stored"""
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            pd.DataFrame({"a": [1, 2], "b": [3, 4], "c": [5, 6]}).to_excel(writer, sheet_name="Hoja1", index=False)
+            pd.DataFrame({"x": ["p", "q"]}).to_excel(writer, sheet_name="Hoja, 2", index=False)
+        content = buf.getvalue()
+
+        def post(**extra):
+            return client.post(
+                "/api/excel/process",
+                files={"file": ("multi.xlsx", content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                data={"workspace_id": "workspace-123", "user_id": "user-456", **extra},
+            )
+
+        data = post(sheets="Hoja1", columns="a,c").json()
+        assert [s["sheet_name"] for s in data["sheets"]] == ["Hoja1"]
+        assert data["sheets"][0]["columns"] == 2
+        (rows,) = db.rows.values()
+        assert [row["row_data"] for row in rows] == [{"a": 1, "c": 5}, {"a": 2, "c": 6}]
+
+        # A different projection of the same file is not a duplicate
+        assert post(sheets='["Hoja, 2"]').json()["duplicate"] is False
+        assert post(sheets="Hoja1", columns="c, a").json()["duplicate"] is True
+
+        missing_sheet = post(sheets="Nope")
+        assert missing_sheet.status_code == 400
+        assert missing_sheet.json()["detail"]["error_code"] == "SHEET_NOT_FOUND"
+        assert post(columns="nope").json()["detail"]["error_code"] == "COLUMN_NOT_FOUND"
+
+    def test_arrow_ipc_for_preview_and_table_data(self, client, sample_excel_file):
+        """Accept: application/vnd.apache.arrow.stream returns typed columns"""
+        import pyarrow as pa
+        from tests.fakes import InMemoryDatabaseClient
+
+        arrow = {"Accept": "application/vnd.apache.arrow.stream"}
+        content = sample_excel_file.getvalue()
+        files = {"file": ("test.xlsx", content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+
+        preview = client.post("/api/excel/preview", files=files, headers=arrow)
+        assert preview.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(preview.content).read_all()
+        assert table.to_pydict() == {"Name": ["Alice", "Bob"], "Age": [25, 30], "City": ["New York", "London"]}
+        assert table.schema.metadata[b"sheet_name"] == b'"Sheet1"'
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+        client.post("/api/excel/process", files=files, data={"workspace_id": "workspace-123", "user_id": "user-456"})
+        (table_id,) = db.tables
+
+        url = f"/api/excel/tables/{table_id}/data"
+        as_json = client.get(url, params={"workspace_id": "workspace-123", "limit": 1, "offset": 1}).json()
+        assert as_json["data"]["rows"] == [{"name": "Bob", "age": 30, "city": "London"}]
+        stream = client.get(url, params={"workspace_id": "workspace-123"}, headers=arrow)
+        table = pa.ipc.open_stream(stream.content).read_all()
+        assert table.column_names == ["name", "age", "city"]
+        assert table.schema.field("age").type == pa.int64()
+
+        missing = client.get(url, params={"workspace_id": "workspace-999"})
+        assert missing.status_code == 404
+
+    def test_upload_duplicate_returns_existing_dashboard(self, client, sample_excel_file):
+        """/upload answers a repeated file with the dashboard created the first time"""
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+        content = sample_excel_file.getvalue()
+
+        responses = [
+            client.post(
+                "/api/excel/upload",
+                files={"file": ("test.xlsx", content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                data={"workspace_id": "workspace-123", "user_id": "user-456"},
+            ).json()
+            for _ in range(2)
+        ]
+
+        assert [r["duplicate"] for r in responses] == [False, True]
+        assert responses[1]["dashboard_id"] == responses[0]["dashboard_id"]
+        assert responses[1]["rows_processed"] == 2
+        assert len(db.dashboards) == 1
+        assert db.calls["insert_widgets"] == 1
+        assert db.dashboards[responses[0]["dashboard_id"]]["name"] == "test"
+
+    def test_process_update_mode_writes_only_changed_rows(self, client):
+        """table_id diffs the new version against the stored rows"""
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient(batch_size=100)
+        app.dependency_overrides[get_database_client] = lambda: db
+
+        def workbook(values):
+            buf = io.BytesIO()
+            pd.DataFrame({"id": range(len(values)), "value": values}).to_excel(buf, index=False)
+            return buf.getvalue()
+
+        def post(content, **extra):
+            return client.post(
+                "/api/excel/process",
+                files={"file": ("monthly.xlsx", content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                data={"workspace_id": "workspace-123", "user_id": "user-456", **extra},
+            )
+
+        original = [float(i) for i in range(500)]
+        post(workbook(original))
+        (table_id,) = db.tables
+        table_name = db.tables[table_id]["table_name"]
+
+        updated = original[:450] + [0.5]  # edit row 1, drop 49 trailing rows
+        updated[0] = -1.0
+        response = post(workbook(updated), table_id=table_id)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["diff"] == {
+            "table_id": table_id, "inserted": 0, "updated": 2, "deleted": 49, "unchanged": 449,
+        }
+        assert data["tables"] == [table_name]
+        assert db.calls["upsert_rows"] == 1
+        assert [row["row_data"]["value"] for row in db.rows[table_id][:2]] == [-1.0, 1.0]
+        assert db.tables[table_id]["row_count"] == 451
+
+        missing = post(workbook(updated), table_id="no-such-table")
+        assert missing.status_code == 404
+        assert missing.json()["detail"]["error_code"] == "TABLE_NOT_FOUND"
+
+    def test_process_update_mode_uses_the_sheets_selector(self, client):
+        """In update mode a one-sheet ``sheets`` selects the sheet to diff; more is a 400"""
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf) as writer:
+            pd.DataFrame({"total": [1]}).to_excel(writer, sheet_name="Resumen", index=False)
+            pd.DataFrame({"id": range(20), "value": range(20)}).to_excel(writer, sheet_name="Detalle", index=False)
+
+        def post(**extra):
+            return client.post(
+                "/api/excel/process",
+                files={"file": ("monthly.xlsx", buf.getvalue(), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+                data={"workspace_id": "workspace-123", "user_id": "user-456", **extra},
+            )
+
+        post(sheets="Detalle")
+        (table_id,) = db.tables
+
+        response = post(table_id=table_id, sheets="Detalle")
+        assert response.status_code == 200
+        assert response.json()["diff"]["unchanged"] == 20
+
+        for extra in ({"sheets": "Resumen,Detalle"}, {"sheets": "Detalle", "sheet_name": "Resumen"}):
+            rejected = post(table_id=table_id, **extra)
+            assert rejected.status_code == 400
+            assert rejected.json()["detail"]["error_code"] == "INVALID_SELECTOR"
+
+    def test_partial_ingest_can_be_resumed(self, client, tmp_path, monkeypatch):
+        """A sheet whose storage fails part-way reports its table_id and resumes without re-upload"""
+        from app.config import settings
+        from app.infrastructure import DataStorageService
+        from app.infrastructure.ingest_spool import IngestSpool
+        from app.services import SupabaseClient
+        from tests.fakes import FakeSupabase
+
+        monkeypatch.setattr(settings, "storage_retry_backoff_ms", 0.0)
+        fake = FakeSupabase()
+        db_client = SupabaseClient()
+        db_client.client = fake
+        db_client.data_storage = DataStorageService(fake, spool=IngestSpool(str(tmp_path)))
+        app.dependency_overrides[get_database_client] = lambda: db_client
+
+        fake.fail_when(lambda table, op, payload: (
+            table == "data_table_rows" and op != "select" and payload[0]["row_number"] == 101
+        ))
+        buf = io.BytesIO()
+        pd.DataFrame({"n": range(250)}).to_excel(buf, index=False)
+        response = client.post(
+            "/api/excel/process",
+            files={"file": ("big.xlsx", buf.getvalue(), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"workspace_id": "workspace-123", "user_id": "user-456"},
+        )
+
+        sheet = response.json()["sheets"][0]
+        assert sheet["storage_status"] == "partial"
+        assert len(fake.tables["data_table_rows"]) == 100
+
+        fake.fail_when(None)
+        resumed = client.post(
+            f"/api/excel/tables/{sheet['table_id']}/resume", data={"workspace_id": "workspace-123"}
+        )
+
+        assert resumed.status_code == 200
+        assert resumed.json()["data"]["resumed_from_row"] == 101
+        assert len(fake.tables["data_table_rows"]) == 250
+        assert client.post(
+            "/api/excel/tables/unknown/resume", data={"workspace_id": "workspace-123"}
+        ).json()["detail"]["error_code"] == "RESUME_UNAVAILABLE"
+
+    def test_process_auto_dashboard_costs_a_handful_of_requests(self, client):
+        """create_dashboard inserts the dashboard and every suggested widget in bulk"""
+        from app.infrastructure import DataStorageService
+        from app.services import SupabaseClient
+        from tests.fakes import FakeSupabase
+
+        fake = FakeSupabase()
+        db_client = SupabaseClient()
+        db_client.client = fake
+        db_client.data_storage = DataStorageService(fake)
+        app.dependency_overrides[get_database_client] = lambda: db_client
+
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            for i in range(20):
+                pd.DataFrame({"fecha": pd.date_range("2026-01-01", periods=3), "monto": [1, 2, 3]}).to_excel(
+                    writer, sheet_name=f"Hoja{i}", index=False
+                )
+        response = client.post(
+            "/api/excel/process",
+            files={"file": ("ventas.xlsx", buf.getvalue(), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            data={"workspace_id": "workspace-123", "user_id": "user-456", "create_dashboard": "true"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        suggested = sum(len(sheet["widget_suggestions"]) for sheet in data["sheets"])
+        (dashboard,) = fake.tables["dashboards"]
+        assert (data["dashboard_id"], dashboard["name"]) == (dashboard["id"], "ventas")
+        assert data["widgets_created"] == suggested == len(fake.tables["widgets"])
+        control_plane = {
+            key: count for key, count in fake.requests.items()
+            if key[0] in ("create_dashboard", "dashboards", "widgets")
+        }
+        assert control_plane == {("create_dashboard", "rpc"): 1, ("widgets", "insert"): 1}
+
+    def test_process_batch_isolates_failures_per_file(self, client, monkeypatch):
+        """Every file gets its own result; a bad file does not fail the others"""
+        import json
+        from app.config import settings
+        from tests.fakes import InMemoryDatabaseClient
+
+        db = InMemoryDatabaseClient()
+        app.dependency_overrides[get_database_client] = lambda: db
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+        def workbook(n):
+            buf = io.BytesIO()
+            pd.DataFrame({"producto": [f"p{i}" for i in range(n)], "monto": range(n)}).to_excel(buf, index=False)
+            return buf.getvalue()
+
+        def post(files, headers=None, **data):
+            return client.post(
+                "/api/excel/process-batch",
+                files=[("files", f) for f in files],
+                data={"workspace_id": "workspace-123", "user_id": "user-456", **data},
+                headers=headers or {},
+            )
+
+        files = [
+            ("enero.xlsx", workbook(3), xlsx),
+            ("roto.xlsx", b"not a workbook", xlsx),
+            ("febrero.xlsx", workbook(5), xlsx),
+        ]
+        data = post(files).json()
+
+        assert (data["success"], data["files_total"], data["files_succeeded"], data["files_failed"]) == (False, 3, 2, 1)
+        assert [f["filename"] for f in data["files"]] == ["enero.xlsx", "roto.xlsx", "febrero.xlsx"]
+        ok, bad, ok2 = data["files"]
+        assert ok["success"] and ok["result"]["sheets"][0]["rows"] == 3
+        assert ok2["result"]["sheets"][0]["storage_status"] == "completed"
+        single = client.post(
+            "/api/excel/process",
+            files={"file": files[1]},
+            data={"workspace_id": "workspace-123", "user_id": "user-456"},
+        )
+        assert (bad["success"], bad["result"]) == (False, None)
+        assert (bad["status_code"], bad["error"], bad["error_code"]) == (
+            single.status_code, single.json()["detail"]["error"], single.json()["detail"]["error_code"]
+        )
+        assert sorted(len(rows) for rows in db.rows.values()) == [3, 5]
+
+        # Streamed: one line per file as it finishes, then the summary; already ingested files are duplicates
+        response = post(files[:1] + files[2:], headers={"Accept": "application/x-ndjson"})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["type"] for line in lines] == ["file", "file", "summary"]
+        assert all(line["file"]["result"]["duplicate"] for line in lines[:2])
+        assert lines[2]["files_succeeded"] == 2
+
+        monkeypatch.setattr(settings, "batch_max_files", 2)
+        assert post(files).json()["detail"]["error_code"] == "TOO_MANY_FILES"
+        no_files = client.post(
+            "/api/excel/process-batch",
+            files={"file": files[0]},
+            data={"workspace_id": "workspace-123", "user_id": "user-456"},
+        )
+        assert no_files.json()["detail"]["error_code"] == "NO_FILES"
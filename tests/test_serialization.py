@@ -0,0 +1,99 @@
+"""Tests for the orjson-based response serialization"""
+import numpy as np
+import orjson
+import pandas as pd
+
+from app.models import SheetProcessingResult
+from app.utils.arrow import columns_to_ipc, records_to_columns, rows_to_columns
+from app.utils.serialization import FastJSONResponse, dumps
+
+
+def test_dumps_numpy_and_pandas_scalars():
+    payload = {
+        "int": np.int64(7),
+        "float": np.float64(1.5),
+        "nan": float("nan"),
+        "ts": pd.Timestamp("2024-01-01"),
+        "nat": pd.NaT,
+    }
+
+    decoded = orjson.loads(dumps(payload))
+
+    assert decoded == {
+        "int": 7,
+        "float": 1.5,
+        "nan": None,
+        "ts": "2024-01-01T00:00:00",
+        "nat": None,
+    }
+
+
+def test_constructed_model_renders_without_validation():
+    sheet = SheetProcessingResult.model_construct(
+        sheet_name="Hoja1",
+        table_name="hoja1_20240101_000000",
+        rows=1,
+        columns=1,
+        column_types={"monto": "integer"},
+        sample_rows=[{"monto": np.int64(10)}],
+        widget_suggestions=[],
+    )
+
+    body = orjson.loads(FastJSONResponse(sheet).body)
+
+    assert body["sample_rows"] == [{"monto": 10}]
+    assert body["suggests_user_import"] is False
+    assert body["user_columns"] is None
+
+
+def test_models_render_through_model_dump():
+    from typing import Optional
+
+    from pydantic import BaseModel, Field, field_serializer
+
+    class Inner(BaseModel):
+        when: pd.Timestamp = Field(alias="at")
+        model_config = {"arbitrary_types_allowed": True, "populate_by_name": True}
+
+        @field_serializer("when")
+        def _iso_date(self, value):
+            return value.date().isoformat()
+
+    class Outer(BaseModel):
+        inner: Inner
+        note: Optional[str] = None
+
+    body = orjson.loads(dumps(Outer(inner=Inner(when=pd.Timestamp("2024-01-02 10:00")))))
+
+    assert body == {"inner": {"at": "2024-01-02"}, "note": None}
+
+
+def test_arrow_ipc_types_columns_from_column_types():
+    import pyarrow as pa
+
+    records = [
+        {"id": 1, "monto": 10, "fecha": "2024-01-01T00:00:00", "nombre": "a"},
+        {"id": 2, "monto": 2.5, "fecha": None, "nombre": 3, "extra": True},
+    ]
+    column_types = {"id": "integer", "monto": "integer", "fecha": "date", "nombre": "string"}
+    body = columns_to_ipc(records_to_columns(records, list(column_types)), column_types, {"offset": 0})
+
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.column_names == ["id", "monto", "fecha", "nombre", "extra"]
+    assert table.schema.field("id").type == pa.int64()
+    # 2.5 does not fit the declared integer type: kept as float rather than truncated
+    assert table.column("monto").to_pylist() == [10.0, 2.5]
+    assert table.schema.field("fecha").type == pa.timestamp("us")
+    # Mixed str/int values fall back to strings
+    assert table.column("nombre").to_pylist() == ["a", "3"]
+    assert table.column("extra").to_pylist() == [None, True]
+    assert table.schema.metadata[b"offset"] == b"0"
+
+
+def test_arrow_ipc_from_positional_rows():
+    import pyarrow as pa
+
+    columns = rows_to_columns(["a", "b"], [[1, "x"], [2, None]])
+    table = pa.ipc.open_stream(columns_to_ipc(columns)).read_all()
+    assert table.to_pydict() == {"a": [1, 2], "b": ["x", None]}
+    assert rows_to_columns(["a"], []) == {"a": []}
@@ -0,0 +1,73 @@
+"""Tests for cold-start behaviour: lazy imports, warm-up and /ready"""
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services import warmup as warmup_module
+
+
+def test_importing_app_does_not_load_heavy_modules():
+    """/health must not wait for pandas, openpyxl or supabase to import"""
+    code = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('pandas', 'numpy', 'openpyxl', 'supabase') if m in sys.modules))"
+    )
+    loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert loaded.strip() == ""
+
+
+def _wait_ready(client, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return response.json()
+        time.sleep(0.01)
+    pytest.fail("warm-up did not finish")
+
+
+@pytest.fixture
+def warmup_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "warmup_enabled", True)
+    monkeypatch.setattr(settings, "loop_monitor_enabled", False)
+
+
+def test_ready_reports_warmup_progress(warmup_enabled, monkeypatch):
+    release = threading.Event()
+    real_pipeline = warmup_module._warm_pipeline
+
+    def gated_pipeline():
+        release.wait(10)
+        real_pipeline()
+
+    monkeypatch.setattr(warmup_module, "_warm_pipeline", gated_pipeline)
+    with TestClient(app) as client:
+        assert client.get("/health").status_code == 200
+        pending = client.get("/ready")
+        assert pending.status_code == 503
+        assert pending.json()["status"] == "warming_up"
+
+        release.set()
+        status = _wait_ready(client)
+
+    assert status["status"] == "ready"
+    assert status["warmup"]["finished"] is True
+    assert status["warmup"]["error"] is None
+    assert status["warmup"]["duration_seconds"] > 0
+
+
+def test_failed_warmup_still_becomes_ready(warmup_enabled, monkeypatch):
+    def broken_pipeline():
+        raise RuntimeError("openpyxl exploded")
+
+    monkeypatch.setattr(warmup_module, "_warm_pipeline", broken_pipeline)
+    with TestClient(app) as client:
+        status = _wait_ready(client)
+
+    assert status["warmup"]["error"] == "openpyxl exploded"
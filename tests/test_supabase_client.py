@@ -0,0 +1,66 @@
+"""Tests for SupabaseClient dashboard and widget operations"""
+import asyncio
+
+import pytest
+
+from app.infrastructure import DataStorageService
+from app.services import SupabaseClient
+from tests.fakes import FakeSupabase
+
+
+@pytest.fixture
+def fake():
+    return FakeSupabase()
+
+
+@pytest.fixture
+def db_client(fake):
+    client = SupabaseClient()
+    client.client = fake
+    client.data_storage = DataStorageService(fake)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_create_dashboard_is_one_round_trip(db_client, fake):
+    dashboard = await db_client.create_dashboard("ws-1", "Ventas", "desc", dashboard_id="dash-1")
+
+    assert (dashboard["id"], dashboard["position"], dashboard["name"]) == ("dash-1", 0, "Ventas")
+    assert dict(fake.requests) == {("create_dashboard", "rpc"): 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dashboards_get_distinct_positions(db_client, fake):
+    fake.tables["dashboards"] = [{"id": "old", "workspace_id": "ws-1", "position": 4}]
+
+    dashboards = await asyncio.gather(*(
+        db_client.create_dashboard("ws-1", f"Dashboard {i}", "desc") for i in range(10)
+    ))
+    other = await db_client.create_dashboard("ws-2", "Otro", "desc")
+
+    assert sorted(d["position"] for d in dashboards) == list(range(5, 15))
+    assert other["position"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dashboard_positions_follow_dashboards_created_elsewhere(db_client, fake):
+    first = await db_client.create_dashboard("ws-1", "Uno", "desc")
+    # Created by the frontend, without going through create_dashboard
+    fake.tables["dashboards"].append({"id": "manual", "workspace_id": "ws-1", "position": 1})
+
+    second = await db_client.create_dashboard("ws-1", "Dos", "desc")
+
+    assert (first["position"], second["position"]) == (0, 2)
+
+
+@pytest.mark.asyncio
+async def test_create_widgets_is_a_single_insert(db_client, fake):
+    widgets = await db_client.create_widgets("dash-1", [
+        {"widget_type": "table", "config": {"title": "Datos"}},
+        {"widget_type": "kpi", "config": {"column": "monto"}},
+    ])
+
+    assert [w["position"] for w in widgets] == [0, 1]
+    assert [w["type"] for w in fake.tables["widgets"]] == ["table", "kpi"]
+    assert dict(fake.requests) == {("widgets", "insert"): 1}
+    assert await db_client.create_widgets("dash-1", []) == []
@@ -0,0 +1,34 @@
+"""Tests for upload fingerprints and duplicate detection"""
+from app.services.upload_registry import build_source, file_fingerprint, latest_complete_upload
+
+
+def _table(upload_id, sheet_index, sheet_count, mode="process"):
+    return {"source": build_source(mode, upload_id, sheet_index, sheet_count, {"sheet": sheet_index})}
+
+
+def test_fingerprint_depends_only_on_content():
+    assert file_fingerprint(b"abc") == file_fingerprint(b"abc")
+    assert file_fingerprint(b"abc") != file_fingerprint(b"abd")
+
+
+def test_fingerprint_includes_projection():
+    full = file_fingerprint(b"abc")
+    projected = file_fingerprint(b"abc", {"columns": ["b", "a"]})
+    assert projected != full
+    assert projected == file_fingerprint(b"abc", {"columns": ["a", "b"]})
+    assert projected != file_fingerprint(b"abc", {"sheets": ["b", "a"]})
+    assert file_fingerprint(b"abc", {}) == full
+
+
+def test_latest_complete_upload_skips_partial_uploads():
+    tables = [
+        _table("new", 1, 2),                 # newest upload lost its first sheet
+        _table("old", 1, 2),
+        _table("old", 0, 2),
+        _table("legacy", 0, 1, mode="upload"),
+    ]
+
+    assert latest_complete_upload(tables, "process") == [{"sheet": 0}, {"sheet": 1}]
+    assert latest_complete_upload(tables, "upload") == [{"sheet": 0}]
+    assert latest_complete_upload(tables[:1], "process") is None
+    assert latest_complete_upload([{"source": None}], "process") is None